@@ -1,5 +1,6 @@
 # app.py
 import streamlit as st
+import resources
 from detection_ui import detection_ui
 from chatbot_ui import chatbot_ui
 from reports_ui import reports_ui
@@ -35,3 +36,10 @@ with tabs[1]:
 with tabs[2]:
     st.header("📧 Reports")
     reports_ui()
+
+# ==============================
+# Lazily loaded resources
+# ==============================
+with st.sidebar.expander("⚙️ Loaded resources"):
+    for name, (loaded, seconds) in resources.status().items():
+        st.write(f"{'✅' if loaded else '⏸️'} {name}" + (f" ({seconds:.2f}s)" if loaded else ""))
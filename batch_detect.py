@@ -0,0 +1,134 @@
+# batch_detect.py
+"""
+Batch detection for bulk imports of roadside camera snapshots.
+
+    python batch_detect.py snapshots/ extra.jpg --batch-size 16 --threads 4
+"""
+import argparse
+import time
+from pathlib import Path
+import torch
+from detection_pipeline import (load_model, get_model, get_model_version, ensure_table, MODEL_PATH, upload_source,
+                                wait_for_uploads, store_cached)
+from inference_backend import BACKENDS, model_version
+from detection_store import StageTimings, extract_boxes, to_display_records, persist_detections
+from result_cache import RESULT_CACHE_ENABLED, result_cache, hash_file
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def collect_images(sources):
+    """Expands directories (non-recursive) and filters to supported image files."""
+    paths = []
+    for source in sources:
+        source = Path(source)
+        if source.is_dir():
+            paths.extend(sorted(p for p in source.iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS))
+        elif source.suffix.lower() in IMAGE_EXTENSIONS:
+            paths.append(source)
+    return [str(p) for p in paths]
+
+
+def detect_batch(sources, batch_size=16, threads=None, persist=True, model_path=MODEL_PATH, backend=None):
+    """
+    Runs batched CPU inference over a directory or list of images and writes
+    each image's boxes through the regular persistence stage. When persisting,
+    images already in the result cache (same content and model) are skipped
+    and S3 keys are derived from the content hash.
+    Returns a summary dict with throughput (inferred and cached images
+    separately) and per-stage timings.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    default_model = model_path == MODEL_PATH and backend is None
+    model = get_model() if default_model and not threads else load_model(model_path, backend, threads)
+    version = get_model_version() if default_model else model_version(model_path, backend)
+    use_cache = ensure_table() and RESULT_CACHE_ENABLED if persist else False
+    paths = collect_images(sources)
+    timings = StageTimings()
+    total_detections = 0
+    hashes = {}
+    cached = 0
+
+    start = time.perf_counter()
+    if persist:
+        with timings.stage("hash"):
+            hashes = {path: hash_file(path) for path in paths}
+    if use_cache:
+        with timings.stage("cache_lookup"):
+            known = {p for p in paths if result_cache.get(hashes[p], version) is not None}
+        cached = len(known)
+        paths = [p for p in paths if p not in known]
+    lookup_elapsed = time.perf_counter() - start
+
+    for i in range(0, len(paths), batch_size):
+        batch = paths[i:i + batch_size]
+        with timings.stage("predict"):
+            results = model.predict(source=batch, conf=0.25, batch=batch_size, device="cpu", verbose=False)
+
+        for path, r in zip(batch, results):
+            with timings.stage("collect"):
+                rows = extract_boxes([r])
+            total_detections += len(rows)
+            if persist:
+                try:
+                    upload = persist_detections(
+                        rows, path, Path(path).name,
+                        lambda p, name: upload_source(p, name, content_hash=hashes[path]), timings
+                    )
+                except Exception as e:
+                    print(f"⚠️ DB Insert Failed for {path}: {e}")
+                    continue
+                if use_cache:
+                    with timings.stage("cache_store"):
+                        store_cached(hashes[path], 1, to_display_records(rows), upload, version=version)
+    with timings.stage("s3_upload_wait"):
+        wait_for_uploads()
+    elapsed = time.perf_counter() - start
+    infer_elapsed = elapsed - lookup_elapsed
+
+    return {
+        "images": len(paths),
+        "cached": cached,
+        "detections": total_detections,
+        "seconds": elapsed,
+        "lookup_seconds": lookup_elapsed,
+        "infer_seconds": infer_elapsed,
+        "images_per_sec": len(paths) / infer_elapsed if paths and infer_elapsed else 0.0,
+        "cached_per_sec": cached / lookup_elapsed if cached and lookup_elapsed else 0.0,
+        "batch_size": batch_size,
+        "threads": torch.get_num_threads(),
+        "timings": timings,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch helmet/accident detection over image folders")
+    parser.add_argument("sources", nargs="+", help="Image files and/or directories")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Intra-op CPU threads (torch, ONNX Runtime or OpenVINO session)")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="Inference backend (default: INFERENCE_BACKEND)")
+    parser.add_argument("--no-persist", action="store_true", help="Skip S3 upload and DB insert")
+    args = parser.parse_args()
+
+    summary = detect_batch(
+        args.sources,
+        batch_size=args.batch_size,
+        threads=args.threads,
+        persist=not args.no_persist,
+        model_path=args.model,
+        backend=args.backend,
+    )
+    print(f"✅ {summary['images']} images inferred, {summary['detections']} detections in "
+          f"{summary['infer_seconds']:.2f}s ({summary['images_per_sec']:.2f} images/sec, "
+          f"batch={summary['batch_size']}, threads={summary['threads']})")
+    print(f"📦 {summary['cached']} images answered from the result cache; hashing + lookup took "
+          f"{summary['lookup_seconds']:.2f}s ({summary['cached_per_sec']:.2f} cached images/sec)")
+    for row in summary["timings"].as_rows():
+        print(f"   {row['Stage']:<10} {row['ms']:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_backends.py
+"""
+Accuracy vs latency of the inference backends on CPU.
+
+Runs every backend over the same images one at a time (like the detection
+tab) and compares its boxes with the PyTorch model's:
+  latency    - p50/p95 end-to-end predict() and the model-only inference time
+  agreement  - boxes matched to the PyTorch reference by class and IoU
+               (precision/recall/F1) and the mean confidence change
+With --data (an ultralytics dataset yaml with labels) each backend is also
+validated against ground truth (mAP50, mAP50-95).
+
+    python -m benchmarks.bench_backends snapshots/ --backends pytorch onnx onnx-int8 openvino-int8
+"""
+import argparse
+import os
+import time
+from batch_detect import collect_images
+from detection_pipeline import MODEL_PATH
+from detection_store import extract_boxes
+from inference_backend import BACKENDS, INFERENCE_IMGSZ, backend_path, load_backend
+
+
+def iou(a, b):
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(reference, candidate, threshold):
+    """Greedy class-aware matching by confidence. Returns [(ref, cand)] pairs."""
+    pairs, used = [], set()
+    for ref in sorted(reference, key=lambda d: -d.confidence):
+        best, best_iou = None, threshold
+        for i, cand in enumerate(candidate):
+            if i in used or cand.label != ref.label:
+                continue
+            overlap = iou(ref.coords, cand.coords)
+            if overlap >= best_iou:
+                best, best_iou = i, overlap
+        if best is not None:
+            used.add(best)
+            pairs.append((ref, candidate[best]))
+    return pairs
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def model_size_mb(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def run(model, images, conf, imgsz, warmup):
+    """Per-image detections plus end-to-end and inference-only latencies (seconds)."""
+    for path in images[:warmup]:
+        model.predict(source=path, conf=conf, imgsz=imgsz, device="cpu", verbose=False)
+    detections, total, inference = [], [], []
+    for path in images:
+        start = time.perf_counter()
+        results = model.predict(source=path, conf=conf, imgsz=imgsz, device="cpu", verbose=False)
+        total.append(time.perf_counter() - start)
+        inference.append(results[0].speed["inference"] / 1000)
+        detections.append(extract_boxes(results))
+    return detections, total, inference
+
+
+def agreement(reference, detections, threshold):
+    matched = ref_count = cand_count = 0
+    conf_delta = []
+    for ref, cand in zip(reference, detections):
+        pairs = match(ref, cand, threshold)
+        matched += len(pairs)
+        ref_count += len(ref)
+        cand_count += len(cand)
+        conf_delta.extend(abs(r.confidence - c.confidence) for r, c in pairs)
+    precision = matched / cand_count if cand_count else 1.0
+    recall = matched / ref_count if ref_count else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1, sum(conf_delta) / len(conf_delta) if conf_delta else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inference backend accuracy/latency comparison")
+    parser.add_argument("inputs", nargs="+", help="Image files or folders")
+    parser.add_argument("--model", default=MODEL_PATH, help="Path to best.pt (exports are looked up next to it)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["pytorch", "onnx", "onnx-int8"])
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU for matching boxes to the reference")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--data", default=None, help="Dataset yaml with labels for mAP validation")
+    args = parser.parse_args()
+
+    images = collect_images(args.inputs)
+    if not images:
+        parser.error("no input images found")
+
+    # The PyTorch model is always the reference, even if not listed
+    backends = ["pytorch"] + [b for b in args.backends if b != "pytorch"]
+    reference, base_p50 = None, None
+    print(f"{len(images)} images, imgsz={args.imgsz}, conf={args.conf}, match IoU>={args.iou}\n")
+    print(f"{'backend':<14} {'size MB':>8} {'p50 ms':>7} {'p95 ms':>7} {'infer ms':>9} {'speedup':>8} "
+          f"{'boxes':>6} {'prec':>6} {'recall':>6} {'F1':>6} {'|dconf|':>8}"
+          + (f" {'mAP50':>6} {'mAP':>6}" if args.data else ""))
+    for backend in backends:
+        try:
+            model = load_backend(args.model, backend)
+        except FileNotFoundError as e:
+            print(f"{backend:<14} skipped: {e}")
+            continue
+        detections, total, inference = run(model, images, args.conf, args.imgsz, args.warmup)
+        p50 = percentile(total, 0.5)
+        if reference is None:
+            reference, base_p50 = detections, p50
+        precision, recall, f1, conf_delta = agreement(reference, detections, args.iou)
+        line = (f"{backend:<14} {model_size_mb(backend_path(args.model, backend)):>8.1f} {p50 * 1000:>7.1f} "
+                f"{percentile(total, 0.95) * 1000:>7.1f} {percentile(inference, 0.5) * 1000:>9.1f} "
+                f"{base_p50 / p50:>7.2f}x {sum(map(len, detections)):>6} "
+                f"{precision:>6.3f} {recall:>6.3f} {f1:>6.3f} {conf_delta:>8.4f}")
+        if args.data:
+            metrics = model.val(data=args.data, imgsz=args.imgsz, batch=1, device="cpu", plots=False, verbose=False)
+            line += f" {metrics.box.map50:>6.3f} {metrics.box.map:>6.3f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
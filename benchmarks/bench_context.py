@@ -0,0 +1,67 @@
+# benchmarks/bench_context.py
+"""
+Prompt growth over a simulated chatbot session: full history (the old
+behaviour) against the chat_context token budget. With --llm, each prompt is
+also sent to the configured LLM (LLM_BASE_URL) and its latency recorded.
+
+    python -m benchmarks.bench_context --turns 30
+    LLM_BASE_URL=http://localhost:8000/v1 python -m benchmarks.bench_context --turns 30 --llm
+"""
+import argparse
+from datetime import datetime
+from chat_context import build_messages, build_rag_context, message_tokens
+
+SYSTEM = "You are SafeRideAI assistant. Answer queries about helmet/accident detections in a friendly, helpful tone."
+REPLY = "There were 3 accidents and 12 helmet violations in the last 24 hours, mostly in camera_2.mp4. " * 4
+
+
+def synthetic_context(turn):
+    now = datetime.now()
+    rows = [(turn * 10 + i, "Without Helmet", 0.87, f"camera_{i % 3}.mp4", now) for i in range(10)]
+    matches = [(r[0], f"{r[1]} ({r[2]*100:.1f}%) in {r[3]} at {r[4]}") for r in rows[:5]]
+    counts = [("24h", "Without Helmet", 12), ("24h", "Accident", 3), ("7d", "Without Helmet", 80)]
+    return matches, rows, counts
+
+
+def old_prompt(history, query, matches, rows, counts):
+    retrieved = "".join(text + "\n" for _, text in matches)
+    logs = "".join(f"- {r[1]} ({r[2]*100:.1f}%) in {r[3]} at {r[4]}\n" for r in rows)
+    totals = "".join(f"- {w}: {c} = {n}\n" for w, c, n in counts)
+    return [
+        {"role": "system", "content": SYSTEM},
+        *history,
+        {"role": "user", "content": f"{query}\n\nSemantic matches:\n{retrieved}\nRecent structured DB logs:\n{logs}\nDetection counts:\n{totals}"}
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chatbot prompt budget benchmark")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--llm", action="store_true", help="Also time each prompt against LLM_BASE_URL")
+    args = parser.parse_args()
+
+    client = None
+    if args.llm:
+        from llm_stream import create_llm_client, complete
+        client = create_llm_client()
+
+    history = []
+    print(f"{'turn':>4} {'full tokens':>12} {'budget tokens':>14} {'summarized':>11}"
+          + (f" {'full ttft':>10} {'budget ttft':>12}" if client else ""))
+    for turn in range(1, args.turns + 1):
+        query = f"How many helmet violations were there today? (question {turn})"
+        matches, rows, counts = synthetic_context(turn)
+        full = old_prompt(history, query, matches, rows, counts)
+        context, _ = build_rag_context(matches, rows, counts)
+        budgeted, stats = build_messages(SYSTEM, history, f"{query}\n\n{context}")
+        line = f"{turn:>4} {message_tokens(full):>12} {stats['prompt_tokens']:>14} {stats['turns_summarized']:>11}"
+        if client:
+            _, full_t = complete(client, full)
+            _, budget_t = complete(client, budgeted)
+            line += f" {full_t.ttft * 1000:>8.0f}ms {budget_t.ttft * 1000:>10.0f}ms"
+        print(line)
+        history += [{"role": "user", "content": query}, {"role": "assistant", "content": REPLY}]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_mail.py
+"""
+SMTP delivery benchmark against a local sink server.
+
+Starts a minimal in-process SMTP sink (no TLS, no auth, optional per-message
+delay to mimic a remote server), then sends the same PDF to N recipients
+twice: one connection per message (the old send_email_report path) and one
+reused MailSession (send_bulk).
+
+    python -m benchmarks.bench_mail --recipients 200 --attachment-kb 300
+"""
+import argparse
+import os
+import smtplib
+import socketserver
+import threading
+import time
+import mailreport
+from mailreport import MailSession, build_attachment, build_message
+
+SENDER = "bench@saferide.local"
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Accepts every message and throws it away."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.reply("220 saferide-sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 saferide-sink")
+            elif command == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                time.sleep(self.server.delay)
+                self.server.messages += 1
+                self.reply("250 OK queued")
+            elif command == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(("127.0.0.1", 0), _SinkHandler)
+        self.delay = delay
+        self.messages = 0
+
+
+def per_message(port, recipients, part):
+    """One connect/QUIT per recipient, like the old send_email_report."""
+    start = time.perf_counter()
+    for to_email in recipients:
+        with smtplib.SMTP("127.0.0.1", port, timeout=30) as server:
+            server.send_message(build_message(SENDER, to_email, "bench", "body", part))
+    return time.perf_counter() - start
+
+
+def reused_session(port, recipients, part):
+    start = time.perf_counter()
+    with MailSession(SENDER, host="127.0.0.1", port=port, starttls=False, auth=False) as session:
+        for to_email in recipients:
+            session.send(build_message(SENDER, to_email, "bench", "body", part))
+    return time.perf_counter() - start, session.stats["connects"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMTP connection reuse benchmark")
+    parser.add_argument("--recipients", type=int, default=200)
+    parser.add_argument("--attachment-kb", type=int, default=300)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="Sink delay per accepted message")
+    args = parser.parse_args()
+
+    server = SinkServer(delay=args.delay_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    recipients = [f"user{i}@saferide.local" for i in range(args.recipients)]
+    pdf = os.urandom(args.attachment_kb * 1024)
+
+    start = time.perf_counter()
+    part = build_attachment(pdf, attachment_name="report.pdf")
+    encode_s = time.perf_counter() - start
+
+    print(f"{args.recipients} recipients, {args.attachment_kb} KB attachment "
+          f"(encoded once in {encode_s * 1000:.1f} ms)")
+    seconds = per_message(port, recipients, part)
+    print(f"{'connection per message':<24} {seconds:8.2f} s  {args.recipients / seconds:8.1f} msg/s  "
+          f"{args.recipients} connects")
+    seconds, connects = reused_session(port, recipients, part)
+    print(f"{'reused MailSession':<24} {seconds:8.2f} s  {args.recipients / seconds:8.1f} msg/s  "
+          f"{connects} connects")
+    print(f"sink accepted {server.messages} messages (default SMTP target: "
+          f"{mailreport.SMTP_HOST}:{mailreport.SMTP_PORT})")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
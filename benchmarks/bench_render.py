@@ -0,0 +1,117 @@
+# benchmarks/bench_render.py
+"""
+PDF render benchmark on synthetic report data (no database needed).
+
+Builds the same report story three ways and times each per report:
+  pyplot  - the old path: fresh stylesheet, pyplot figure, tight_layout, PNG
+  png     - report_render with a reused per-thread Agg figure
+  vector  - report_render with a ReportLab-native chart (no rasterization)
+and times save_chat_report on chat histories with growing markdown tables.
+
+    python -m benchmarks.bench_render --repeat 20
+"""
+import argparse
+import random
+import time
+from io import BytesIO
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
+from chat_report import save_chat_report
+from report_render import STYLES, bar_chart, report_table
+
+SIZES = {"small": (4, 10), "medium": (8, 50), "large": (12, 200)}   # classes, detail rows
+
+
+def synthetic(classes, details):
+    labels = [f"Class {i}" for i in range(classes)]
+    counts = [random.randint(1, 5000) for _ in labels]
+    rows = [["2025-01-01 12:00", random.choice(labels), "87.5%", f"video_{i}.mp4"] for i in range(details)]
+    return labels, counts, rows
+
+
+def legacy_story(labels, counts, rows):
+    styles = getSampleStyleSheet()
+    style = TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey)
+    ])
+    story = [Paragraph("Report", styles["Title"]), Spacer(1, 20)]
+    table = Table([["Class", "Count"]] + [list(r) for r in zip(labels, counts)], hAlign="LEFT")
+    table.setStyle(style)
+    story.append(table)
+    img_buf = BytesIO()
+    fig, ax = plt.subplots()
+    ax.bar(labels, counts)
+    plt.title("Detections by Class")
+    plt.xticks(rotation=45, ha="right")
+    plt.tight_layout()
+    plt.savefig(img_buf, format="png")
+    plt.close(fig)
+    img_buf.seek(0)
+    story.append(Image(img_buf, width=400, height=200))
+    table = Table([["Time", "Class", "Confidence", "File"]] + rows, hAlign="LEFT")
+    table.setStyle(style)
+    story.append(table)
+    return story
+
+
+def shared_story(labels, counts, rows, mode):
+    story = [Paragraph("Report", STYLES["Title"]), Spacer(1, 20)]
+    story.append(report_table([["Class", "Count"]] + [list(r) for r in zip(labels, counts)]))
+    story.append(bar_chart(labels, counts, "Detections by Class", mode))
+    story.append(report_table([["Time", "Class", "Confidence", "File"]] + rows))
+    return story
+
+
+def time_render(build, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        SimpleDocTemplate(BytesIO()).build(build())
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def chat_history(table_rows):
+    table = "| Class | Count | File |\n|---|---|---|\n" + "\n".join(
+        f"| Class {i % 7} | {i} | video_{i}.mp4 |" for i in range(table_rows)
+    )
+    return [{"role": "user", "content": "Show recent detections"},
+            {"role": "assistant", "content": f"Here they are:\n{table}\nDone."}] * 3
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF report render benchmark")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(f"{'report':<8} {'pyplot':>10} {'png':>10} {'vector':>10}   (median ms per report)")
+    for size, (classes, details) in SIZES.items():
+        data = synthetic(classes, details)
+        results = [
+            time_render(lambda: legacy_story(*data), args.repeat),
+            time_render(lambda: shared_story(*data, "png"), args.repeat),
+            time_render(lambda: shared_story(*data, "vector"), args.repeat),
+        ]
+        print(f"{size:<8} " + " ".join(f"{s * 1000:10.1f}" for s in results))
+
+    print(f"\n{'chat rows':<10} {'ms':>10}")
+    for rows in (10, 100, 500):
+        history = chat_history(rows)
+        samples = []
+        for _ in range(max(1, args.repeat // 4)):
+            start = time.perf_counter()
+            save_chat_report(history)
+            samples.append(time.perf_counter() - start)
+        print(f"{rows:<10} {sorted(samples)[len(samples) // 2] * 1000:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
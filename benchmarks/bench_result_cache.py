@@ -0,0 +1,102 @@
+# benchmarks/bench_result_cache.py
+"""
+Cost of the content-hash result cache on the upload path.
+
+In a scratch schema, fills detection_results with N entries of typical
+size, then measures
+  hash      - SHA-256 throughput of copy_hashed (what the uploader pays)
+  hit/miss  - result_cache.get latency
+  evict     - one size/age eviction pass down to half the stored bytes
+A cache hit replaces predict + S3 upload + INSERT for that file.
+
+    python -m benchmarks.bench_result_cache --entries 20000 --file-mb 50
+"""
+import argparse
+import io
+import os
+import random
+import time
+import db_utils
+from migrations import MIGRATIONS, apply_step
+from result_cache import ResultCache, copy_hashed
+
+SCHEMA = "saferide_bench_cache"
+CLASSES = ["With Helmet", "Without Helmet", "Accident", "Triple Riding"]
+
+
+def synthetic_records(n):
+    return [
+        {"Class": random.choice(CLASSES), "Confidence": round(random.uniform(25, 99), 2),
+         "Box Coordinates": [round(random.uniform(0, 1280), 1) for _ in range(4)],
+         "Frames": "0-0", "Boxes": 1}
+        for _ in range(n)
+    ]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Result cache benchmark")
+    parser.add_argument("--entries", type=int, default=20_000)
+    parser.add_argument("--lookups", type=int, default=2_000)
+    parser.add_argument("--file-mb", type=int, default=50, help="Size of the file hashed in memory")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    data = os.urandom(args.file_mb * 1024 * 1024)
+    start = time.perf_counter()
+    copy_hashed(io.BytesIO(data), io.BytesIO())
+    hash_s = time.perf_counter() - start
+    print(f"hash: {args.file_mb} MB in {hash_s * 1000:.0f} ms ({args.file_mb / hash_s:.0f} MB/s)")
+
+    conn = db_utils.get_db_connection()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    db_utils.DB_CONFIG = {**db_utils.DB_CONFIG, "options": f"-c search_path={SCHEMA}"}
+    db_utils.close_pool()
+    try:
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+        for _, _, step in MIGRATIONS:
+            apply_step(conn, step)
+
+        cache = ResultCache(max_mb=1024, evict_every=10 ** 9)
+        hashes = [f"{random.getrandbits(256):064x}" for _ in range(args.entries)]
+        start = time.perf_counter()
+        for digest in hashes:
+            cache.put(digest, "pytorch:bench", 1, synthetic_records(random.randint(0, 6)), f"s3://bench/{digest}")
+        fill_s = time.perf_counter() - start
+        stats = cache.stats()
+        print(f"fill: {args.entries:,} entries ({stats['bytes'] / 1e6:.1f} MB) in {fill_s:.1f}s "
+              f"({fill_s / args.entries * 1000:.2f} ms per put)")
+
+        for label, keys in (("hit", random.choices(hashes, k=args.lookups)),
+                            ("miss", [f"{random.getrandbits(256):064x}" for _ in range(args.lookups)])):
+            latencies = []
+            for digest in keys:
+                start = time.perf_counter()
+                cache.get(digest, "pytorch:bench")
+                latencies.append(time.perf_counter() - start)
+            print(f"{label:<5} p50 {percentile(latencies, 0.5) * 1000:.2f} ms, "
+                  f"p95 {percentile(latencies, 0.95) * 1000:.2f} ms")
+
+        cache.max_bytes = stats["bytes"] // 2
+        start = time.perf_counter()
+        removed = cache.evict()
+        print(f"evict: {removed:,} entries down to {cache.stats()['bytes'] / 1e6:.1f} MB "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        print(f"hit rate: {cache.stats()['hit_rate']:.1%}")
+    finally:
+        db_utils.close_pool()
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_router.py
+"""
+Structured query routing against the old RAG path, on a synthetic table.
+
+For each aggregate question the benchmark computes the true answer with
+hand-written SQL, then measures
+  router  - route_question + the whitelisted template (exact answer?)
+  rag     - the old context build: the last INDEX_WINDOW snippets, 10 recent
+            rows and the 24h/7d rollup counts (is the true number even in
+            the context the LLM sees?)
+With --llm both prompts are also sent to LLM_BASE_URL and timed end to end.
+
+    python -m benchmarks.bench_router --rows 200000
+"""
+import argparse
+import time
+from benchmarks.bench_schema import load_synthetic
+from db_utils import get_db_connection
+from faiss_index import INDEX_WINDOW
+from migrations import MIGRATIONS, apply_step
+from query_router import route_question, format_result, answer_messages
+
+SCHEMA = "saferide_bench_router"
+
+# question -> independent ground-truth SQL (single number)
+QUESTIONS = {
+    "How many helmet violations this month?":
+        "SELECT COUNT(*) FROM detections WHERE class = 'Without Helmet' "
+        "AND created_at >= date_trunc('month', LOCALTIMESTAMP)",
+    "How many accidents today?":
+        "SELECT COUNT(*) FROM detections WHERE class = 'Accident' "
+        "AND created_at >= date_trunc('day', LOCALTIMESTAMP)",
+    "How many accidents in the last 24 hours?":
+        "SELECT COUNT(*) FROM detections WHERE class = 'Accident' "
+        "AND created_at >= LOCALTIMESTAMP - INTERVAL '24 hours'",
+    "How many helmet violations last month?":
+        "SELECT COUNT(*) FROM detections WHERE class = 'Without Helmet' "
+        "AND created_at >= date_trunc('month', LOCALTIMESTAMP) - INTERVAL '1 month' "
+        "AND created_at < date_trunc('month', LOCALTIMESTAMP)",
+    "How many triple riding detections in the past 7 days?":
+        "SELECT COUNT(*) FROM detections WHERE class = 'Triple Riding' "
+        "AND created_at >= LOCALTIMESTAMP - INTERVAL '7 days'",
+    "Total number of accidents?":
+        "SELECT COUNT(*) FROM detections WHERE class = 'Accident'",
+}
+
+CLASS_OF = {"helmet": "Without Helmet", "accident": "Accident", "triple": "Triple Riding"}
+
+
+def old_context(cursor):
+    """What the old RAG path put in front of the LLM (minus the embedding search)."""
+    cursor.execute(
+        "SELECT id, class, confidence, file_name, created_at FROM detections ORDER BY id DESC LIMIT %s",
+        (INDEX_WINDOW,)
+    )
+    window = cursor.fetchall()
+    cursor.execute("SELECT id, class, confidence, file_name, created_at FROM detections ORDER BY created_at DESC LIMIT 10")
+    recent = cursor.fetchall()
+    counts = []
+    for label, table, interval in (("last 24h", "detection_rollup_hourly", "24 HOURS"),
+                                   ("last 7 days", "detection_rollup_daily", "7 DAYS")):
+        size = "hour" if table.endswith("hourly") else "day"
+        cursor.execute(
+            f"SELECT class, SUM(detections) FROM {table} "
+            "WHERE bucket >= date_trunc(%s, NOW() - %s::interval) GROUP BY class",
+            (size, interval)
+        )
+        counts.extend((label, c, int(n)) for c, n in cursor.fetchall())
+    return window, recent, counts
+
+
+def rag_can_answer(question, truth, window, counts):
+    """True if the exact number is derivable from the old context (best case for the LLM)."""
+    cls = next(c for key, c in CLASS_OF.items() if key in question.lower())
+    in_window = sum(1 for r in window if r[1] == cls)
+    return truth in {n for _, c, n in counts if c == cls} or (in_window == truth and len(window) < INDEX_WINDOW)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Router vs RAG benchmark for aggregate questions")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--llm", action="store_true", help="Also time LLM phrasing/answering via LLM_BASE_URL")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    client = None
+    if args.llm:
+        from llm_stream import create_llm_client, complete
+        client = create_llm_client()
+
+    conn = get_db_connection()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+        for _, _, step in MIGRATIONS:
+            apply_step(conn, step)
+        load_synthetic(cursor, args.rows, args.days)
+        cursor.execute("DELETE FROM detection_rollup_hourly; DELETE FROM detection_rollup_daily")
+        apply_step(conn, dict((v, step) for v, _, step in MIGRATIONS)[6])   # backfill rollups
+        print(f"Loaded {args.rows:,} synthetic detections over {args.days} days\n")
+
+        router_ok = rag_ok = 0
+        print(f"{'question':<56} {'truth':>7} {'router':>7} {'ms':>6} {'rag ok':>7} {'ms':>6}"
+              + (f" {'router llm':>11} {'rag llm':>8}" if client else ""))
+        for question, truth_sql in QUESTIONS.items():
+            cursor.execute(truth_sql)
+            truth = cursor.fetchone()[0]
+
+            start = time.perf_counter()
+            route = route_question(question)
+            cursor.execute(route.sql, route.params)
+            rows = cursor.fetchall()
+            router_s = time.perf_counter() - start
+            router_answer = rows[0][0] if route.intent == "count" else None
+
+            start = time.perf_counter()
+            window, recent, counts = old_context(cursor)
+            rag_s = time.perf_counter() - start
+            ok = rag_can_answer(question, truth, window, counts)
+
+            router_ok += router_answer == truth
+            rag_ok += ok
+            line = (f"{question:<56} {truth:>7} {router_answer!s:>7} {router_s * 1000:>6.1f} "
+                    f"{'yes' if ok else 'no':>7} {rag_s * 1000:>6.1f}")
+            if client:
+                _, t_router = complete(client, answer_messages(question, route, format_result(route, rows)))
+                context = "\n".join(f"- {r[1]} ({r[2]*100:.1f}%) in {r[3]} at {r[4]}" for r in window[:5] + recent)
+                context += "\n" + "\n".join(f"- {w}: {c} = {n}" for w, c, n in counts)
+                _, t_rag = complete(client, [{"role": "user", "content": f"{question}\n\n{context}"}])
+                line += f" {t_router.total * 1000:>9.0f}ms {t_rag.total * 1000:>6.0f}ms"
+            print(line)
+
+        print(f"\nExact answers: router {router_ok}/{len(QUESTIONS)}, "
+              f"RAG context contains the answer {rag_ok}/{len(QUESTIONS)}")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
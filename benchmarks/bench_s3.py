@@ -0,0 +1,105 @@
+# benchmarks/bench_s3.py
+"""
+S3 upload throughput for different multipart settings.
+
+Uploads the same set of random files
+  inline      - one blocking upload_file per file with boto3 defaults (the old path)
+  pool        - S3Uploader with each --chunk-mb x --concurrency combination
+and reports wall time, MB/s and how long the caller was blocked (the time
+until detection results could be shown).
+
+Runs against S3_ENDPOINT_URL (e.g. MinIO), or an in-process moto server
+with --moto (pip install "moto[server]").
+
+    python -m benchmarks.bench_s3 --moto --files 4 --size-mb 64 --chunk-mb 8 16 --concurrency 1 4 8
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from s3_uploader import MB, S3_ENDPOINT_URL, S3Uploader, create_s3_client, transfer_config
+
+BUCKET = "saferide-bench-uploads"
+
+
+def make_files(directory, count, size_mb):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"clip_{i}.mp4")
+        with open(path, "wb") as f:
+            for _ in range(size_mb):
+                f.write(os.urandom(MB))
+        paths.append(path)
+    return paths
+
+
+def run_inline(client, paths):
+    start = time.perf_counter()
+    for i, path in enumerate(paths):
+        client.upload_file(path, BUCKET, f"inline/{i}.mp4")
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed
+
+
+def run_pool(client, paths, workers, chunk_mb, concurrency):
+    uploader = S3Uploader(BUCKET, workers, client, transfer_config(chunk_mb, chunk_mb, concurrency), retries=0)
+    start = time.perf_counter()
+    uploads = [uploader.submit(path, f"pool/{chunk_mb}_{concurrency}/{i}.mp4") for i, path in enumerate(paths)]
+    blocked = time.perf_counter() - start
+    ok = all(upload.wait() for upload in uploads)
+    elapsed = time.perf_counter() - start
+    uploader.shutdown()
+    if not ok:
+        raise RuntimeError(next(u.error for u in uploads if u.error))
+    return elapsed, blocked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="S3 uploader benchmark")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--chunk-mb", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--moto", action="store_true", help="Start an in-process moto S3 server")
+    args = parser.parse_args()
+
+    server = None
+    endpoint = S3_ENDPOINT_URL
+    if args.moto:
+        from moto.server import ThreadedMotoServer
+        server = ThreadedMotoServer(port=0, verbose=False)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint = f"http://{host}:{port}"
+        for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+            os.environ.setdefault(name, "bench")
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    if not endpoint:
+        parser.error("set S3_ENDPOINT_URL (MinIO) or pass --moto; this benchmark never uses real AWS")
+
+    workdir = tempfile.mkdtemp(prefix="saferide_bench_s3_")
+    client = create_s3_client(endpoint, args.workers, max(args.concurrency))
+    try:
+        client.create_bucket(Bucket=BUCKET)
+        paths = make_files(workdir, args.files, args.size_mb)
+        total_mb = args.files * args.size_mb
+        print(f"{args.files} files x {args.size_mb} MB -> {endpoint}\n")
+        print(f"{'mode':<10} {'chunk MB':>8} {'conc':>5} {'wall s':>7} {'MB/s':>7} {'blocked ms':>11}")
+
+        elapsed, blocked = run_inline(client, paths)
+        print(f"{'inline':<10} {'8':>8} {'10':>5} {elapsed:>7.2f} {total_mb / elapsed:>7.1f} {blocked * 1000:>11.0f}")
+        for chunk_mb in args.chunk_mb:
+            for concurrency in args.concurrency:
+                elapsed, blocked = run_pool(client, paths, args.workers, chunk_mb, concurrency)
+                print(f"{'pool':<10} {chunk_mb:>8} {concurrency:>5} {elapsed:>7.2f} "
+                      f"{total_mb / elapsed:>7.1f} {blocked * 1000:>11.1f}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        if server:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
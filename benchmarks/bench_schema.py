@@ -0,0 +1,141 @@
+# benchmarks/bench_schema.py
+"""
+Query-plan benchmark for the detections schema on a synthetic table.
+
+Builds detections in a scratch schema with the real migrations, loads
+synthetic rows, then runs the dashboard/report/chatbot queries with
+EXPLAIN ANALYZE before and after the index migration.
+
+    python -m benchmarks.bench_schema --rows 10000000
+"""
+import argparse
+import json
+import time
+from db_utils import get_db_connection
+from migrations import MIGRATIONS, apply_step
+
+SCHEMA = "saferide_bench"
+INDEX_VERSION = 5
+
+QUERIES = {
+    "recent 10 (chatbot)": """
+        SELECT id, class, confidence, file_name, created_at
+        FROM detections ORDER BY created_at DESC LIMIT 10
+    """,
+    "last 24h by class": """
+        SELECT class, COUNT(*) FROM detections
+        WHERE created_at >= NOW() - INTERVAL '24 HOURS' GROUP BY class
+    """,
+    "monthly by class": """
+        SELECT class, COUNT(*) FROM detections
+        WHERE created_at >= NOW() - INTERVAL '30 DAYS' GROUP BY class
+    """,
+    "weekly per day": """
+        SELECT date_trunc('day', created_at), COUNT(*) FROM detections
+        WHERE created_at >= NOW() - INTERVAL '7 DAYS' GROUP BY 1
+    """,
+    "accident report": """
+        SELECT class, COUNT(*) FROM detections
+        WHERE class IN (SELECT name FROM detection_classes WHERE name ILIKE '%Accident%')
+        GROUP BY class
+    """,
+    "accidents this week": """
+        SELECT COUNT(*) FROM detections
+        WHERE class = 'Accident' AND created_at >= NOW() - INTERVAL '7 DAYS'
+    """,
+}
+
+
+def load_synthetic(cursor, rows, days):
+    # Class mix roughly matches real traffic: mostly compliant riders, few accidents
+    cursor.execute("""
+        INSERT INTO detection_classes (name)
+        VALUES ('With Helmet'), ('Without Helmet'), ('Accident'), ('Triple Riding')
+        ON CONFLICT (name) DO NOTHING
+    """)
+    cursor.execute("ALTER TABLE detections DISABLE TRIGGER detections_class_id")
+    cursor.execute("""
+        INSERT INTO detections (class, class_id, confidence, box_coordinates, x1, y1, x2, y2,
+                                file_name, created_at)
+        SELECT c.name, c.id, 0.25 + random() * 0.75, NULL,
+               x, y, x + 40, y + 80,
+               'cam_' || (g %% 50) || '.jpg',
+               NOW() - (%(days)s * INTERVAL '1 day') * (1 - g::float / %(rows)s)
+        FROM generate_series(1, %(rows)s) AS g
+        CROSS JOIN LATERAL (SELECT (random() * 600)::real AS x, (random() * 400)::real AS y, random() AS r
+                            WHERE g > 0) v
+        JOIN detection_classes c ON c.name = CASE
+            WHEN v.r < 0.60 THEN 'With Helmet'
+            WHEN v.r < 0.92 THEN 'Without Helmet'
+            WHEN v.r < 0.94 THEN 'Accident'
+            ELSE 'Triple Riding' END
+    """, {"rows": rows, "days": days})
+    cursor.execute("ALTER TABLE detections ENABLE TRIGGER detections_class_id")
+    cursor.execute("VACUUM ANALYZE detections")
+
+
+def explain(cursor, sql):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    plan = plan[0]
+    node = plan["Plan"]
+    scans = []
+
+    def walk(n):
+        if "Scan" in n["Node Type"]:
+            scans.append(n["Node Type"] + (f" ({n['Index Name']})" if "Index Name" in n else ""))
+        for child in n.get("Plans", []):
+            walk(child)
+
+    walk(node)
+    return plan["Execution Time"], ", ".join(dict.fromkeys(scans))
+
+
+def run_queries(cursor, label):
+    print(f"\n== {label}")
+    for name, sql in QUERIES.items():
+        ms, scans = explain(cursor, sql)
+        print(f"{name:<24} {ms:10.1f} ms   {scans}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="detections query-plan benchmark")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=365, help="Time span of synthetic rows")
+    parser.add_argument("--keep", action="store_true", help=f"Keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+        cursor.execute(f"SET search_path TO {SCHEMA}")
+        for version, _, step in MIGRATIONS:
+            if version < INDEX_VERSION:
+                apply_step(conn, step)
+
+        start = time.perf_counter()
+        load_synthetic(cursor, args.rows, args.days)
+        print(f"Loaded {args.rows:,} rows in {time.perf_counter() - start:.1f}s")
+        run_queries(cursor, "without indexes")
+
+        start = time.perf_counter()
+        for version, _, step in MIGRATIONS:
+            if version >= INDEX_VERSION:
+                apply_step(conn, step)
+        cursor.execute("VACUUM ANALYZE detections")
+        print(f"\nBuilt indexes in {time.perf_counter() - start:.1f}s")
+        run_queries(cursor, "with indexes")
+    finally:
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# benchmarks/bench_service.py
+"""
+Detection service throughput for different worker counts.
+
+Starts a DetectionService (plus its HTTP API on a free port) for each worker
+count, waits until every worker has loaded the model, submits the same files
+N times through DetectionClient and reports jobs/sec and latency percentiles.
+
+    python -m benchmarks.bench_service snapshots/ --jobs 64 --workers 1 2 4
+"""
+import argparse
+import threading
+import time
+from batch_detect import collect_images
+from detection_service import DetectionClient, DetectionService, serve
+
+
+def run(sources, jobs, workers, model_path):
+    service = DetectionService(workers, model_path).start()
+    start = time.perf_counter()
+    if not service.wait_ready(timeout=600):
+        service.stop()
+        raise RuntimeError("workers did not load the model")
+    load_s = time.perf_counter() - start
+
+    server = serve(service, "127.0.0.1", 0)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = DetectionClient(f"http://127.0.0.1:{server.server_address[1]}")
+    try:
+        start = time.perf_counter()
+        ids = [client.submit_path(sources[i % len(sources)]) for i in range(jobs)]
+        peak_queue = client.stats()["queue_depth"]
+        for job_id in ids:
+            for _ in client.stream(job_id):
+                pass
+        elapsed = time.perf_counter() - start
+        stats = client.stats()
+    finally:
+        server.shutdown()
+        service.stop()
+    return load_s, elapsed, peak_queue, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection service throughput benchmark")
+    parser.add_argument("inputs", nargs="+", help="Image/video files or folders")
+    parser.add_argument("--jobs", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--model", default=None, help="Model path (default: MODEL_PATH)")
+    args = parser.parse_args()
+
+    sources = collect_images(args.inputs)
+    if not sources:
+        parser.error("no input files found")
+
+    print(f"{'workers':>7} {'load s':>7} {'jobs/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak queue':>11} {'failed':>7}")
+    for workers in args.workers:
+        load_s, elapsed, peak_queue, stats = run(sources, args.jobs, workers, args.model)
+        print(f"{workers:>7} {load_s:>7.1f} {args.jobs / elapsed:>8.2f} "
+              f"{stats['latency_p50_s'] * 1000:>8.0f} {stats['latency_p95_s'] * 1000:>8.0f} "
+              f"{peak_queue:>11} {stats['failed']:>7}")
+
+
+if __name__ == "__main__":
+    main()
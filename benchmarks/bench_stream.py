@@ -0,0 +1,91 @@
+# benchmarks/bench_stream.py
+"""
+Peak memory of the streaming video pipeline for videos of different lengths.
+
+Runs detection_pipeline.process_video_stream on each video (the real model,
+DetectionWriter and persistence stage) while a thread samples the process
+RSS, and reports the baseline, peak and growth next to the frame count. With
+streaming the growth should stay about the same for a 1-minute and a
+30-minute clip. Detections are written to the configured database/bucket.
+
+    python -m benchmarks.bench_stream clip_1min.mp4 clip_30min.mp4 --frame-stride 2
+"""
+import argparse
+import gc
+import threading
+import time
+from pathlib import Path
+from detection_pipeline import get_model, process_video_stream
+from detection_store import StageTimings
+
+MB = 1024 * 1024
+
+
+class PeakRSS:
+    """Samples the RSS of this process every `interval` seconds and keeps the maximum."""
+
+    def __init__(self, interval=0.05):
+        import psutil
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def rss(self):
+        return self.process.memory_info().rss
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss())
+        return False
+
+
+def frame_count(path):
+    import cv2
+    capture = cv2.VideoCapture(path)
+    try:
+        return int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming video pipeline memory benchmark")
+    parser.add_argument("videos", nargs="+", help="Video files, e.g. a short and a long clip")
+    parser.add_argument("--frame-stride", type=int, default=1)
+    args = parser.parse_args()
+
+    try:
+        import psutil  # noqa: F401
+    except ImportError:
+        parser.error("psutil is required (pip install psutil)")
+
+    get_model()                       # model load is not part of the per-video growth
+    print(f"{'video':<28} {'frames':>8} {'seconds':>8} {'fps':>7} {'base MB':>8} {'peak MB':>8} "
+          f"{'growth MB':>10} {'events':>7}")
+    for video in args.videos:
+        frames = frame_count(video)
+        gc.collect()
+        start = time.perf_counter()
+        with PeakRSS() as sampler:
+            base = sampler.peak
+            records, _, _ = process_video_stream(video, Path(video).name, StageTimings(), args.frame_stride)
+        elapsed = time.perf_counter() - start
+        print(f"{Path(video).name:<28} {frames:>8} {elapsed:>8.1f} {frames / elapsed:>7.1f} "
+              f"{base / MB:>8.1f} {sampler.peak / MB:>8.1f} {(sampler.peak - base) / MB:>10.1f} {len(records):>7}")
+
+
+if __name__ == "__main__":
+    main()
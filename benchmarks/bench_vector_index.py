@@ -0,0 +1,188 @@
+# benchmarks/bench_vector_index.py
+"""
+Recall@k and query latency of the vector index types at history scale.
+
+Synthetic, clustered unit vectors with a low intrinsic dimension stand in
+for detection embeddings (no database or embedding model needed); every
+vector gets a class (the same
+mix as bench_schema) and a timestamp spread over a year. For each size and
+index type the benchmark builds the index the way vector_index does
+(factory string, training sample, chunked adds), then runs single queries
+  none         - unfiltered, for each --nprobe / --ef setting
+  class        - accidents only (~2% of vectors)
+  class+month  - accidents in one month (~0.2%)
+and compares them with exact (brute-force) neighbours under the same filter.
+IVF-PQ is also scored on its RERANK_FACTOR x k candidates, which is its
+recall after vector_index re-ranks them with exact distances.
+Types whose raw vectors would not fit in --max-gb are skipped.
+
+    python -m benchmarks.bench_vector_index --sizes 10000 1000000 10000000 --types flat ivf hnsw ivfpq
+"""
+import argparse
+import os
+import tempfile
+import time
+import faiss
+import numpy as np
+from vector_index import HNSW_M, RERANK_FACTOR, factory_string, filtered_search, train_size
+
+CLASS_MIX = [0.60, 0.32, 0.02, 0.06]       # With Helmet, Without Helmet, Accident, Triple Riding
+ACCIDENT = 2
+DAYS = 365
+CHUNK = 100_000
+INTRINSIC_DIM = 32
+
+
+class SyntheticHistory:
+    def __init__(self, n, dim, clusters, seed=0):
+        self.n = n
+        self.dim = dim
+        rng = np.random.default_rng(seed)
+        self.centers = rng.standard_normal((clusters, dim), dtype="float32") / np.sqrt(dim)
+        self.basis = rng.standard_normal((INTRINSIC_DIM, dim), dtype="float32") / np.sqrt(dim)
+        self.seed = seed
+
+    def vectors(self, rng, count):
+        v = self.centers[rng.integers(len(self.centers), size=count)]
+        # spread within a cluster (~0.5) below the distance between centres (~1.4)
+        v = v + 0.5 / np.sqrt(INTRINSIC_DIM) * rng.standard_normal((count, INTRINSIC_DIM), dtype="float32") @ self.basis
+        v = v + 0.05 / np.sqrt(self.dim) * rng.standard_normal((count, self.dim), dtype="float32")
+        return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+    def chunks(self, chunk=CHUNK):
+        """(ids, vectors, class codes, day) chunks, identical on every pass."""
+        for start in range(0, self.n, chunk):
+            count = min(chunk, self.n - start)
+            rng = np.random.default_rng((self.seed, 0, start))
+            ids = np.arange(start, start + count, dtype="int64")
+            classes = rng.choice(len(CLASS_MIX), size=count, p=CLASS_MIX).astype("int16")
+            yield ids, self.vectors(rng, count), classes, ids * DAYS // self.n
+
+    def sample(self, count):
+        return self.vectors(np.random.default_rng((self.seed, 1)), count)
+
+    def queries(self, count):
+        return self.vectors(np.random.default_rng((self.seed, 2)), count)
+
+
+FILTERS = {
+    "none": lambda classes, day: None,
+    "class": lambda classes, day: classes == ACCIDENT,
+    "class+month": lambda classes, day: (classes == ACCIDENT) & (day >= 200) & (day < 230),
+}
+
+
+def ground_truth(history, queries, k):
+    """Exact top-k ids per filter, streamed over the chunks. Also returns the id/class/day arrays."""
+    best = {name: (np.full((len(queries), k), np.inf, "float32"), np.full((len(queries), k), -1, "int64"))
+            for name in FILTERS}
+    meta = []
+    for ids, vectors, classes, day in history.chunks():
+        meta.append((classes, day))
+        distances = 2 - 2 * queries @ vectors.T                  # squared L2 between unit vectors
+        for name, make_mask in FILTERS.items():
+            mask = make_mask(classes, day)
+            d = distances if mask is None else np.where(mask, distances, np.inf)
+            top_d, top_i = best[name]
+            d = np.hstack([top_d, d])
+            i = np.hstack([top_i, np.broadcast_to(ids, (len(queries), len(ids)))])
+            order = np.argsort(d, axis=1)[:, :k]
+            best[name] = (np.take_along_axis(d, order, 1), np.take_along_axis(i, order, 1))
+    classes = np.concatenate([m[0] for m in meta])
+    day = np.concatenate([m[1] for m in meta])
+    return {name: ids for name, (_, ids) in best.items()}, classes, day
+
+
+def raw_gb(kind, n, dim):
+    """Approximate memory of the index (PQ: 48-byte codes, others: float vectors + graph)."""
+    if kind == "ivfpq":
+        return n * (dim // 8 + 8) / 1e9
+    return n * (dim * 4 + (HNSW_M * 2 * 4 if kind == "hnsw" else 0) + 16) / 1e9
+
+
+def build(kind, history):
+    index = faiss.index_factory(history.dim, factory_string(kind, history.dim, history.n))
+    start = time.perf_counter()
+    if not index.is_trained:
+        index.train(history.sample(train_size(kind, history.n)))
+    for ids, vectors, _, _ in history.chunks():
+        index.add_with_ids(vectors, ids)
+    return index, time.perf_counter() - start
+
+
+def file_mb(index):
+    fd, path = tempfile.mkstemp(suffix=".faiss")
+    os.close(fd)
+    try:
+        faiss.write_index(index, path)
+        return os.path.getsize(path) / 1e6
+    finally:
+        os.remove(path)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def run_queries(index, ids, queries, truth, k, mask, nprobe, ef_search, candidates=1):
+    """Mean recall@k (of the k * candidates results) and p50/p95 latency."""
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = filtered_search(index, ids, query.reshape(1, -1), k * candidates, mask, nprobe, ef_search)
+        latencies.append(time.perf_counter() - start)
+        expected = {int(i) for i in expected if i >= 0}
+        hits += len(expected & set(found)) / max(1, len(expected))
+    return hits / len(queries), percentile(latencies, 0.5), percentile(latencies, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector index recall/latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--types", nargs="+", choices=["flat", "ivf", "ivfpq", "hnsw"],
+                        default=["flat", "ivf", "hnsw", "ivfpq"])
+    parser.add_argument("--dim", type=int, default=384, help="all-MiniLM-L6-v2 embeddings are 384-d")
+    parser.add_argument("--clusters", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 16, 64])
+    parser.add_argument("--ef", type=int, nargs="+", default=[32, 64, 256])
+    parser.add_argument("--max-gb", type=float, default=8.0, help="Skip index types larger than this")
+    args = parser.parse_args()
+
+    print(f"dim={args.dim}, {args.clusters} clusters, {args.queries} queries, recall@{args.k}, "
+          f"{faiss.omp_get_max_threads()} threads\n")
+    print(f"{'vectors':>10} {'type':<6} {'factory':<24} {'build s':>8} {'MB':>8} {'filter':<12} "
+          f"{'param':>6} {'recall':>7} {'rerank':>7} {'p50 ms':>7} {'p95 ms':>7}")
+    for n in args.sizes:
+        history = SyntheticHistory(n, args.dim, args.clusters)
+        queries = history.queries(args.queries)
+        start = time.perf_counter()
+        truth, classes, day = ground_truth(history, queries, args.k)
+        print(f"{n:>10,} exact neighbours in {time.perf_counter() - start:.1f}s")
+        ids = np.arange(n, dtype="int64")
+        for kind in args.types:
+            if raw_gb(kind, n, args.dim) > args.max_gb:
+                print(f"{n:>10,} {kind:<6} skipped (~{raw_gb(kind, n, args.dim):.1f} GB > --max-gb)")
+                continue
+            index, build_s = build(kind, history)
+            size_mb = file_mb(index)
+            factory = factory_string(kind, args.dim, n)
+            sweep = args.ef if kind == "hnsw" else args.nprobe if kind in ("ivf", "ivfpq") else [0]
+            for name, make_mask in FILTERS.items():
+                mask = make_mask(classes, day)
+                # filtered searches scale nprobe/efSearch themselves: only the default setting
+                for param in sweep if mask is None else [sweep[len(sweep) // 2]]:
+                    recall, p50, p95 = run_queries(index, ids, queries, truth[name], args.k, mask,
+                                                   nprobe=param or 1, ef_search=param or 1)
+                    reranked = "-"
+                    if kind == "ivfpq":
+                        reranked = f"{run_queries(index, ids, queries, truth[name], args.k, mask, param, param, RERANK_FACTOR)[0]:.3f}"
+                    print(f"{n:>10,} {kind:<6} {factory:<24} {build_s:>8.1f} {size_mb:>8.1f} {name:<12} "
+                          f"{param or '-':>6} {recall:>7.3f} {reranked:>7} {p50 * 1000:>7.2f} {p95 * 1000:>7.2f}")
+            del index
+
+
+if __name__ == "__main__":
+    main()
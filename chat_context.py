@@ -0,0 +1,144 @@
+# chat_context.py
+"""
+Token budget for chatbot prompts.
+
+Keeps each prompt under CONTEXT_TOKEN_BUDGET: the newest chat turns are sent
+verbatim, older ones are folded into a short extractive summary, detections
+already in the semantic matches are dropped from the recent-logs block, and
+each retrieval block is capped. Token counts are estimated (~4 characters per
+token), which is close enough for budgeting without a tokenizer dependency.
+"""
+import os
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1200"))
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "800"))
+SUMMARY_TOKEN_BUDGET = 200    # share of the history budget kept for the summary
+SUMMARY_CHARS_PER_TURN = 120
+MESSAGE_OVERHEAD_TOKENS = 4   # role/format tokens per chat message
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def message_tokens(messages):
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def _clip(text, limit):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+# -----------------------------
+# Chat history window
+# -----------------------------
+def cap_lines(lines, budget):
+    """Leading lines that fit in `budget` tokens."""
+    out, used = [], 0
+    for line in lines:
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        out.append(line)
+        used += cost
+    return out
+
+
+def summarize_turns(turns, budget):
+    """
+    Extractive one-line-per-turn summary of older messages (no extra LLM
+    call), keeping the most recent lines that fit in `budget` tokens.
+    """
+    lines = [
+        f"- {'User' if msg['role'] == 'user' else 'Assistant'}: {_clip(msg['content'], SUMMARY_CHARS_PER_TURN)}"
+        for msg in reversed(turns)
+    ]
+    header = "Earlier in this conversation:"
+    lines = cap_lines(lines, budget - estimate_tokens(header) - MESSAGE_OVERHEAD_TOKENS)
+    if not lines:
+        return None
+    return header + "\n" + "\n".join(reversed(lines))
+
+
+def window_history(history, budget=HISTORY_TOKEN_BUDGET):
+    """
+    Newest turns that fit in `budget` tokens, preceded by a summary of the
+    older ones in whatever budget is left. Returns (messages, dropped_turns).
+    """
+    if message_tokens(history) <= budget:
+        return list(history), 0
+
+    recent_budget = budget - min(SUMMARY_TOKEN_BUDGET, budget // 2)
+    kept, used = [], 0
+    for msg in reversed(history):
+        cost = estimate_tokens(msg["content"]) + MESSAGE_OVERHEAD_TOKENS
+        if used + cost > recent_budget:
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+    older = history[:len(history) - len(kept)]
+    if older:
+        summary = summarize_turns(older, budget - used)
+        if summary:
+            kept.insert(0, {"role": "system", "content": summary})
+    return kept, len(older)
+
+
+# -----------------------------
+# Retrieval blocks
+# -----------------------------
+def build_rag_context(matches, recent_rows, counts, budget=RETRIEVAL_TOKEN_BUDGET):
+    """
+    Retrieval text for a RAG turn, split over semantic matches, recent rows and
+    rollup counts. `matches` are (id, text) pairs from the FAISS index and
+    `recent_rows` are (id, class, confidence, file_name, created_at) tuples;
+    recent rows already present in the matches are skipped.
+    """
+    seen = {i for i, _ in matches}
+    match_lines = [f"- {text}" for _, text in matches]
+    recent_lines = [
+        f"- {r[1]} ({r[2]*100:.1f}%) in {r[3]} at {r[4]}"
+        for r in recent_rows if r[0] not in seen
+    ]
+    count_lines = [f"- {window}: {cls} = {count}" for window, cls, count in counts]
+
+    # Counts are small and answer most questions; matches get the larger share
+    count_lines = cap_lines(count_lines, budget // 4)
+    match_lines = cap_lines(match_lines, (budget - sum(map(estimate_tokens, count_lines))) // 2)
+    recent_lines = cap_lines(
+        recent_lines,
+        budget - sum(map(estimate_tokens, count_lines)) - sum(map(estimate_tokens, match_lines))
+    )
+    stats = {
+        "matches": len(match_lines),
+        "recent": len(recent_lines),
+        "duplicates_dropped": sum(1 for r in recent_rows if r[0] in seen),
+        "counts": len(count_lines),
+    }
+    text = (
+        "Semantic matches:\n" + "\n".join(match_lines) +
+        "\n\nRecent structured DB logs:\n" + "\n".join(recent_lines) +
+        "\n\nDetection counts:\n" + "\n".join(count_lines)
+    )
+    return text, stats
+
+
+def build_messages(system_prompt, history, user_content, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Full prompt: system prompt, windowed history and the new user turn.
+    The history budget shrinks if the user turn is large. Returns (messages, stats).
+    """
+    fixed = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_content}]
+    history_budget = min(HISTORY_TOKEN_BUDGET, max(budget - message_tokens(fixed), 0))
+    windowed, dropped = window_history(history, history_budget)
+    messages = [fixed[0], *windowed, fixed[1]]
+    stats = {
+        "prompt_tokens": message_tokens(messages),
+        "history_tokens": message_tokens(windowed),
+        "turns_sent": len(windowed),
+        "turns_summarized": dropped,
+    }
+    return messages, stats
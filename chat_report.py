@@ -1,10 +1,9 @@
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
 from reportlab.lib.units import cm
 from io import BytesIO
 from datetime import datetime
 import re
+from report_render import STYLES, USER_STYLE, ASSISTANT_STYLE, CHAT_TABLE_STYLE, table_cell
 
 # -----------------------------
 # Markdown table parser
@@ -33,33 +32,14 @@ def build_table(table_data):
     """
     num_cols = len(table_data[0])
     
-    # Convert all table cells to Paragraph for proper text wrapping
-    styles = getSampleStyleSheet()
-    cell_style = ParagraphStyle(
-        "CellStyle",
-        parent=styles["Normal"],
-        fontSize=9,
-        leading=11,
-        alignment=0  # 0=left, 1=center, 2=right
-    )
-    table_data_paragraphs = []
-    for i, row in enumerate(table_data):
-        new_row = []
-        for cell in row:
-            new_row.append(Paragraph(cell, cell_style))
-        table_data_paragraphs.append(new_row)
-    
     col_widths = [max(3*cm, 12*cm//num_cols)] * num_cols  # flexible width
+
+    # Long or marked-up cells become Paragraphs for proper text wrapping
+    table_data_paragraphs = [
+        [table_cell(cell, width) for cell, width in zip(row, col_widths)] for row in table_data
+    ]
     tbl = Table(table_data_paragraphs, hAlign="LEFT", colWidths=col_widths)
-    tbl.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.darkblue),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('ALIGN', (0,0), (-1,0), 'CENTER'),  # header center
-        ('ALIGN', (0,1), (-1,-1), 'LEFT'),   # body left
-        ('ROWBACKGROUNDS', (1,1), (-1,-1), [colors.whitesmoke, colors.lightcyan])
-    ]))
+    tbl.setStyle(CHAT_TABLE_STYLE)
     return tbl
 
 # -----------------------------
@@ -68,21 +48,9 @@ def build_table(table_data):
 def save_chat_report(chat_history, output_path="chat_report.pdf"):
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=(600, 800))
-    styles = getSampleStyleSheet()
-    user_style = ParagraphStyle(
-        "UserStyle",
-        parent=styles["Normal"],
-        alignment=0,
-        textColor=colors.darkblue,
-        spaceAfter=6
-    )
-    assistant_style = ParagraphStyle(
-        "AssistantStyle",
-        parent=styles["Normal"],
-        alignment=0,
-        textColor=colors.black,
-        spaceAfter=6
-    )
+    styles = STYLES
+    user_style = USER_STYLE
+    assistant_style = ASSISTANT_STYLE
 
     story = []
 
@@ -1,74 +1,63 @@
-import os
+import time
 import streamlit as st
-import faiss
-import numpy as np
-from datetime import datetime, timedelta
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
-from db_utils import get_db_connection
+import resources
+from llm_stream import create_llm_client, complete
+from chat_context import build_messages, build_rag_context, message_tokens
+from query_router import route_question, run_route, format_result, answer_messages, search_filters
+from response_cache import response_cache, route_answer_cache
+from db_utils import db_cursor, execute_prepared
 from chat_report import save_chat_report
+from rollups import recent_class_counts
 
 # -----------------------------
 # Fetch recent detections
 # -----------------------------
 def fetch_recent_detections(limit=500):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            SELECT id, class, confidence, file_name, created_at
-            FROM detections
-            ORDER BY created_at DESC
-            LIMIT %s
-            """,
-            (limit,)
-        )
-        rows = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return rows
+        with db_cursor() as cursor:
+            execute_prepared(
+                cursor,
+                "recent_detections",
+                """
+                SELECT id, class, confidence, file_name, created_at
+                FROM detections
+                ORDER BY created_at DESC
+                LIMIT $1
+                """,
+                (limit,)
+            )
+            return cursor.fetchall()
     except Exception as e:
         st.error(f"DB Error: {e}")
         return []
 
+def fetch_detections_version():
+    """Detections write counter, the watermark for cached routed answers (None if the database is unavailable)."""
+    try:
+        with db_cursor() as cursor:
+            cursor.execute("SELECT version FROM detection_writes")
+            return cursor.fetchone()[0]
+    except Exception:
+        return None
+
 # -----------------------------
-# Load embedding model
+# Lazily loaded resources (built on the first chatbot query)
 # -----------------------------
-@st.cache_resource
 def load_embedding_model():
+    from sentence_transformers import SentenceTransformer
     return SentenceTransformer("all-MiniLM-L6-v2")
 
-embedding_model = load_embedding_model()
-
-# -----------------------------
-# Build FAISS index
-# -----------------------------
-@st.cache_resource
-def build_faiss_index():
-    detections = fetch_recent_detections(500)
-    texts = [f"{r[1]} ({r[2]*100:.1f}%) in {r[3]} at {r[4]}" for r in detections]
-
-    if texts:
-        vectors = embedding_model.encode(texts, convert_to_numpy=True)
-        dim = vectors.shape[1]
-        index = faiss.IndexFlatL2(dim)
-        index.add(vectors)
-    else:
-        index = None
-        vectors = np.array([])
+def create_index_manager():
+    # Whole detections history (IVF/PQ/HNSW by size); see vector_index.py
+    from vector_index import DetectionVectorIndex
+    return DetectionVectorIndex(resources.get("embedder"))
 
-    return index, texts, detections
+resources.register("embedder", load_embedding_model)
+resources.register("faiss_index", create_index_manager)
+resources.register("llm_client", create_llm_client)   # Groq (or LLM_BASE_URL) client
 
-faiss_index, faiss_texts, faiss_metadata = build_faiss_index()
-
-# -----------------------------
-# Groq LLM Client
-# -----------------------------
-llm_client = OpenAI(
-    api_key=os.getenv("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
-)
+STREAM_REFRESH_SECONDS = 0.05   # redraw the streaming reply at most 20x/second
+RECENT_FALLBACK_ROWS = 50       # recent rows used while the search index is still being built
 
 # -----------------------------
 # Streamlit Chatbot UI
@@ -83,6 +72,8 @@ def chatbot_ui():
     # -----------------------------
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
+    if "llm_latency" not in st.session_state:
+        st.session_state.llm_latency = []
 
     # -----------------------------
     # Input: Search box + buttons (vertical)
@@ -99,84 +90,150 @@ def chatbot_ui():
         if clear_btn:
             st.session_state.chat_history = []
 
-    # -----------------------------
-    # Refresh FAISS index periodically
-    # -----------------------------
-    def refresh_faiss_if_needed(interval_minutes=2):
-        last_update = st.session_state.get("faiss_last_update", datetime.min)
-        if datetime.now() - last_update > timedelta(minutes=interval_minutes):
-            index, texts, metadata = build_faiss_index()
-            st.session_state.faiss_index = index
-            st.session_state.faiss_texts = texts
-            st.session_state.faiss_metadata = metadata
-            st.session_state.faiss_last_update = datetime.now()
-
-    if "faiss_index" not in st.session_state:
-        st.session_state.faiss_index = faiss_index
-        st.session_state.faiss_texts = faiss_texts
-        st.session_state.faiss_metadata = faiss_metadata
-        st.session_state.faiss_last_update = datetime.now()
-
-    refresh_faiss_if_needed(interval_minutes=2)
-
     # -----------------------------
     # Handle query submission
     # -----------------------------
     if user_query_input and send_btn:
         user_query = user_query_input
+        query_start = time.perf_counter()
+
+        # Count/time-range questions run a whitelisted SQL template; the LLM only phrases the result
+        route = route_question(user_query)
 
-        # Determine RAG mode
+        # Determine RAG mode (fuzzy lookups keep using vector search)
         RAG_KEYWORDS = ["helmet", "accident", "detection", "ride", "crash", "logs", "safety"]
-        use_rag = any(word in user_query.lower() for word in RAG_KEYWORDS)
-
-        retrieved_texts = ""
-        if use_rag:
-            index = st.session_state.faiss_index
-            texts = st.session_state.faiss_texts
-            if index and len(texts) > 0:
-                q_vec = embedding_model.encode([user_query], convert_to_numpy=True)
-                k = min(5, len(texts))
-                D, I = index.search(q_vec, k=k)
-                for idx in I[0]:
-                    retrieved_texts += texts[idx] + "\n"
-
-            recent_detections = fetch_recent_detections(10)
-            db_summary = ""
-            for r in recent_detections:
-                db_summary += f"- {r[1]} ({r[2]*100:.1f}%) in {r[3]} at {r[4]}\n"
-
-            messages = [
-                {"role": "system", "content": "You are SafeRideAI assistant. Answer queries about helmet/accident detections in a friendly, helpful tone."},
-                *st.session_state.chat_history,
-                {"role": "user", "content": f"{user_query}\n\nSemantic matches:\n{retrieved_texts}\nRecent structured DB logs:\n{db_summary}"}
-            ]
+        use_rag = route is None and any(word in user_query.lower() for word in RAG_KEYWORDS)
+
+        cached = None
+        watermark = None
+        if route is not None:
+            # Same route and no new detections: the answer cannot have changed
+            watermark = fetch_detections_version()
+            if watermark is not None:
+                answer = route_answer_cache.get(route, watermark)
+                cached = (answer, 1.0, user_query) if answer else None
+        elif use_rag:
+            index_manager = resources.get("faiss_index")
+            # Cheap when nothing changed: an indexed "id > max_id" query and a trailing id range
+            try:
+                index_manager.refresh()
+            except Exception as e:
+                st.warning(f"⚠️ Search index may be stale: {e}")
+            if not index_manager.ready:
+                st.caption("🔄 The search index is being built in the background "
+                           "(`python vector_index.py --build` does it ahead of time); answering from recent detections.")
+            q_vec = resources.get("embedder").encode([user_query], convert_to_numpy=True)
+            # Class and time range in the question ("accidents last March") prefilter the vectors
+            filters = search_filters(user_query)
+            # Questions that differ only by their time range embed almost identically: not cached
+            cacheable = filters.since is None and filters.until is None and index_manager.ready
+
+            # Repeated questions are answered from the cache until a new detection arrives
+            if cacheable:
+                cached = response_cache.get(q_vec, len(index_manager))
+
+        if cached:
+            bot_reply, similarity, _ = cached
+            elapsed = time.perf_counter() - query_start
+            st.session_state.llm_latency.append({
+                "query": user_query, "ttft_s": elapsed, "total_s": elapsed,
+                "cached": True, "similarity": round(similarity, 3),
+            })
         else:
-            messages = [
-                {"role": "system", "content": "You are SafeRideAI assistant. Answer in a friendly, conversational way."},
-                *st.session_state.chat_history,
-                {"role": "user", "content": user_query}
-            ]
-
-        # Call LLM
-        response = llm_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=messages
-        )
-        bot_reply = response.choices[0].message.content
+            if route is not None:
+                try:
+                    rows, sql_seconds = run_route(route)
+                    facts = format_result(route, rows)
+                except Exception as e:
+                    st.error(f"DB Error: {e}")
+                    sql_seconds, facts = 0.0, "The detections database could not be queried."
+                messages = answer_messages(user_query, route, facts)
+                prompt_stats = {
+                    "route": route.intent,
+                    "sql_ms": round(sql_seconds * 1000, 1),
+                    "prompt_tokens": message_tokens(messages),
+                }
+            elif use_rag:
+                matches = index_manager.search(
+                    q_vec, k=5, classes=filters.patterns, since=filters.since, until=filters.until
+                ) if len(index_manager) > 0 else []
+
+                recent_detections = fetch_recent_detections(10 if index_manager.ready else RECENT_FALLBACK_ROWS)
+
+                # Aggregate counts come from the hourly/daily rollups, not raw rows
+                counts = []
+                try:
+                    counts = recent_class_counts()
+                except Exception as e:
+                    st.warning(f"⚠️ Could not load detection counts: {e}")
+
+                # Detections already in the semantic matches are not repeated; blocks are capped
+                rag_context, context_stats = build_rag_context(matches, recent_detections, counts)
+                messages, prompt_stats = build_messages(
+                    "You are SafeRideAI assistant. Answer queries about helmet/accident detections in a friendly, helpful tone.",
+                    st.session_state.chat_history,
+                    f"{user_query}\n\n{rag_context}"
+                )
+                prompt_stats.update(context_stats, search=filters.label)
+            else:
+                messages, prompt_stats = build_messages(
+                    "You are SafeRideAI assistant. Answer in a friendly, conversational way.",
+                    st.session_state.chat_history,
+                    user_query
+                )
 
-        # Emoji hints
-        if use_rag:
-            if "accident" in bot_reply.lower():
-                bot_reply = "🚨 " + bot_reply
-            elif "helmet" in bot_reply.lower():
-                bot_reply = "🪖 " + bot_reply
-            elif "no" in bot_reply.lower() or "none" in bot_reply.lower() or "zero" in bot_reply.lower():
-                bot_reply = "✅ " + bot_reply
+            # Call LLM, rendering the reply as it streams in
+            placeholder = st.empty()
+            last_draw = [0.0]
+
+            def draw(text):
+                now = time.perf_counter()
+                if now - last_draw[0] >= STREAM_REFRESH_SECONDS:
+                    placeholder.markdown(f"🤖 {text}▌")
+                    last_draw[0] = now
+
+            bot_reply, timings = complete(resources.get("llm_client"), messages, on_text=draw)
+            placeholder.empty()
+            st.session_state.llm_latency.append({"query": user_query, **timings.as_dict(), **prompt_stats})
+
+            # Emoji hints
+            if use_rag or route is not None:
+                if "accident" in bot_reply.lower():
+                    bot_reply = "🚨 " + bot_reply
+                elif "helmet" in bot_reply.lower():
+                    bot_reply = "🪖 " + bot_reply
+                elif "no" in bot_reply.lower() or "none" in bot_reply.lower() or "zero" in bot_reply.lower():
+                    bot_reply = "✅ " + bot_reply
+            if use_rag and cacheable:
+                response_cache.put(q_vec, user_query, bot_reply, len(index_manager))
+            elif route is not None and watermark is not None:
+                route_answer_cache.put(route, watermark, bot_reply)
 
         # Update chat history
         st.session_state.chat_history.append({"role": "user", "content": user_query})
         st.session_state.chat_history.append({"role": "assistant", "content": bot_reply})
 
+    # -----------------------------
+    # Response latency
+    # -----------------------------
+    if st.session_state.llm_latency:
+        with st.expander("⏱️ Response latency, prompt size and answer cache"):
+            last = st.session_state.llm_latency[-1]
+            cache_stats = response_cache.stats()
+            route_stats = route_answer_cache.stats()
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("First token", f"{(last['ttft_s'] or 0) * 1000:.0f} ms")
+            col2.metric("Total", f"{last['total_s'] * 1000:.0f} ms")
+            col3.metric("Prompt tokens (est.)", last.get("prompt_tokens", 0))
+            col4.metric("Answer cache hit rate", f"{cache_stats['hit_rate']:.0%}")
+            st.table(st.session_state.llm_latency[-10:])
+            st.caption(
+                f"Answer cache: {cache_stats['entries']} entries, {cache_stats['hits']} hits, "
+                f"{cache_stats['misses']} misses, {cache_stats['invalidations']} invalidations; "
+                f"routed answers: {route_stats['entries']} entries, {route_stats['hits']} hits, "
+                f"{route_stats['misses']} misses"
+            )
+
     # -----------------------------
     # Display chat history
     # -----------------------------
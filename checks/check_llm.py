@@ -0,0 +1,94 @@
+# checks/check_llm.py
+"""
+llm_stream against an in-process OpenAI-compatible stub.
+
+The stub serves POST /v1/chat/completions as a server-sent event stream:
+one chunk per word after a short "thinking" delay, then [DONE]. The check
+expects complete() to return the full reply, call on_text with growing
+text once per chunk, and report a time to first token below the total.
+
+    python -m checks.check_llm
+"""
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from llm_stream import complete
+
+REPLY = "There were 3 accidents and 12 helmet violations in the last 24 hours."
+FIRST_TOKEN_DELAY = 0.2
+CHUNK_DELAY = 0.01
+
+
+class _ChatHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        self.server.requests.append(request)
+        if not self.path.endswith("/chat/completions") or not request.get("stream"):
+            self.send_response(400)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        time.sleep(FIRST_TOKEN_DELAY)
+        words = REPLY.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "chatcmpl-check", "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": request.get("model"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else f" {word}"},
+                             "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            time.sleep(CHUNK_DELAY)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def main():
+    from openai import OpenAI
+
+    failures = []
+
+    def check(ok, message):
+        print(f"{'✅' if ok else '❌'} {message}")
+        if not ok:
+            failures.append(message)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ChatHandler)
+    server.daemon_threads = True
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = OpenAI(api_key="check", base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", max_retries=0)
+    seen = []
+    try:
+        reply, timings = complete(client, [{"role": "user", "content": "How many accidents today?"}],
+                                  on_text=seen.append, model="check-model")
+        check(reply == REPLY, f"reply assembled from the stream ({len(reply)} chars)")
+        check(timings.chunks == len(REPLY.split(" ")), f"{timings.chunks} chunks counted")
+        check(len(seen) == timings.chunks and all(b.startswith(a) for a, b in zip(seen, seen[1:])),
+              "on_text called with the growing reply once per chunk")
+        check(timings.ttft is not None and FIRST_TOKEN_DELAY <= timings.ttft < timings.total,
+              f"first token after {timings.ttft or 0:.3f}s, total {timings.total:.3f}s")
+        check(server.requests and server.requests[0].get("stream") is True
+              and server.requests[0].get("model") == "check-model", "request asked for a streamed completion")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
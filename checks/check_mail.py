@@ -0,0 +1,113 @@
+# checks/check_mail.py
+"""
+MailSession against an in-process stub SMTP server.
+
+The stub (plain SMTP, AUTH PLAIN) turns the first connection away with a
+421 greeting and answers the first login with a temporary 454. The check
+expects MailSession to get through both with retries (about 3s of backoff)
+and deliver every message over one authenticated connection, and a 535
+(bad password) to fail at once without retries.
+
+    python -m checks.check_mail
+"""
+import base64
+import smtplib
+import socketserver
+import sys
+import threading
+from mailreport import MailSession, build_attachment, build_message
+
+SENDER = "check@saferide.local"
+PASSWORD = "secret"
+RECIPIENTS = ["ops@saferide.local", "lead@saferide.local", "safety@saferide.local"]
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        if server.connections == 1:
+            return self.reply("421 saferide-stub busy, try again")
+        self.reply("220 saferide-stub ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            upper = command.upper()
+            if upper.startswith(("EHLO", "HELO")):
+                self.wfile.write(b"250-saferide-stub\r\n250 AUTH PLAIN\r\n")
+            elif upper.startswith("AUTH PLAIN"):
+                server.logins += 1
+                password = base64.b64decode(command.split()[-1]).decode().split("\0")[2]
+                if server.logins == 1:
+                    self.reply("454 4.7.0 Temporary authentication failure")
+                elif password != PASSWORD:
+                    self.reply("535 5.7.8 Authentication credentials invalid")
+                else:
+                    self.reply("235 2.7.0 Authentication successful")
+            elif upper == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                server.messages += 1
+                self.reply("250 OK queued")
+            elif upper == "QUIT":
+                return self.reply("221 Bye")
+            else:
+                self.reply("250 OK")
+
+
+class StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.connections = 0
+        self.logins = 0
+        self.messages = 0
+
+
+def main():
+    failures = []
+
+    def check(ok, message):
+        print(f"{'✅' if ok else '❌'} {message}")
+        if not ok:
+            failures.append(message)
+
+    server = StubSMTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    part = build_attachment(b"%PDF-1.4 check", attachment_name="check.pdf")
+    try:
+        session = MailSession(SENDER, PASSWORD, "127.0.0.1", port, starttls=False, auth=True)
+        with session:
+            for to_email in RECIPIENTS:
+                session.send(build_message(SENDER, to_email, "SafeRideAI check", "Report attached.", part))
+        check(server.messages == len(RECIPIENTS), f"stub received {server.messages}/{len(RECIPIENTS)} messages")
+        check(session.stats["connects"] == 1, f"one authenticated connection ({session.stats['connects']})")
+        check(session.stats["retries"] == 2,
+              f"421 greeting and 454 login retried ({session.stats['retries']} retries)")
+
+        session = MailSession(SENDER, "wrong", "127.0.0.1", port, starttls=False, auth=True)
+        try:
+            with session:
+                pass
+            check(False, "a 535 reply fails the login")
+        except smtplib.SMTPAuthenticationError as e:
+            check(e.smtp_code == 535 and session.stats["retries"] == 0,
+                  f"535 fails the login without retries ({session.stats['retries']} retries)")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# checks/check_s3.py
+"""
+S3Uploader status transitions against an in-process moto server
+(pip install "moto[server]").
+
+  - a handle is "pending" until its files are handed over, then "confirmed"
+    once the (multipart) object is in the bucket with the right size
+  - skip_existing does not upload content that is already there
+  - an upload to a missing bucket ends "failed" with the error kept
+  - delete_after removes the local file whatever the outcome
+  - on_settled sees every final status, and stats() adds up
+
+    python -m checks.check_s3
+"""
+import logging
+import os
+import sys
+import tempfile
+from s3_uploader import MB, S3Uploader, create_s3_client, transfer_config
+
+BUCKET = "saferide-check-uploads"
+
+
+def make_file(directory, name, size):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return path
+
+
+def main():
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        sys.exit('moto is required: pip install "moto[server]"')
+
+    failures = []
+
+    def check(ok, message):
+        print(f"{'✅' if ok else '❌'} {message}")
+        if not ok:
+            failures.append(message)
+
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY"):
+        os.environ.setdefault(name, "check")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)     # moto's request log
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    workdir = tempfile.mkdtemp(prefix="saferide_check_s3_")
+    settled = []
+    try:
+        client = create_s3_client(f"http://{host}:{port}", workers=2, max_concurrency=4)
+        client.create_bucket(Bucket=BUCKET)
+        uploader = S3Uploader(BUCKET, 2, client, transfer_config(5, 5, 4), retries=1,
+                              on_settled=lambda upload: settled.append((upload.s3_path, upload.status)))
+
+        video = make_file(workdir, "clip.mp4", 12 * MB)
+        upload = uploader.pending("detections/clip.mp4")
+        check(upload.status == "pending", f"{upload.s3_path} is pending before its file is handed over")
+        uploader.start(upload, [(video, "detections/clip.mp4")])
+        check(upload.wait(timeout=60) and upload.status == "confirmed", f"multipart upload {upload.status}")
+        size = client.head_object(Bucket=BUCKET, Key="detections/clip.mp4")["ContentLength"]
+        check(size == 12 * MB and upload.bytes == 12 * MB, f"object is {size / MB:.0f} MB in the bucket")
+
+        again = uploader.submit(video, "detections/clip.mp4", skip_existing=True)
+        check(again.wait(timeout=60) and again.bytes == 0, "existing content is skipped (no bytes sent)")
+
+        image = make_file(workdir, "cam.jpg", 64 * 1024)
+        missing = S3Uploader("saferide-check-missing-bucket", 1, client, transfer_config(5, 5, 1), retries=0,
+                             on_settled=lambda u: settled.append((u.s3_path, u.status)))
+        failed = missing.submit(image, "detections/cam.jpg", delete_after=True)
+        check(not failed.wait(timeout=60) and failed.status == "failed" and failed.error,
+              f"missing bucket ends {failed.status}: {(failed.error or '')[:60]}")
+        check(not os.path.exists(image), "delete_after removed the local file after the failed upload")
+        missing.shutdown()
+
+        uploader.shutdown()
+        check(sorted(status for _, status in settled) == ["confirmed", "confirmed", "failed"],
+              f"on_settled saw {[status for _, status in settled]}")
+        stats = uploader.stats()
+        check(stats["queued"] == 0 and stats["confirmed"] == 2 and stats["skipped_existing"] == 1
+              and stats["failed"] == 0, f"stats {stats}")
+    finally:
+        for name in os.listdir(workdir):
+            os.remove(os.path.join(workdir, name))
+        os.rmdir(workdir)
+        server.stop()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# checks/check_telegram.py
+"""
+AlertDispatcher against an in-process stub of the Telegram Bot API.
+
+The stub answers the first request with 429 (retry_after) and records every
+sendPhoto / sendMessage. Four alerts are enqueued within one coalescing
+window - two for the same image, one for a second image, one for a video -
+and the check expects one photo per image (both captions on the first), one
+text message for the video, one retry and matching stats.
+
+    python -m checks.check_telegram
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telegram_alerts import AlertDispatcher
+
+DETECTION = {"Class": "Accident", "Confidence": 91.5, "Box Coordinates": "[10, 20, 110, 220]"}
+
+
+class _BotAPIHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.server.throttled:
+            self.server.throttled = True
+            return self.reply(429, {"ok": False, "parameters": {"retry_after": 0.1}})
+        method = self.path.rsplit("/", 1)[-1]
+        self.server.calls.append((method, body.count("Class: Accident".encode()), body))
+        self.reply(200, {"ok": True, "result": {}})
+
+
+def start_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _BotAPIHandler)
+    server.daemon_threads = True
+    server.calls = []
+    server.throttled = False
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    failures = []
+
+    def check(ok, message):
+        print(f"{'✅' if ok else '❌'} {message}")
+        if not ok:
+            failures.append(message)
+
+    server = start_stub()
+    workdir = tempfile.mkdtemp(prefix="saferide_check_telegram_")
+    images = []
+    for name in ("cam1.jpg", "cam2.jpg"):
+        images.append(os.path.join(workdir, name))
+        with open(images[-1], "wb") as f:
+            f.write(name.encode() * 100)
+
+    dispatcher = AlertDispatcher("TOKEN", "42", api_url=f"http://127.0.0.1:{server.server_address[1]}",
+                                 coalesce_window=0.5, min_interval=0)
+    try:
+        for path in (images[0], images[1], images[0], os.path.join(workdir, "clip.mp4")):
+            dispatcher.enqueue(path, [DETECTION])
+        check(dispatcher.join(timeout=15), "all alerts handled")
+        calls = server.calls
+        photos = [c for c in calls if c[0] == "sendPhoto"]
+        messages = [c for c in calls if c[0] == "sendMessage"]
+        check(len(photos) == 2, f"one photo per image ({len(photos)} sendPhoto)")
+        check(photos and b"cam1.jpg" in photos[0][2] and photos[0][1] == 2,
+              "both alerts for cam1.jpg share its photo caption")
+        check(len(photos) > 1 and b"cam2.jpg" in photos[1][2] and photos[1][1] == 1,
+              "cam2.jpg gets its own photo with its own caption")
+        check(len(messages) == 1 and messages[0][1] == 1, "the video alert is one text message")
+        stats = dispatcher.stats()
+        check(stats == {"enqueued": 4, "dropped": 0, "sent": 3, "retries": 1, "failed": 0},
+              f"stats {stats}")
+    finally:
+        dispatcher.stop()
+        server.shutdown()
+        for path in images:
+            os.remove(path)
+        os.rmdir(workdir)
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
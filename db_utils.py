@@ -1,4 +1,10 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import ThreadedConnectionPool
 import pandas as pd
 
 DB_CONFIG = {
@@ -9,16 +15,198 @@ DB_CONFIG = {
     "port": 5432
 }
 
+# Pool sizing / health checks (override via env)
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX", "8"))
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connections idle longer than this are pinged before being handed out
+POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+
+# -----------------------------
+# Pooled connection type
+# -----------------------------
+class PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers its prepared statements and last use."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.last_used = time.monotonic()
+
+
+# -----------------------------
+# Counters
+# -----------------------------
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.healthcheck_failures = 0
+        self.queries = {}
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_total += waited
+            self.checkout_wait_max = max(self.checkout_wait_max, waited)
+
+    def record_healthcheck_failure(self):
+        with self._lock:
+            self.healthcheck_failures += 1
+
+    def record_query(self, name, elapsed):
+        with self._lock:
+            count, total, worst = self.queries.get(name, (0, 0.0, 0.0))
+            self.queries[name] = (count + 1, total + elapsed, max(worst, elapsed))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_wait_avg_ms": 1000 * self.checkout_wait_total / self.checkouts if self.checkouts else 0.0,
+                "checkout_wait_max_ms": 1000 * self.checkout_wait_max,
+                "healthcheck_failures": self.healthcheck_failures,
+                "queries": {
+                    name: {"count": c, "avg_ms": 1000 * t / c, "max_ms": 1000 * m}
+                    for name, (c, t, m) in self.queries.items()
+                },
+            }
+
+
+pool_stats = PoolStats()
+
+
+# -----------------------------
+# Process-wide pool
+# -----------------------------
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(POOL_MAX_SIZE)
+
+
+def get_pool():
+    """Creates the process-wide pool on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(
+                    POOL_MIN_SIZE, POOL_MAX_SIZE,
+                    connection_factory=PooledConnection,
+                    **DB_CONFIG
+                )
+    return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    if time.monotonic() - conn.last_used < POOL_HEALTHCHECK_IDLE:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+@contextmanager
+def db_connection(commit=False):
+    """
+    Checks a healthy connection out of the pool and returns it afterwards.
+    Commits on success when commit=True, always rolls back on error.
+    Waits up to POOL_CHECKOUT_TIMEOUT seconds when the pool is exhausted.
+    """
+    start = time.perf_counter()
+    if not _pool_slots.acquire(timeout=POOL_CHECKOUT_TIMEOUT):
+        raise TimeoutError("Timed out waiting for a database connection")
+    pool = get_pool()
+    conn = None
+    try:
+        conn = pool.getconn()
+        while not _is_healthy(conn):
+            pool_stats.record_healthcheck_failure()
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+        pool_stats.record_checkout(time.perf_counter() - start)
+
+        try:
+            yield conn
+            if commit:
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+    finally:
+        if conn is not None:
+            conn.last_used = time.monotonic()
+            pool.putconn(conn, close=bool(conn.closed))
+        _pool_slots.release()
+
+
+@contextmanager
+def db_cursor(commit=False):
+    """Shortcut for a pooled connection plus cursor."""
+    with db_connection(commit=commit) as conn:
+        with conn.cursor() as cursor:
+            yield cursor
+
+
 def get_db_connection():
-    """Create and return a PostgreSQL connection"""
+    """Create and return a dedicated (unpooled) PostgreSQL connection"""
     return psycopg2.connect(**DB_CONFIG)
 
-def fetch_data(query):
+
+# -----------------------------
+# Query helpers
+# -----------------------------
+def timed_execute(cursor, name, query, params=None):
+    """Executes a query and records its latency under `name`."""
+    start = time.perf_counter()
+    cursor.execute(query, params)
+    pool_stats.record_query(name, time.perf_counter() - start)
+
+
+def execute_prepared(cursor, name, statement, params=()):
+    """
+    Executes a server-side prepared statement, preparing it on first use
+    per connection. `statement` uses $1, $2 ... placeholders.
+    """
+    conn = cursor.connection
+    if name not in conn.prepared:
+        cursor.execute(f"PREPARE {name} AS {statement}")
+        conn.prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    query = f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}"
+    timed_execute(cursor, name, query, params)
+
+
+def fetch_data(query, params=None):
     """Run a SELECT query and return result as pandas DataFrame"""
     try:
-        conn = get_db_connection()
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        with db_connection() as conn:
+            start = time.perf_counter()
+            df = pd.read_sql_query(query, conn, params=params)
+            pool_stats.record_query("fetch_data", time.perf_counter() - start)
         return df
     except Exception as e:
         print(f"⚠️ Database error: {e}")
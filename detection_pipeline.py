@@ -0,0 +1,315 @@
+# detection_pipeline.py
+"""
+Detection pipeline without UI dependencies: YOLO model loading, inference on
+images and streamed video, S3 upload, persistence and Telegram alerts.
+
+Used by the Streamlit detection tab, batch_detect and the detection service
+workers. Errors are reported through `on_error` (print by default; the UI
+passes st.error).
+"""
+import os
+from pathlib import Path
+import resources
+from migrations import ensure_schema
+from detection_store import (StageTimings, DetectionWriter, extract_boxes, to_display_records, persist_detections,
+                             set_upload_status, upload_path, upload_state)
+from event_tracker import EventTracker
+from telegram_alerts import get_dispatcher
+from inference_backend import load_backend, model_version
+from result_cache import RESULT_CACHE_ENABLED, result_cache, hash_file, content_key
+from s3_uploader import S3_BUCKET, S3_UPLOAD_MODE, S3Uploader, KeyframeSet, create_s3_client, has_credentials
+
+# Load YOLO model (lazily, on the first detection). `backend` picks PyTorch,
+# ONNX Runtime or OpenVINO (default: INFERENCE_BACKEND); see inference_backend.
+def load_model(model_path: str, backend=None, threads=None):
+    return load_backend(model_path, backend, threads)
+
+MODEL_PATH = os.getenv("MODEL_PATH", r"C:\Users\Administrator\Desktop\SafeRideAI\model\best.pt")
+resources.register("yolo", lambda: load_model(MODEL_PATH))
+resources.register("model_version", lambda: model_version(MODEL_PATH))
+
+def get_model():
+    return resources.get("yolo")
+
+def get_model_version():
+    return resources.get("model_version")
+
+def report_error(message):
+    print(message)
+
+# AWS S3 (background uploads; see s3_uploader)
+def record_upload(upload):
+    """Settles the rows written while `upload` was pending; failed uploads are dropped from the result cache."""
+    set_upload_status(upload.s3_path, upload.status)
+    if upload.status == "failed":
+        result_cache.discard(upload.s3_path)
+
+resources.register("s3_client", create_s3_client)
+resources.register("s3_credentials", has_credentials)
+resources.register("s3_uploader", lambda: S3Uploader(S3_BUCKET, client=resources.get("s3_client"),
+                                                     on_settled=record_upload))
+
+def get_uploader(on_error=report_error):
+    if not resources.get("s3_credentials"):
+        on_error("⚠️ AWS credentials not found.")
+        return None
+    return resources.get("s3_uploader")
+
+def wait_for_uploads():
+    """Blocks until every queued upload has settled (call before a CLI or worker process exits)."""
+    if resources.status()["s3_uploader"][0]:
+        resources.get("s3_uploader").shutdown(wait=True)
+        resources.reset("s3_uploader")
+
+def wait_for_alerts(timeout=None):
+    """Blocks until the queued Telegram alerts were sent (or `timeout` seconds passed)."""
+    dispatcher = _local_dispatcher()
+    return dispatcher is None or dispatcher.join(timeout)
+
+def background_idle():
+    """True when no upload or alert that may still read a source file is queued in this process."""
+    if resources.status()["s3_uploader"][0] and resources.get("s3_uploader").stats()["queued"]:
+        return False
+    dispatcher = _local_dispatcher()
+    return dispatcher is None or not dispatcher.queue.unfinished_tasks
+
+# Ensure DB schema is up to date (checked once per process, before the first insert;
+# migrations are applied at deploy time with `python migrations.py`)
+def ensure_table(on_error=report_error):
+    try:
+        ensure_schema()
+        return True
+    except Exception as e:
+        on_error(f"⚠️ Database schema not ready: {e}")
+        return False
+
+# Telegram Alert (queued; delivered by the background dispatcher). Detection
+# service workers redirect alerts to the service process, so one dispatcher
+# keeps the per-chat rate limit however many workers there are.
+_alert_sink = None
+
+def redirect_alerts(sink):
+    """Hands alerts to `sink(file_path, detection_data, s3_path)` instead of this process's dispatcher."""
+    global _alert_sink
+    _alert_sink = sink
+
+def _local_dispatcher():
+    return None if _alert_sink is not None else get_dispatcher()
+
+def send_telegram_alert(file_path, detection_data, s3_path=None):
+    if _alert_sink is not None:
+        return _alert_sink(file_path, detection_data, s3_path)
+    dispatcher = get_dispatcher()
+    if dispatcher is None:
+        return False
+    return dispatcher.enqueue(file_path, detection_data, s3_path)
+
+# Detection Function
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov")
+# Rows kept for the results table of a streamed video; everything is still persisted
+MAX_DISPLAY_RECORDS = 1000
+# Event aggregation: boxes of one class overlapping by this IoU (or sharing a
+# tracker ID) are merged until the object is missing for EVENT_MAX_GAP frames
+EVENT_IOU_THRESHOLD = 0.3
+EVENT_MAX_GAP = 5
+
+def upload_source(file_path, uploaded_file_name, on_error=report_error, content_hash=None):
+    """
+    Queues the source file for background upload and returns its Upload
+    handle (None without credentials). With a content hash the key is derived
+    from it, and content that is already in the bucket is not uploaded again.
+    """
+    uploader = get_uploader(on_error)
+    if uploader is None:
+        return None
+    if content_hash is None:
+        return uploader.submit(file_path, f"detections/{uploaded_file_name}")
+    return uploader.submit(file_path, content_key(content_hash, uploaded_file_name), skip_existing=True)
+
+def keyframe_prefix(uploaded_file_name, content_hash=None):
+    if content_hash is None:
+        return f"detections/{Path(uploaded_file_name).stem}_keyframes/"
+    return f"{content_key(content_hash, '')}/keyframes/"
+
+def lookup_cached(content_hash, frame_stride=1, on_error=report_error):
+    """Stored display records for known content (same model version), or None."""
+    try:
+        cached = result_cache.get(content_hash, get_model_version(), frame_stride)
+    except Exception as e:
+        on_error(f"⚠️ Result cache lookup failed: {e}")
+        return None
+    return cached[0] if cached else None
+
+def store_cached(content_hash, frame_stride, records, upload, on_error=report_error, version=None):
+    """
+    Caches the records of one run (for `version`, default: the loaded model's).
+    `upload` is the source's Upload handle (or S3 path / None). Results whose
+    upload failed are not cached, so the next upload retries it; the status is
+    held while storing, so an upload that fails afterwards is discarded again
+    by record_upload.
+    """
+    try:
+        with upload_state(upload) as (s3_path, s3_status):
+            if s3_status == "failed" or (records and s3_path is None):
+                return
+            result_cache.put(content_hash, version or get_model_version(), frame_stride, records, s3_path)
+    except Exception as e:
+        on_error(f"⚠️ Result cache store failed: {e}")
+
+def is_alertable(detection_records):
+    return any("Accident" in d['Class'] or "Without Helmet" in d['Class'] for d in detection_records)
+
+def process_detection(file_path, uploaded_file_name, timings=None, frame_stride=1, save_annotated=False,
+                      on_error=report_error, on_records=None, content_hash=None):
+    """
+    Runs detection on one image or video and returns its display records.
+    `on_records(records)` is called with each new batch of display records
+    as it becomes available (once for images, per closed event for videos).
+
+    `content_hash` is the file's SHA-256 (computed here if not given). Known
+    content is answered from the result cache without inference, upload,
+    INSERT or alerts, unless save_annotated asks for a fresh run.
+    """
+    timings = timings if timings is not None else StageTimings()
+    frame_stride = max(1, int(frame_stride))
+    with timings.stage("startup"):
+        table_ready = ensure_table(on_error)
+    with timings.stage("hash"):
+        content_hash = content_hash or hash_file(file_path)
+
+    use_cache = RESULT_CACHE_ENABLED and table_ready and not save_annotated
+    if use_cache:
+        with timings.stage("cache_lookup"):
+            cached = lookup_cached(content_hash, frame_stride, on_error)
+        if cached is not None:
+            if on_records and cached:
+                on_records(cached)
+            return cached
+
+    with timings.stage("startup"):
+        model = get_model()
+
+    if file_path.lower().endswith(VIDEO_EXTENSIONS):
+        detection_records, upload, persisted = process_video_stream(
+            file_path, uploaded_file_name, timings, frame_stride, save_annotated, on_error, on_records, content_hash
+        )
+        if use_cache and persisted:
+            with timings.stage("cache_store"):
+                store_cached(content_hash, frame_stride, detection_records, upload, on_error)
+        return detection_records
+
+    with timings.stage("predict"):
+        results = model.predict(source=file_path, conf=0.25, save=save_annotated)
+
+    with timings.stage("collect"):
+        rows = extract_boxes(results)
+        detection_records = to_display_records(rows)
+    if on_records and detection_records:
+        on_records(detection_records)
+
+    # S3 upload once + one bulk INSERT for every box
+    upload = None
+    persisted = True
+    try:
+        upload = persist_detections(
+            rows, file_path, uploaded_file_name,
+            lambda path, name: upload_source(path, name, on_error, content_hash), timings
+        )
+    except Exception as e:
+        on_error(f"⚠️ DB Insert Failed: {e}")
+        persisted = False
+    if use_cache and persisted:
+        with timings.stage("cache_store"):
+            store_cached(content_hash, frame_stride, detection_records, upload, on_error)
+
+    # Telegram alert
+    if is_alertable(detection_records):
+        with timings.stage("alert"):
+            send_telegram_alert(file_path, detection_records, upload_path(upload))
+
+    return detection_records
+
+def process_video_stream(file_path, uploaded_file_name, timings, frame_stride=1, save_annotated=False,
+                         on_error=report_error, on_records=None, content_hash=None):
+    """
+    Runs YOLO frame by frame (stream=True) so only the current frame's Results
+    is alive at any time. Boxes are merged into events by EventTracker; each
+    closed event is handed to the persistence stage as it arrives and every
+    flushed chunk is checked for alerts. With S3_UPLOAD_MODE=keyframes only
+    annotated keyframes are uploaded (once the video is done), not the video.
+    Returns (display records, the source's Upload handle / S3 path, whether
+    every event was persisted).
+    """
+    detection_records = []
+    frame_stride = max(1, int(frame_stride))
+    tracker = EventTracker(EVENT_IOU_THRESHOLD, EVENT_MAX_GAP * frame_stride)
+    keyframes = KeyframeSet() if S3_UPLOAD_MODE == "keyframes" else None
+    prefix = keyframe_prefix(uploaded_file_name, content_hash)
+
+    def upload_fn(path, name):
+        if keyframes is None:
+            return upload_source(path, name, on_error, content_hash)
+        uploader = get_uploader(on_error)
+        return uploader.pending(prefix) if uploader else None
+
+    def alert_chunk(rows, s3_path):
+        chunk_records = to_display_records(rows)
+        if is_alertable(chunk_records):
+            with timings.stage("alert"):
+                send_telegram_alert(file_path, chunk_records, s3_path)
+
+    def emit(events):
+        nonlocal db_failed
+        room = MAX_DISPLAY_RECORDS - len(detection_records)
+        if room > 0 and events:
+            records = to_display_records(events[:room])
+            detection_records.extend(records)
+            if on_records:
+                on_records(records)
+        try:
+            writer.add(events)
+        except Exception as e:
+            if not db_failed:
+                on_error(f"⚠️ DB Insert Failed: {e}")
+                db_failed = True
+
+    results = get_model().predict(
+        source=file_path, conf=0.25, stream=True,
+        vid_stride=frame_stride, save=save_annotated
+    )
+    writer = DetectionWriter(
+        file_path, uploaded_file_name, upload_fn, timings, on_flush=alert_chunk
+    )
+    db_failed = False
+    frame_index = 0
+    while True:
+        with timings.stage("predict"):
+            r = next(results, None)
+        if r is None:
+            break
+
+        with timings.stage("collect"):
+            rows = extract_boxes([r], frame_index)
+            events = tracker.update(frame_index, rows)
+        if keyframes is not None and rows:
+            with timings.stage("keyframes"):
+                keyframes.add(frame_index, r, rows)
+        emit(events)
+        frame_index += frame_stride
+
+    emit(tracker.finish())
+    try:
+        writer.flush()
+    except Exception as e:
+        if not db_failed:
+            on_error(f"⚠️ DB Insert Failed: {e}")
+            db_failed = True
+
+    if keyframes is not None:
+        if writer.upload is not None:
+            get_uploader(on_error).start(writer.upload, keyframes.files(prefix),
+                                         skip_existing=content_hash is not None, delete_after=True)
+        else:
+            keyframes.discard()
+
+    return detection_records, writer.upload, not db_failed
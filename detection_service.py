@@ -0,0 +1,599 @@
+# detection_service.py
+"""
+Out-of-process detection service.
+
+A pool of worker processes (DETECTION_WORKERS, default: one per CPU core)
+each load the YOLO model once and take jobs from a shared queue, so a long
+video no longer blocks a Streamlit session and throughput scales with cores.
+A small HTTP API on localhost accepts files and reports progress:
+
+    POST /jobs?name=clip.mp4&frame_stride=2   body = file bytes   -> 202 {"job_id": ...}
+    POST /jobs   {"path": "/data/clip.mp4"}   local file, no copy -> 202 {"job_id": ...}
+    GET  /jobs/<id>                           status, records, timings, latency
+    GET  /jobs/<id>/events                    NDJSON stream of records until the job ends
+    GET  /stats                               queue depth, busy workers, latency percentiles
+
+    python detection_service.py --workers 4 --port 8765
+
+Point the dashboard at it with DETECTION_SERVICE_URL=http://127.0.0.1:8765.
+
+Uploaded bodies are spooled to DETECTION_SPOOL_DIR and deleted once the job
+and the uploads it queued are done. Telegram alerts are sent by one
+dispatcher in the service process (workers pass them, with the image bytes,
+over the event queue), so the per-chat rate limit holds for the whole pool.
+Local `path` jobs must be inside DETECTION_PATH_ROOT; without it they are
+only accepted on a loopback address.
+"""
+import argparse
+import hashlib
+import ipaddress
+import itertools
+import json
+import multiprocessing as mp
+import os
+import queue
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+from inference_backend import BACKENDS
+from telegram_alerts import IMAGE_EXTENSIONS, alerts_configured, get_dispatcher
+
+DETECTION_WORKERS = int(os.getenv("DETECTION_WORKERS", str(os.cpu_count() or 1)))
+DETECTION_SERVICE_HOST = os.getenv("DETECTION_SERVICE_HOST", "127.0.0.1")
+DETECTION_SERVICE_PORT = int(os.getenv("DETECTION_SERVICE_PORT", "8765"))
+DETECTION_SPOOL_DIR = os.getenv("DETECTION_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "saferide_spool"))
+# Directory that `path` jobs may read from (unset: path jobs only on a loopback host)
+DETECTION_PATH_ROOT = os.getenv("DETECTION_PATH_ROOT", "")
+MAX_JOBS_KEPT = 1000
+LATENCY_WINDOW = 200
+UPLOAD_CHUNK = 1024 * 1024
+# Workers finish their queued S3 uploads (and the service its alerts) before exiting
+WORKER_STOP_TIMEOUT = 60
+SPOOL_CLEAN_INTERVAL = 2.0
+
+
+# -----------------------------
+# Worker process
+# -----------------------------
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _SpoolCleaner:
+    """
+    Deletes the spool files of finished jobs. Their source upload is queued
+    before the job ends, so once the worker's uploader is idle no earlier
+    job's file is still needed (alerts carry their image bytes).
+    """
+
+    def __init__(self, is_idle, interval=SPOOL_CLEAN_INTERVAL):
+        self.is_idle = is_idle
+        self.interval = interval
+        self.pending = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="spool-cleaner", daemon=True)
+        self._thread.start()
+
+    def add(self, path):
+        with self._lock:
+            self.pending.append(path)
+
+    def _clean(self, force=False):
+        with self._lock:
+            paths = list(self.pending)
+        if paths and (force or self.is_idle()):
+            _remove_files(paths)
+            with self._lock:
+                del self.pending[:len(paths)]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._clean()
+
+    def stop(self):
+        """Called after the worker's uploads were waited for: removes whatever is left."""
+        self._stop.set()
+        self._thread.join(timeout=5)
+        self._clean(force=True)
+
+
+def _alert_forwarder(event_queue):
+    """Alert sink of a worker: sends the alert to the service process, with the image bytes."""
+    def forward(file_path, detection_data, s3_path=None):
+        photo = None
+        if file_path.lower().endswith(IMAGE_EXTENSIONS):
+            try:
+                with open(file_path, "rb") as f:
+                    photo = f.read()
+            except OSError:
+                pass
+        event_queue.put(("alert", file_path, detection_data, s3_path, photo))
+        return True
+    return forward
+
+
+def _worker_main(worker_id, job_queue, event_queue, model_path, threads, backend=None):
+    """Loads the model once, then runs jobs until it receives None."""
+    import detection_pipeline
+    from detection_store import StageTimings
+
+    detection_pipeline.resources.register("yolo", lambda: detection_pipeline.load_model(
+        model_path or detection_pipeline.MODEL_PATH, backend, threads))
+    if model_path or backend:
+        detection_pipeline.resources.register("model_version", lambda: detection_pipeline.model_version(
+            model_path or detection_pipeline.MODEL_PATH, backend))
+    if alerts_configured():
+        detection_pipeline.redirect_alerts(_alert_forwarder(event_queue))
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    start = time.perf_counter()
+    try:
+        detection_pipeline.get_model()
+    except Exception as e:
+        event_queue.put(("worker_failed", worker_id, repr(e)))
+        return
+    event_queue.put(("ready", worker_id, time.perf_counter() - start))
+
+    cleaner = _SpoolCleaner(detection_pipeline.background_idle)
+    while True:
+        job = job_queue.get()
+        if job is None:
+            detection_pipeline.wait_for_uploads()
+            cleaner.stop()
+            break
+        job_id = job["id"]
+        event_queue.put(("started", job_id, worker_id, time.time()))
+        timings = StageTimings()
+        errors = []
+        try:
+            records = detection_pipeline.process_detection(
+                job["path"], job["name"], timings, job["frame_stride"], job["save_annotated"],
+                on_error=errors.append,
+                on_records=lambda records: event_queue.put(("records", job_id, records)),
+                content_hash=job["content_hash"],
+            )
+            event_queue.put(("done", job_id, len(records), timings.as_rows(), errors, time.time()))
+        except Exception as e:
+            event_queue.put(("failed", job_id, repr(e), timings.as_rows(), errors, time.time()))
+        finally:
+            if job["spooled"]:
+                cleaner.add(job["path"])
+
+
+# -----------------------------
+# Job registry and pool
+# -----------------------------
+class _Job:
+    def __init__(self, job_id, path, name, frame_stride, save_annotated):
+        self.id = job_id
+        self.path = path
+        self.name = name
+        self.frame_stride = frame_stride
+        self.save_annotated = save_annotated
+        self.status = "queued"
+        self.worker = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.records = []
+        self.timings = []
+        self.errors = []
+        self.error = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def summary(self, with_records=False):
+        out = {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "worker": self.worker,
+            "detections": len(self.records),
+            "queue_wait_s": (self.started or time.time()) - self.submitted,
+            "run_s": (self.finished or time.time()) - self.started if self.started else None,
+            "total_s": self.finished - self.submitted if self.finished else None,
+            "timings": self.timings,
+            "errors": self.errors,
+            "error": self.error,
+        }
+        if with_records:
+            out["records"] = self.records
+        return out
+
+
+class DetectionService:
+    def __init__(self, workers=DETECTION_WORKERS, model_path=None, threads_per_worker=None, backend=None):
+        self.workers = max(1, workers)
+        self.model_path = model_path
+        self.backend = backend
+        self.threads = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.ctx = mp.get_context("spawn")
+        self.job_queue = self.ctx.Queue()
+        self.event_queue = self.ctx.Queue()
+        self.processes = {}
+        self.ready = {}                  # worker id -> model load seconds
+        self.running = {}                # worker id -> job id
+        self.jobs = {}
+        self.completed = 0
+        self.failed = 0
+        self.latencies = []              # total seconds of the last LATENCY_WINDOW jobs
+        self.started_at = time.time()
+        self.dispatcher = get_dispatcher()   # the pool's only Telegram dispatcher (None if not configured)
+        self._ids = itertools.count(1)
+        self._worker_ids = itertools.count(1)
+        self._changed = threading.Condition()
+        self._stop = threading.Event()
+        self._closed = threading.Event()
+        self._collector = threading.Thread(target=self._collect, name="detection-events", daemon=True)
+
+    def start(self):
+        for _ in range(self.workers):
+            self._spawn()
+        self._collector.start()
+        return self
+
+    def _spawn(self):
+        worker_id = next(self._worker_ids)
+        process = self.ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.job_queue, self.event_queue, self.model_path, self.threads, self.backend),
+            name=f"detection-worker-{worker_id}", daemon=True,
+        )
+        process.start()
+        self.processes[worker_id] = process
+
+    def wait_ready(self, timeout=None):
+        """Blocks until every worker has loaded the model."""
+        deadline = time.monotonic() + timeout if timeout else None
+        with self._changed:
+            while len(self.ready) < self.workers:
+                if deadline and time.monotonic() > deadline:
+                    return False
+                self._changed.wait(0.5)
+        return True
+
+    def submit(self, path, name=None, frame_stride=1, save_annotated=False, content_hash=None, spooled=False):
+        """Queues a job. A `spooled` file belongs to the service and is deleted after the job."""
+        job = _Job(f"{next(self._ids):06d}", path, name or Path(path).name, int(frame_stride), bool(save_annotated))
+        with self._changed:
+            self.jobs[job.id] = job
+            self._trim_jobs()
+        self.job_queue.put({
+            "id": job.id, "path": job.path, "name": job.name,
+            "frame_stride": job.frame_stride, "save_annotated": job.save_annotated,
+            "content_hash": content_hash, "spooled": spooled,
+        })
+        return job.id
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def stats(self):
+        with self._changed:
+            latencies = sorted(self.latencies)
+            queued = sum(1 for j in self.jobs.values() if j.status == "queued")
+
+            def pct(p):
+                return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+
+            uptime = time.time() - self.started_at
+            return {
+                "workers": self.workers,
+                "workers_ready": len(self.ready),
+                "threads_per_worker": self.threads,
+                "queue_depth": queued,
+                "busy_workers": len(self.running),
+                "completed": self.completed,
+                "failed": self.failed,
+                "jobs_per_min": self.completed / uptime * 60 if uptime else 0.0,
+                "latency_p50_s": pct(0.5),
+                "latency_p95_s": pct(0.95),
+                "model_load_s": dict(self.ready),
+                "alerts": self.dispatcher.stats() if self.dispatcher else None,
+            }
+
+    def stop(self):
+        self._stop.set()
+        for _ in self.processes:
+            self.job_queue.put(None)
+        for process in self.processes.values():
+            process.join(timeout=WORKER_STOP_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self._closed.set()
+        if self._collector.is_alive():
+            self._collector.join(timeout=5)
+        # Events the workers sent while finishing (e.g. alerts of their last jobs)
+        while True:
+            try:
+                event = self.event_queue.get(timeout=0.1)
+            except queue.Empty:
+                break
+            with self._changed:
+                self._apply(event)
+        if self.dispatcher:
+            self.dispatcher.join(WORKER_STOP_TIMEOUT)
+
+    def _trim_jobs(self):
+        overflow = len(self.jobs) - MAX_JOBS_KEPT
+        for job_id in [j.id for j in self.jobs.values() if j.done][:max(overflow, 0)]:
+            del self.jobs[job_id]
+
+    # -- event collector --
+    def _collect(self):
+        while not self._closed.is_set():
+            try:
+                event = self.event_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._reap_dead_workers()
+                continue
+            with self._changed:
+                self._apply(event)
+                self._changed.notify_all()
+
+    def _apply(self, event):
+        kind = event[0]
+        if kind == "ready":
+            self.ready[event[1]] = event[2]
+        elif kind == "worker_failed":
+            print(f"⚠️ Detection worker {event[1]} could not load the model: {event[2]}")
+        elif kind == "started":
+            _, job_id, worker_id, started = event
+            self.running[worker_id] = job_id
+            job = self.jobs.get(job_id)
+            if job:
+                job.status, job.worker, job.started = "running", worker_id, started
+        elif kind == "records":
+            job = self.jobs.get(event[1])
+            if job:
+                job.records.extend(event[2])
+        elif kind == "alert":
+            if self.dispatcher:
+                self.dispatcher.enqueue(*event[1:])
+        elif kind in ("done", "failed"):
+            job = self.jobs.get(event[1])
+            if job is None:
+                return
+            if kind == "done":
+                _, _, _, job.timings, job.errors, job.finished = event
+                self.completed += 1
+            else:
+                _, _, job.error, job.timings, job.errors, job.finished = event
+                self.failed += 1
+            job.status = kind
+            self.running.pop(job.worker, None)
+            self.latencies = (self.latencies + [job.finished - job.submitted])[-LATENCY_WINDOW:]
+
+    def _reap_dead_workers(self):
+        """Fails the job of a crashed worker and starts a replacement."""
+        for worker_id, process in list(self.processes.items()):
+            if process.is_alive() or self._stop.is_set():
+                continue
+            with self._changed:
+                job = self.jobs.get(self.running.pop(worker_id, None))
+                if job and not job.done:
+                    job.status, job.error, job.finished = "failed", f"worker exited ({process.exitcode})", time.time()
+                    self.failed += 1
+                was_ready = self.ready.pop(worker_id, None) is not None
+                del self.processes[worker_id]
+                self._changed.notify_all()
+            # A worker that never loaded the model would only fail again
+            if was_ready:
+                self._spawn()
+        if not self.processes and not self._stop.is_set():
+            with self._changed:
+                for job in self.jobs.values():
+                    if job.status == "queued":
+                        job.status, job.error, job.finished = "failed", "no detection workers available", time.time()
+                        self.failed += 1
+                self._changed.notify_all()
+
+    def wait(self, job_id, after=0, timeout=1.0):
+        """Waits until the job has more than `after` records or is finished."""
+        with self._changed:
+            job = self.jobs.get(job_id)
+            if job and not job.done and len(job.records) <= after:
+                self._changed.wait(timeout)
+        return job
+
+
+# -----------------------------
+# HTTP API
+# -----------------------------
+def path_allowed(path, host, root=DETECTION_PATH_ROOT):
+    """Whether a `path` job may read `path`: inside `root`, or anywhere when served on loopback only."""
+    if root:
+        root = os.path.realpath(root)
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+    try:
+        return host == "localhost" or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload):
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/jobs":
+            return self._json(404, {"error": "not found"})
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        length = int(self.headers.get("Content-Length", 0))
+        content_hash = None
+        spooled = False
+
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            path = payload.get("path")
+            if not path or not os.path.isfile(path):
+                return self._json(400, {"error": f"file not found: {path}"})
+            if not path_allowed(path, self.server.server_address[0]):
+                return self._json(403, {"error": f"path not allowed: {path}"})
+            query.update({k: v for k, v in payload.items() if k != "path"})
+        else:
+            name = os.path.basename(query.get("name", "upload.bin"))
+            os.makedirs(DETECTION_SPOOL_DIR, exist_ok=True)
+            fd, path = tempfile.mkstemp(suffix=f"_{name}", dir=DETECTION_SPOOL_DIR)
+            spooled = True
+            digest = hashlib.sha256()
+            with os.fdopen(fd, "wb") as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = self.rfile.read(min(UPLOAD_CHUNK, remaining))
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            content_hash = digest.hexdigest()
+            query.setdefault("name", name)
+
+        job_id = self.service.submit(
+            path, query.get("name"),
+            frame_stride=int(query.get("frame_stride", 1)),
+            save_annotated=str(query.get("save_annotated", "")).lower() in ("1", "true", "yes"),
+            content_hash=content_hash, spooled=spooled,
+        )
+        self._json(202, {"job_id": job_id})
+
+    def do_GET(self):
+        parts = [p for p in urlparse(self.path).path.split("/") if p]
+        if parts == ["stats"]:
+            return self._json(200, self.service.stats())
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = self.service.get(parts[1])
+            if job is None:
+                return self._json(404, {"error": "unknown job"})
+            if len(parts) == 2:
+                return self._json(200, job.summary(with_records=True))
+            if parts[2:] == ["events"]:
+                return self._stream(job)
+        self._json(404, {"error": "not found"})
+
+    def _stream(self, job):
+        """Sends each new batch of records as one JSON line, then the job summary."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+        sent = 0
+        while True:
+            self.service.wait(job.id, sent)
+            finished = job.done
+            records = job.records[sent:]
+            if records:
+                self.wfile.write((json.dumps({"type": "records", "records": records}, default=str) + "\n").encode())
+                sent += len(records)
+            if finished and sent >= len(job.records):
+                self.wfile.write((json.dumps({"type": "summary", **job.summary()}, default=str) + "\n").encode())
+                self.wfile.flush()
+                return
+            self.wfile.flush()
+
+
+def serve(service, host=DETECTION_SERVICE_HOST, port=DETECTION_SERVICE_PORT):
+    handler = type("DetectionHandler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# -----------------------------
+# Client (used by detection_ui)
+# -----------------------------
+class DetectionClient:
+    def __init__(self, base_url, timeout=30):
+        import requests
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def submit_file(self, file_path, name=None, frame_stride=1, save_annotated=False):
+        """Uploads the file's bytes (works across hosts)."""
+        with open(file_path, "rb") as f:
+            resp = self.session.post(
+                f"{self.base_url}/jobs", data=f, timeout=self.timeout,
+                params={"name": name or Path(file_path).name, "frame_stride": frame_stride,
+                        "save_annotated": int(save_annotated)},
+            )
+        resp.raise_for_status()
+        return resp.json()["job_id"]
+
+    def submit_path(self, file_path, name=None, frame_stride=1, save_annotated=False):
+        """Submits a path the service can read directly (same machine)."""
+        resp = self.session.post(f"{self.base_url}/jobs", timeout=self.timeout, json={
+            "path": os.path.abspath(file_path), "name": name or Path(file_path).name,
+            "frame_stride": frame_stride, "save_annotated": int(save_annotated),
+        })
+        resp.raise_for_status()
+        return resp.json()["job_id"]
+
+    def status(self, job_id):
+        resp = self.session.get(f"{self.base_url}/jobs/{job_id}", timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    def stream(self, job_id):
+        """Yields {"type": "records", ...} events, then one {"type": "summary", ...}."""
+        with self.session.get(f"{self.base_url}/jobs/{job_id}/events", stream=True, timeout=None) as resp:
+            resp.raise_for_status()
+            for line in resp.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def stats(self):
+        resp = self.session.get(f"{self.base_url}/stats", timeout=self.timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SafeRideAI detection worker pool + local HTTP API")
+    parser.add_argument("--workers", type=int, default=DETECTION_WORKERS)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--model", default=None, help="Model path (default: MODEL_PATH)")
+    parser.add_argument("--backend", choices=BACKENDS, default=None, help="Inference backend (default: INFERENCE_BACKEND)")
+    parser.add_argument("--host", default=DETECTION_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=DETECTION_SERVICE_PORT)
+    args = parser.parse_args()
+
+    service = DetectionService(args.workers, args.model, args.threads_per_worker, args.backend).start()
+    server = serve(service, args.host, args.port)
+    print(f"🚀 Detection service on http://{args.host}:{args.port} "
+          f"({service.workers} workers x {service.threads} threads)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
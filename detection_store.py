@@ -0,0 +1,250 @@
+# detection_store.py
+import os
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from psycopg2.extras import execute_values
+from db_utils import db_cursor
+from rollups import record_batch
+
+# DetectionWriter flushes a chunk at this many rows, or once its oldest row
+# waited this long, so alerts for a short event are not held back by a long video
+FLUSH_SIZE = 500
+FLUSH_SECONDS = float(os.getenv("DETECTION_FLUSH_SECONDS", "2.0"))
+# Rows kept while the database is failing; older ones are dropped beyond this
+MAX_BUFFERED_ROWS = 10 * FLUSH_SIZE
+
+# -----------------------------
+# Per-stage timings
+# -----------------------------
+class StageTimings:
+    """Accumulates wall-clock seconds per pipeline stage (predict, s3_upload, db_insert, ...)."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def total(self):
+        return sum(self.stages.values())
+
+    def as_rows(self):
+        """Rows suitable for a DataFrame: stage name and milliseconds."""
+        return [{"Stage": name, "ms": round(sec * 1000, 1)} for name, sec in self.stages.items()]
+
+
+# -----------------------------
+# Collect boxes from YOLO results
+# -----------------------------
+# One stored detection. For videos this is an aggregated event (see event_tracker),
+# for single images every box is its own one-frame event.
+Detection = namedtuple(
+    "Detection",
+    ["label", "confidence", "coords", "first_frame", "last_frame", "box_count", "track_id"],
+    defaults=(0, 0, 1, None),
+)
+
+
+def extract_boxes(results, frame_index=0):
+    """
+    Flattens ultralytics Results into Detection rows.
+    Confidence is the raw 0-1 score, coords are xyxy rounded to 0.1 px.
+    Tracker IDs are kept when the results come from model.track().
+    """
+    rows = []
+    for offset, r in enumerate(results):
+        if r.boxes is None:
+            continue
+        for box in r.boxes:
+            cls_id = int(box.cls[0].item())
+            conf = float(box.conf[0].item())
+            coords = [round(x, 1) for x in box.xyxy[0].tolist()]
+            track_id = int(box.id[0].item()) if getattr(box, "id", None) is not None else None
+            frame = frame_index + offset
+            rows.append(Detection(r.names[cls_id], conf, coords, frame, frame, 1, track_id))
+    return rows
+
+
+def to_display_records(rows):
+    """Converts Detection rows into the records shown in the UI and sent to Telegram."""
+    return [
+        {
+            "Class": d.label,
+            "Confidence": round(d.confidence * 100, 2),
+            "Box Coordinates": d.coords,
+            "Frames": f"{d.first_frame}-{d.last_frame}",
+            "Boxes": d.box_count,
+        }
+        for d in rows
+    ]
+
+
+# -----------------------------
+# Bulk insert
+# -----------------------------
+def insert_detections(rows, file_name, s3_path, s3_status=None):
+    """
+    Writes all rows with a single multi-row INSERT and updates the hourly/daily
+    rollups and the detection_writes counter in the same transaction. Returns
+    rows written.
+    """
+    if not rows:
+        return 0
+    values = [
+        (d.label, d.confidence, str(d.coords), *d.coords, file_name, s3_path, s3_status,
+         d.first_frame, d.last_frame, d.box_count)
+        for d in rows
+    ]
+    with db_cursor(commit=True) as cursor:
+        execute_values(
+            cursor,
+            """
+            INSERT INTO detections
+                (class, confidence, box_coordinates, x1, y1, x2, y2,
+                 file_name, s3_path, s3_status, first_frame, last_frame, box_count)
+            VALUES %s
+            """,
+            values,
+            page_size=len(values),
+        )
+        record_batch(cursor, rows, file_name)
+        # Last statement: the counter row stays locked only until the commit
+        cursor.execute("UPDATE detection_writes SET version = version + 1")
+    return len(values)
+
+
+def set_upload_status(s3_path, status):
+    """Moves the pending rows of one upload to `status` (confirmed / failed). Returns rows updated."""
+    with db_cursor(commit=True) as cursor:
+        cursor.execute(
+            "UPDATE detections SET s3_status = %s WHERE s3_path = %s AND s3_status = 'pending'",
+            (status, s3_path)
+        )
+        return cursor.rowcount
+
+
+def upload_path(upload):
+    """S3 path of what upload_fn returned (an s3_uploader.Upload, a plain S3 path or None)."""
+    return getattr(upload, "s3_path", upload)
+
+
+@contextmanager
+def upload_state(upload):
+    """
+    (s3_path, s3_status) to write rows with. `upload` is what upload_fn
+    returned: an s3_uploader.Upload (held steady while the rows are written),
+    a plain S3 path, or None.
+    """
+    if hasattr(upload, "state"):
+        with upload.state() as state:
+            yield state
+    else:
+        yield upload, None
+
+
+class DetectionWriter:
+    """
+    Streaming persistence stage: buffers rows as frames arrive and flushes
+    them with one bulk INSERT per chunk. The source upload is started once,
+    right before the first flush. `on_flush(rows, s3_path)` is called after
+    every successful chunk so alerts can go out while the video is still running.
+
+    A chunk is flushed at `flush_size` rows or `flush_seconds` after its first
+    row. Rows stay buffered until their INSERT succeeds; after a failure the
+    next attempt waits `flush_seconds`, and at most `max_rows` are kept.
+    """
+
+    def __init__(self, file_path, file_name, upload_fn, timings=None, flush_size=FLUSH_SIZE, on_flush=None,
+                 flush_seconds=FLUSH_SECONDS, max_rows=MAX_BUFFERED_ROWS):
+        self.file_path = file_path
+        self.file_name = file_name
+        self.upload_fn = upload_fn
+        self.timings = timings or StageTimings()
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.max_rows = max(max_rows, flush_size)
+        self.on_flush = on_flush
+        self.buffer = []
+        self.buffered_at = None
+        self.retry_at = 0.0
+        self.s3_path = None
+        self.upload = None
+        self.uploaded = False
+        self.written = 0
+        self.dropped = 0
+
+    def add(self, rows):
+        """Buffers rows (call once per frame, even with none, so the time limit is checked)."""
+        if rows and not self.buffer:
+            self.buffered_at = time.monotonic()
+        self.buffer.extend(rows)
+        if len(self.buffer) > self.max_rows:
+            overflow = len(self.buffer) - self.max_rows
+            del self.buffer[:overflow]
+            self.dropped += overflow
+            print(f"⚠️ Dropped {overflow} buffered detections of {self.file_name} (database unavailable)")
+        if self.buffer and self._due():
+            self.flush()
+
+    def _due(self):
+        now = time.monotonic()
+        if now < self.retry_at:
+            return False
+        return len(self.buffer) >= self.flush_size or now - self.buffered_at >= self.flush_seconds
+
+    def flush(self):
+        """Inserts the buffered rows; on failure they stay buffered and the error is raised."""
+        if not self.buffer:
+            return
+        chunk = list(self.buffer)
+
+        if not self.uploaded:
+            with self.timings.stage("s3_upload"):
+                self.upload = self.upload_fn(self.file_path, self.file_name)
+                self.s3_path = upload_path(self.upload)
+            self.uploaded = True
+
+        try:
+            with self.timings.stage("db_insert"), upload_state(self.upload) as (s3_path, s3_status):
+                self.written += insert_detections(chunk, self.file_name, s3_path, s3_status)
+        except Exception:
+            self.retry_at = time.monotonic() + self.flush_seconds
+            raise
+        del self.buffer[:len(chunk)]
+        self.buffered_at = time.monotonic() if self.buffer else None
+
+        if self.on_flush:
+            self.on_flush(chunk, self.s3_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
+
+
+def persist_detections(rows, file_path, file_name, upload_fn, timings=None):
+    """
+    Persistence stage for one predict run: starts the source upload once,
+    then bulk-inserts every row. Returns what upload_fn returned (an Upload
+    handle, S3 path or None), so callers can check how the upload settled.
+    """
+    timings = timings or StageTimings()
+    if not rows:
+        return None
+
+    with timings.stage("s3_upload"):
+        upload = upload_fn(file_path, file_name)
+
+    with timings.stage("db_insert"), upload_state(upload) as (s3_path, s3_status):
+        insert_detections(rows, file_name, s3_path, s3_status)
+
+    return upload
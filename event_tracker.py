@@ -0,0 +1,92 @@
+# event_tracker.py
+from detection_store import Detection
+
+
+def box_iou(a, b):
+    """IoU of two xyxy boxes."""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, ix2 - ix1) * max(0.0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / (area_a + area_b - inter)
+
+
+class _Track:
+    def __init__(self, det, frame):
+        self.label = det.label
+        self.track_id = det.track_id
+        self.first_frame = frame
+        self.last_frame = frame
+        self.last_box = det.coords
+        self.peak_conf = det.confidence
+        self.peak_box = det.coords
+        self.box_count = 1
+
+    def extend(self, det, frame):
+        self.last_frame = frame
+        self.last_box = det.coords
+        self.box_count += 1
+        if det.confidence > self.peak_conf:
+            self.peak_conf = det.confidence
+            self.peak_box = det.coords
+
+    def to_event(self):
+        return Detection(
+            self.label, self.peak_conf, self.peak_box,
+            self.first_frame, self.last_frame, self.box_count, self.track_id
+        )
+
+
+class EventTracker:
+    """
+    Merges per-frame boxes into events. A box joins an open track of the
+    same class when the tracker IDs match (model.track) or, without IDs,
+    when its IoU with the track's last box is at least `iou_threshold`.
+    A track closes once it has not been seen for more than `max_gap` frames.
+    Each closed track becomes one Detection with first/last frame, peak
+    confidence (and its box) and the number of merged boxes.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_gap=5):
+        self.iou_threshold = iou_threshold
+        self.max_gap = max_gap
+        self.open_tracks = []
+
+    def update(self, frame, detections):
+        """Feeds one frame's detections; returns events closed by this frame."""
+        matched = set()
+        for det in sorted(detections, key=lambda d: d.confidence, reverse=True):
+            track = self._match(det, matched)
+            if track is None:
+                track = _Track(det, frame)
+                self.open_tracks.append(track)
+            else:
+                track.extend(det, frame)
+            matched.add(id(track))
+
+        closed = [t for t in self.open_tracks if frame - t.last_frame > self.max_gap]
+        self.open_tracks = [t for t in self.open_tracks if frame - t.last_frame <= self.max_gap]
+        return [t.to_event() for t in closed]
+
+    def finish(self):
+        """Closes and returns every remaining open event."""
+        events = [t.to_event() for t in self.open_tracks]
+        self.open_tracks = []
+        return events
+
+    def _match(self, det, matched):
+        best, best_iou = None, self.iou_threshold
+        for track in self.open_tracks:
+            if id(track) in matched or track.label != det.label:
+                continue
+            if det.track_id is not None and track.track_id is not None:
+                if det.track_id == track.track_id:
+                    return track
+                continue
+            iou = box_iou(track.last_box, det.coords)
+            if iou >= best_iou:
+                best, best_iou = track, iou
+        return best
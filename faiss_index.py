@@ -0,0 +1,154 @@
+# faiss_index.py
+"""
+Helpers shared by the chatbot's vector index (vector_index.py): the text
+embedded for a detection row, the on-disk cache location, atomic writes and
+the content-hash embedding cache.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+# Size of the recent-rows window the chatbot used to index (bench_router compares against it)
+INDEX_WINDOW = 500
+# On-disk index + embedding cache (set to an empty string to disable)
+INDEX_DIR = os.getenv("FAISS_INDEX_DIR", ".faiss_cache")
+# Embeddings kept on disk (384-d MiniLM: about 1.5 KB each)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1000000"))
+
+
+def detection_text(row):
+    """Text embedded for a (id, class, confidence, file_name, created_at) row."""
+    return f"{row[1]} ({row[2]*100:.1f}%) in {row[3]} at {row[4]}"
+
+
+def atomic_write(path, write_fn):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    os.close(fd)
+    try:
+        write_fn(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def save_json(path, data):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    atomic_write(path, write)
+
+
+# -----------------------------
+# Embedding cache
+# -----------------------------
+class EmbeddingCache:
+    """
+    Content-hash (sha1 of the text) keyed embedding cache. (key, vector)
+    records are appended to one file that is memory-mapped and read lazily on
+    the first encode(); new vectors are kept in memory until save(). Beyond
+    `max_entries` the file is rewritten with the newest entries.
+    """
+
+    def __init__(self, directory=None, max_entries=EMBEDDING_CACHE_SIZE):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.path = None
+        self.dtype = None
+        self.records = None
+        self.rows = {}
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest().encode("ascii")
+
+    def encode(self, embedding_model, texts, batch_size=32):
+        """Returns float32 vectors for texts, embedding only those not cached."""
+        keys = [self.key(t) for t in texts]
+        with self._lock:
+            if self.dtype is None:
+                self._load(embedding_model.get_sentence_embedding_dimension())
+            missing = [i for i, k in enumerate(keys) if self._get(k) is None]
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        fresh = None
+        if missing:
+            fresh = embedding_model.encode([texts[i] for i in missing], batch_size=batch_size,
+                                           convert_to_numpy=True).astype("float32")
+        with self._lock:
+            if missing:
+                for i, vec in zip(missing, fresh):
+                    self.pending[keys[i]] = vec
+            return np.vstack([self._get(k) for k in keys]).astype("float32")
+
+    def save(self):
+        """Appends the pending vectors to the cache file."""
+        with self._lock:
+            if not self.path or not self.pending:
+                return
+            block = np.empty(len(self.pending), dtype=self.dtype)
+            block["key"] = list(self.pending)
+            block["vector"] = np.vstack(list(self.pending.values()))
+            count = 0 if self.records is None else len(self.records)
+            os.makedirs(self.directory, exist_ok=True)
+            if count + len(block) > self.max_entries * 1.25:
+                self._rewrite(block[-self.max_entries:], max(0, self.max_entries - len(block)))
+            else:
+                self.records = None         # unmap before writing (Windows)
+                with open(self.path, "ab") as f:
+                    f.truncate(count * self.dtype.itemsize)     # drops a torn record of a crashed save
+                    block.tofile(f)
+            self.pending = {}
+            self._map()
+
+    def _rewrite(self, block, keep):
+        """Replaces the file with its newest `keep` records plus `block`."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            with open(tmp, "wb") as f:
+                if keep and self.records is not None:
+                    for start in range(max(0, len(self.records) - keep), len(self.records), 100_000):
+                        np.asarray(self.records[start:start + 100_000]).tofile(f)
+                block.tofile(f)
+            self.records = None             # unmap before replacing (Windows)
+            os.replace(tmp, self.path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _get(self, key):
+        if key in self.pending:
+            return self.pending[key]
+        row = self.rows.get(key)
+        return None if row is None else self.records[row]["vector"]
+
+    def _load(self, dim):
+        self.dtype = np.dtype([("key", "S40"), ("vector", "<f4", (dim,))])
+        if self.directory:
+            self.path = os.path.join(self.directory, f"embeddings_{dim}d.bin")
+            self._map()
+
+    def _map(self):
+        self.records, self.rows = None, {}
+        # A torn last record (crash while appending) is ignored
+        count = os.path.getsize(self.path) // self.dtype.itemsize if os.path.exists(self.path) else 0
+        if not count:
+            return
+        try:
+            self.records = np.memmap(self.path, dtype=self.dtype, mode="r", shape=(count,))
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable embedding cache: {e}")
+            return
+        self.rows = {k: i for i, k in enumerate(self.records["key"].tolist())}
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self.rows) + len(self.pending), "hits": self.hits, "misses": self.misses}
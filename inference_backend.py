@@ -0,0 +1,267 @@
+# inference_backend.py
+"""
+CPU inference backends for the helmet/accident model.
+
+INFERENCE_BACKEND selects what load_backend() loads next to MODEL_PATH:
+
+    pytorch         best.pt                       (default)
+    onnx            best.onnx                     ONNX Runtime, FP32
+    onnx-int8       best_int8.onnx                ONNX Runtime, static INT8 (QDQ)
+    openvino        best_openvino_model/          OpenVINO, FP32
+    openvino-int8   best_int8_openvino_model/     OpenVINO, INT8 (NNCF)
+
+Every backend is loaded through ultralytics YOLO, so predict() returns the
+same Results objects and the existing r.boxes loop (extract_boxes) works
+unchanged. `threads` caps the CPU threads of the ONNX Runtime / OpenVINO
+session (torch.set_num_threads covers the PyTorch backend). Export and
+quantize once with the CLI:
+
+    python inference_backend.py model/best.pt --export onnx openvino --int8 --calibration snapshots/
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch")
+INFERENCE_IMGSZ = int(os.getenv("INFERENCE_IMGSZ", "640"))
+CALIBRATION_SIZE = 200
+CALIBRATION_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+BACKENDS = ("pytorch", "onnx", "onnx-int8", "openvino", "openvino-int8")
+
+
+# -----------------------------
+# Loading
+# -----------------------------
+def backend_path(model_path, backend):
+    """Path of the exported model for `backend`, derived from the .pt path."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {backend!r} (choose from {', '.join(BACKENDS)})")
+    path = Path(model_path)
+    return str({
+        "pytorch": path,
+        "onnx": path.with_suffix(".onnx"),
+        "onnx-int8": path.with_name(f"{path.stem}_int8.onnx"),
+        "openvino": path.with_name(f"{path.stem}_openvino_model"),
+        "openvino-int8": path.with_name(f"{path.stem}_int8_openvino_model"),
+    }[backend])
+
+
+def load_backend(model_path, backend=None, threads=None):
+    """Loads the model for `backend` (default: INFERENCE_BACKEND) as an ultralytics YOLO."""
+    from ultralytics import YOLO
+    backend = backend or INFERENCE_BACKEND
+    if backend == "pytorch":
+        return YOLO(backend_path(model_path, backend))
+    path = backend_path(model_path, backend)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"{path} not found; export it with: python inference_backend.py {model_path} "
+            f"--export {backend.split('-')[0]}{' --int8 --calibration <images>' if backend.endswith('int8') else ''}"
+        )
+    model = YOLO(path, task="detect")
+    if threads:
+        limit_threads(model, path, backend, threads)
+    return model
+
+
+def limit_threads(model, path, backend, threads):
+    """
+    ultralytics creates the ONNX Runtime session / OpenVINO compiled model on
+    the first predict() without thread options, so run one warm-up image and
+    rebuild it with `threads` intra-op threads.
+    """
+    import numpy as np
+    model.predict(np.zeros((INFERENCE_IMGSZ, INFERENCE_IMGSZ, 3), dtype=np.uint8),
+                  imgsz=INFERENCE_IMGSZ, device="cpu", verbose=False)
+    runtime = model.predictor.model          # ultralytics AutoBackend
+    if backend.startswith("onnx"):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        runtime.session = ort.InferenceSession(path, options, providers=runtime.session.get_providers())
+    else:
+        import openvino as ov
+        core = ov.Core()
+        xml = next(Path(path).glob("*.xml"))
+        runtime.ov_compiled_model = core.compile_model(
+            core.read_model(xml, weights=xml.with_suffix(".bin")), "CPU",
+            {"INFERENCE_NUM_THREADS": threads, "PERFORMANCE_HINT": "LATENCY"},
+        )
+
+
+def model_version(model_path, backend=None):
+    """
+    Identifies the weights behind `backend`: MODEL_VERSION if set, otherwise
+    the backend name plus a digest of the model file(s). Cached detection
+    results are keyed by it, so re-exporting or retraining invalidates them.
+    """
+    if os.getenv("MODEL_VERSION"):
+        return os.getenv("MODEL_VERSION")
+    backend = backend or INFERENCE_BACKEND
+    path = Path(backend_path(model_path, backend))
+    files = sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    digest = hashlib.sha256()
+    for file in files:
+        if not file.exists():
+            return f"{backend}:{path.name}"
+        with open(file, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+    return f"{backend}:{digest.hexdigest()[:16]}"
+
+
+# -----------------------------
+# Calibration data
+# -----------------------------
+def calibration_images(source, limit=CALIBRATION_SIZE):
+    """Image files under `source` (recursive), evenly sampled down to `limit`."""
+    paths = sorted(p for p in Path(source).rglob("*") if p.suffix.lower() in CALIBRATION_EXTENSIONS)
+    if not paths:
+        raise ValueError(f"No calibration images found in {source}")
+    step = max(1, len(paths) // limit)
+    return [str(p) for p in paths[::step][:limit]]
+
+
+def letterbox(path, imgsz=INFERENCE_IMGSZ):
+    """Image as a 1x3xHxW float32 tensor, resized and padded like ultralytics predict()."""
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(path).convert("RGB")
+    scale = min(imgsz / image.width, imgsz / image.height)
+    size = (round(image.width * scale), round(image.height * scale))
+    canvas = Image.new("RGB", (imgsz, imgsz), (114, 114, 114))
+    canvas.paste(image.resize(size, Image.BILINEAR), ((imgsz - size[0]) // 2, (imgsz - size[1]) // 2))
+    array = np.asarray(canvas, dtype=np.float32) / 255.0
+    return array.transpose(2, 0, 1)[None]
+
+
+def _calibration_reader(onnx_path, images, imgsz):
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class LetterboxReader(CalibrationDataReader):
+        def __init__(self):
+            session = InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+            self.input_name = session.get_inputs()[0].name
+            self.images = iter(images)
+
+        def get_next(self):
+            path = next(self.images, None)
+            return None if path is None else {self.input_name: letterbox(path, imgsz)}
+
+    return LetterboxReader()
+
+
+# -----------------------------
+# Export and quantization
+# -----------------------------
+def export_onnx(model_path, imgsz=INFERENCE_IMGSZ):
+    """best.pt -> best.onnx (dynamic batch/size so batched predict works)."""
+    from ultralytics import YOLO
+    return YOLO(model_path).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+
+
+def head_nodes(model):
+    """Nodes of the Detect head (the last /model.N/ block), kept in FP32."""
+    blocks = [node.name.split("/")[1] for node in model.graph.node if node.name.startswith("/model.")]
+    if not blocks:
+        return []
+    last = max(blocks, key=lambda name: int(name.split(".")[1]))
+    return [node.name for node in model.graph.node if node.name.startswith(f"/{last}/")]
+
+
+def quantize_onnx_int8(onnx_path, calibration, output_path=None, imgsz=INFERENCE_IMGSZ, limit=CALIBRATION_SIZE):
+    """
+    Static INT8 post-training quantization with ONNX Runtime.
+
+    Activation ranges are calibrated on `limit` letterboxed images from the
+    `calibration` folder. Weights are per-channel QInt8, activations QUInt8 in
+    QDQ format; the Detect head stays in FP32 because box regression and class
+    scores lose the most accuracy there. The ultralytics metadata (class
+    names, stride, imgsz) is copied over so YOLO() can load the result.
+    """
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    output_path = output_path or str(Path(onnx_path).with_name(f"{Path(onnx_path).stem}_int8.onnx"))
+    images = calibration_images(calibration, limit)
+    fp32 = onnx.load(onnx_path)
+    with tempfile.TemporaryDirectory(prefix="saferide_quant_") as workdir:
+        # shape inference + graph optimization so every activation gets a range
+        prepared = os.path.join(workdir, "prepared.onnx")
+        quant_pre_process(onnx_path, prepared, skip_symbolic_shape=True)
+        quantize_static(
+            prepared, output_path, _calibration_reader(prepared, images, imgsz),
+            quant_format=QuantFormat.QDQ,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8,
+            per_channel=True,
+            calibrate_method=CalibrationMethod.MinMax,
+            nodes_to_exclude=head_nodes(onnx.load(prepared)),
+        )
+    int8 = onnx.load(output_path)
+    onnx.helper.set_model_props(int8, {p.key: p.value for p in fp32.metadata_props})
+    onnx.save(int8, output_path)
+    return output_path, len(images)
+
+
+def export_openvino(model_path, int8=False, calibration=None, imgsz=INFERENCE_IMGSZ, limit=CALIBRATION_SIZE):
+    """
+    best.pt -> best_openvino_model/ (or best_int8_openvino_model/ with NNCF
+    INT8 quantization, calibrated on the images in `calibration`).
+    """
+    from ultralytics import YOLO
+    model = YOLO(model_path)
+    if not int8:
+        return model.export(format="openvino", imgsz=imgsz, dynamic=True)
+
+    # ultralytics reads the calibration set from a dataset yaml
+    workdir = tempfile.mkdtemp(prefix="saferide_calib_")
+    try:
+        images = Path(workdir, "images")
+        images.mkdir()
+        for i, path in enumerate(calibration_images(calibration, limit)):
+            os.symlink(os.path.abspath(path), images / f"{i:05d}{Path(path).suffix.lower()}")
+        names = "\n".join(f"  {i}: {name}" for i, name in model.names.items())
+        data = Path(workdir, "calibration.yaml")
+        data.write_text(f"path: {workdir}\ntrain: images\nval: images\nnames:\n{names}\n")
+        return model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=True, data=str(data))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the YOLO model to ONNX/OpenVINO, optionally INT8")
+    parser.add_argument("model", help="Path to best.pt")
+    parser.add_argument("--export", nargs="+", choices=["onnx", "openvino"], default=["onnx"])
+    parser.add_argument("--int8", action="store_true", help="Also build INT8 models (needs --calibration)")
+    parser.add_argument("--calibration", default=None, help="Folder of representative images")
+    parser.add_argument("--calibration-size", type=int, default=CALIBRATION_SIZE)
+    parser.add_argument("--imgsz", type=int, default=INFERENCE_IMGSZ)
+    args = parser.parse_args()
+    if args.int8 and not args.calibration:
+        parser.error("--int8 needs --calibration")
+
+    if "onnx" in args.export:
+        path = export_onnx(args.model, args.imgsz)
+        print(f"✅ ONNX: {path}")
+        if args.int8:
+            path, count = quantize_onnx_int8(path, args.calibration, imgsz=args.imgsz, limit=args.calibration_size)
+            print(f"✅ ONNX INT8: {path} (calibrated on {count} images)")
+    if "openvino" in args.export:
+        print(f"✅ OpenVINO: {export_openvino(args.model, imgsz=args.imgsz)}")
+        if args.int8:
+            path = export_openvino(args.model, True, args.calibration, args.imgsz, args.calibration_size)
+            print(f"✅ OpenVINO INT8: {path}")
+    print("ℹ️ Select one with INFERENCE_BACKEND=onnx|onnx-int8|openvino|openvino-int8")
+
+
+if __name__ == "__main__":
+    main()
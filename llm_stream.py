@@ -0,0 +1,87 @@
+# llm_stream.py
+"""
+OpenAI-compatible chat client (Groq by default) with streamed completions.
+
+LLM_BASE_URL points the client at any OpenAI-compatible server, e.g. a local
+stub for tests. stream_chat() yields text as it arrives and records
+time-to-first-token and total latency for each call.
+
+    python llm_stream.py "How many accidents today?"
+"""
+import argparse
+import os
+import time
+
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.groq.com/openai/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
+
+
+def create_llm_client():
+    from openai import OpenAI
+    return OpenAI(
+        api_key=os.getenv("GROQ_API_KEY") or os.getenv("LLM_API_KEY", "not-needed"),
+        base_url=LLM_BASE_URL
+    )
+
+
+class StreamTimings:
+    """Latency of one streamed completion (seconds)."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.ttft = None
+        self.total = None
+        self.chunks = 0
+
+    def as_dict(self):
+        return {"ttft_s": self.ttft, "total_s": self.total, "chunks": self.chunks}
+
+
+def stream_chat(client, messages, timings, model=LLM_MODEL):
+    """Yields reply text deltas; fills `timings` (a StreamTimings) as they arrive."""
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True)
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if timings.ttft is None:
+                timings.ttft = time.perf_counter() - timings.start
+            timings.chunks += 1
+            yield delta
+    finally:
+        timings.total = time.perf_counter() - timings.start
+
+
+def complete(client, messages, on_text=None, model=LLM_MODEL):
+    """
+    Runs a streamed completion to the end and returns (reply, timings).
+    `on_text(text_so_far)` is called as text arrives.
+    """
+    timings = StreamTimings()
+    reply = ""
+    for delta in stream_chat(client, messages, timings, model):
+        reply += delta
+        if on_text:
+            on_text(reply)
+    return reply, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream one chat completion and report its latency")
+    parser.add_argument("question")
+    parser.add_argument("--model", default=LLM_MODEL)
+    args = parser.parse_args()
+
+    client = create_llm_client()
+    timings = StreamTimings()
+    messages = [{"role": "user", "content": args.question}]
+    for delta in stream_chat(client, messages, timings, args.model):
+        print(delta, end="", flush=True)
+    print(f"\n\n⏱️ first token {timings.ttft or 0:.2f}s, total {timings.total:.2f}s, {timings.chunks} chunks")
+
+
+if __name__ == "__main__":
+    main()
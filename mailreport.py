@@ -1,54 +1,196 @@
 # mailreport.py
 import os
 import smtplib
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
 from email import encoders
 
-def send_email_report(to_email, subject, body, attachment_path):
+# SMTP server (defaults to Gmail; point at a local debugging server for tests)
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
+SMTP_AUTH = os.getenv("SMTP_AUTH", "1") != "0"
+SMTP_MAX_RETRIES = 3
+# Dropped connections and timeouts are retried; 4xx replies too (see _transient)
+NETWORK_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+def build_attachment(attachment_data=None, attachment_path=None, attachment_name="report.pdf"):
     """
-    Send an email with a file attachment via Gmail SMTP.
+    Builds the base64-encoded MIME part once so it can be attached to many
+    messages. Returns None when there is nothing to attach.
     """
+    if attachment_data is None and attachment_path and os.path.exists(attachment_path):
+        with open(attachment_path, "rb") as f:
+            attachment_data = f.read()
+        attachment_name = os.path.basename(attachment_path)
+    if attachment_data is None:
+        return None
+    part = MIMEBase("application", "octet-stream")
+    part.set_payload(attachment_data)
+    encoders.encode_base64(part)
+    part.add_header(
+        "Content-Disposition",
+        f'attachment; filename="{attachment_name}"',
+    )
+    return part
 
-    sender_email = os.getenv("EMAIL_USER")
-    sender_password = os.getenv("EMAIL_PASS")
-
-    if not sender_email or not sender_password:
-        print("⚠️ Email credentials not set.")
-        return False
 
-    # Create email message
+def build_message(sender_email, to_email, subject, body, attachment_part=None):
     msg = MIMEMultipart()
     msg["From"] = sender_email
     msg["To"] = to_email
     msg["Subject"] = subject
     msg.attach(MIMEText(body, "plain"))
+    if attachment_part is not None:
+        msg.attach(attachment_part)
+    return msg
 
-    # Attach file if exists
-    if attachment_path and os.path.exists(attachment_path):
-        with open(attachment_path, "rb") as f:
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(f.read())
-            encoders.encode_base64(part)
-            part.add_header(
-                "Content-Disposition",
-                f'attachment; filename="{os.path.basename(attachment_path)}"',
-            )
-            msg.attach(part)
-    else:
-        print(f"⚠️ Attachment not found: {attachment_path}")
+
+# -----------------------------
+# Persistent SMTP session
+# -----------------------------
+class MailSession:
+    """
+    One authenticated SMTP connection reused for many messages. Connecting,
+    logging in and sending retry dropped connections and 4xx replies with backoff.
+    """
+
+    def __init__(self, sender_email, sender_password=None, host=SMTP_HOST, port=SMTP_PORT,
+                 starttls=SMTP_STARTTLS, auth=SMTP_AUTH, max_retries=SMTP_MAX_RETRIES):
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.host = host
+        self.port = port
+        self.starttls = starttls
+        self.auth = auth
+        self.max_retries = max_retries
+        self.server = None
+        self.stats = {"sent": 0, "failed": 0, "retries": 0, "connects": 0, "seconds": 0.0}
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
         return False
 
-    # Send email via Gmail SMTP
+    def connect(self):
+        """Opens the session, retrying transient connect/STARTTLS/login failures."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._open()
+                return
+            except Exception as e:
+                if not _transient(e) or attempt == self.max_retries:
+                    raise
+            self.stats["retries"] += 1
+            time.sleep(2 ** attempt)
+
+    def _open(self):
+        self.close()
+        server = smtplib.SMTP(timeout=30)
+        try:
+            server.connect(self.host, self.port)
+            if self.starttls:
+                server.starttls()
+            if self.auth:
+                server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        self.server = server
+        self.stats["connects"] += 1
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.server = None
+
+    def send(self, msg):
+        start = time.perf_counter()
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    if self.server is None:
+                        self._open()
+                    self.server.send_message(msg)
+                    self.stats["sent"] += 1
+                    return True
+                except Exception as e:
+                    if isinstance(e, NETWORK_ERRORS):
+                        self.server = None
+                    if not _transient(e) or attempt == self.max_retries:
+                        raise
+                self.stats["retries"] += 1
+                time.sleep(2 ** attempt)
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            self.stats["seconds"] += time.perf_counter() - start
+
+    def messages_per_sec(self):
+        return self.stats["sent"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+
+def _transient(error):
+    """Network errors and 4xx replies are worth retrying; 5xx replies (e.g. bad credentials) are not."""
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, NETWORK_ERRORS)
+
+
+def send_bulk(recipients, subject, body, attachment_path=None, attachment_data=None, attachment_name="report.pdf"):
+    """
+    Sends the same report to many recipients over one SMTP session.
+    The attachment is encoded once and shared by every message.
+    Returns ({recipient: success}, session stats).
+    """
+    sender_email = os.getenv("EMAIL_USER")
+    sender_password = os.getenv("EMAIL_PASS")
+
+    if not sender_email or (SMTP_AUTH and not sender_password):
+        print("⚠️ Email credentials not set.")
+        return {r: False for r in recipients}, {}
+
+    part = build_attachment(attachment_data, attachment_path, attachment_name)
+    if part is None:
+        print(f"⚠️ Attachment not found: {attachment_path}")
+        return {r: False for r in recipients}, {}
+
+    results = {}
+    session = MailSession(sender_email, sender_password)
     try:
-        server = smtplib.SMTP("smtp.gmail.com", 587)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-        print(f"✅ Email sent successfully to {to_email}")
-        return True
+        with session:
+            for to_email in recipients:
+                try:
+                    session.send(build_message(sender_email, to_email, subject, body, part))
+                    results[to_email] = True
+                    print(f"✅ Email sent successfully to {to_email}")
+                except Exception as e:
+                    results[to_email] = False
+                    print(f"⚠️ Email sending failed for {to_email}: {e}")
     except Exception as e:
         print(f"⚠️ Email sending failed: {e}")
-        return False
+        for to_email in recipients:
+            results.setdefault(to_email, False)
+
+    stats = dict(session.stats, messages_per_sec=session.messages_per_sec())
+    return results, stats
+
+
+def send_email_report(to_email, subject, body, attachment_path=None, attachment_data=None, attachment_name="report.pdf"):
+    """
+    Send an email with a file attachment via Gmail SMTP.
+    The attachment is either a file on disk (attachment_path) or in-memory
+    bytes (attachment_data, sent as attachment_name).
+    """
+    results, _ = send_bulk([to_email], subject, body, attachment_path, attachment_data, attachment_name)
+    return results[to_email]
@@ -0,0 +1,528 @@
+# migrations.py
+"""
+Versioned schema migrations for the detections table.
+
+Migrations are applied at deploy time, not by the app:
+
+    python migrations.py                    # apply pending migrations
+    python migrations.py --status
+    python migrations.py --partition-monthly
+
+Each one is recorded in schema_migrations. SQL migrations run in one
+transaction; the ones that touch existing rows are steps that build indexes
+CONCURRENTLY (outside a transaction) and backfill in id batches of
+MIGRATION_BATCH_ROWS, so writers are only blocked for short DDL statements.
+Several migrate() calls at once are serialised by an advisory lock.
+
+At runtime ensure_schema() only checks that nothing is pending (set
+SCHEMA_AUTO_MIGRATE=1 to apply migrations on first use in development). When
+detections is partitioned, it also creates the upcoming monthly partitions
+again every PARTITION_CHECK_SECONDS, so long-running processes never fall
+back to the default partition.
+"""
+import argparse
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+import resources
+from db_utils import db_connection, get_db_connection
+
+MIGRATION_LOCK_ID = 7318_2025
+PARTITION_LOCK_ID = 7318_2026
+PARTITION_MONTHS_AHEAD = 3
+PARTITION_CHECK_SECONDS = 6 * 3600
+# Rows per backfill UPDATE (one transaction each)
+MIGRATION_BATCH_ROWS = int(os.getenv("MIGRATION_BATCH_ROWS", "10000"))
+# Development only: apply pending migrations on first use instead of failing the schema check
+SCHEMA_AUTO_MIGRATE = os.getenv("SCHEMA_AUTO_MIGRATE", "0") == "1"
+
+# Indexes on detections as (migration, name, definition). Kept in one place so
+# partition_monthly() can replay all of them on the new partitioned table.
+# created_at has only the btree index: it also serves ORDER BY created_at DESC
+# LIMIT n, which a BRIN index cannot.
+DETECTION_INDEXES = [
+    (5, "detections_created_at_idx", "(created_at)"),
+    (5, "detections_class_created_at_idx", "(class, created_at)"),
+    (5, "detections_class_id_created_at_idx", "(class_id, created_at)"),
+    (8, "detections_s3_unconfirmed_idx", "(s3_path) WHERE s3_status IN ('pending', 'failed')"),
+]
+
+
+def detection_indexes_sql(versions):
+    return "".join(f"CREATE INDEX IF NOT EXISTS {name} ON detections {definition};\n"
+                   for version, name, definition in DETECTION_INDEXES if version in versions)
+
+
+# -----------------------------
+# Non-blocking migration steps
+# -----------------------------
+# Steps get a dedicated connection in autocommit mode; `transaction` groups
+# the statements that must commit together.
+@contextmanager
+def transaction(conn):
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cursor:
+            yield cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+
+def backfill(conn, sql, batch=None):
+    """
+    Runs `sql` (an UPDATE limited to `id > %(low)s AND id <= %(high)s`) over
+    every detections id in batches (default MIGRATION_BATCH_ROWS), committing
+    each one. Rows written later are filled in by the writers themselves.
+    """
+    batch = batch or MIGRATION_BATCH_ROWS
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MIN(id), 1), COALESCE(MAX(id), 0) FROM detections")
+        low, last = cursor.fetchone()
+        low -= 1
+        while low < last:
+            cursor.execute(sql, {"low": low, "high": low + batch})
+            low += batch
+
+
+def add_constraint(conn, name, definition, table="detections"):
+    """Adds a constraint NOT VALID (a short lock), then validates it without blocking writes."""
+    with transaction(conn) as cursor:
+        cursor.execute("SELECT 1 FROM pg_constraint WHERE conname = %s AND conrelid = %s::regclass",
+                       (name, table))
+        if cursor.fetchone() is None:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID")
+    with conn.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def _drop_if_invalid(cursor, name):
+    """Drops the leftover of an interrupted CREATE INDEX CONCURRENTLY."""
+    cursor.execute("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (name,))
+    row = cursor.fetchone()
+    if row and row[0]:
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def create_indexes(conn, version):
+    """
+    Builds the detections indexes of one migration without blocking writes.
+    A partitioned table gets an index ON ONLY the parent, one concurrently
+    built index per partition, attached to it (new partitions inherit it).
+    """
+    partitioned = is_partitioned(conn)
+    with conn.cursor() as cursor:
+        for index_version, name, definition in DETECTION_INDEXES:
+            if index_version != version:
+                continue
+            if not partitioned:
+                _drop_if_invalid(cursor, name)
+                cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON detections {definition}")
+                continue
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY detections {definition}")
+            cursor.execute("""
+                SELECT t.relid::regclass::text FROM pg_partition_tree('detections') t
+                WHERE t.isleaf AND NOT EXISTS (
+                    SELECT 1 FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid
+                    WHERE i.inhparent = %s::regclass AND x.indrelid = t.relid
+                )
+            """, (name,))
+            for (partition,) in cursor.fetchall():
+                child = f"{partition}_{name}"[:63]
+                _drop_if_invalid(cursor, child)
+                cursor.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {partition} {definition}")
+                cursor.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+
+
+def drop_index(conn, name):
+    with conn.cursor() as cursor:
+        concurrently = "" if is_partitioned(conn) else "CONCURRENTLY "   # not supported on partitioned indexes
+        cursor.execute(f"DROP INDEX {concurrently}IF EXISTS {name}")
+
+
+def _class_lookup(conn):
+    with transaction(conn) as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS detection_classes (
+                id SMALLSERIAL PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+            ALTER TABLE detections ADD COLUMN IF NOT EXISTS class_id SMALLINT;
+
+            -- Keep class_id in sync for writers that only set the class name
+            CREATE OR REPLACE FUNCTION detections_set_class_id() RETURNS trigger AS $$
+            BEGIN
+                IF NEW.class IS NOT NULL THEN
+                    SELECT id INTO NEW.class_id FROM detection_classes WHERE name = NEW.class;
+                    IF NEW.class_id IS NULL THEN
+                        INSERT INTO detection_classes (name) VALUES (NEW.class)
+                            ON CONFLICT (name) DO NOTHING;
+                        SELECT id INTO NEW.class_id FROM detection_classes WHERE name = NEW.class;
+                    END IF;
+                END IF;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS detections_class_id ON detections;
+            CREATE TRIGGER detections_class_id
+                BEFORE INSERT OR UPDATE OF class ON detections
+                FOR EACH ROW EXECUTE FUNCTION detections_set_class_id();
+        """)
+    # New rows get their class_id from the trigger; existing classes and rows are filled in here
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO detection_classes (name)
+                SELECT DISTINCT class FROM detections WHERE class IS NOT NULL
+                ON CONFLICT (name) DO NOTHING
+        """)
+    backfill(conn, """
+        UPDATE detections d SET class_id = c.id
+        FROM detection_classes c
+        WHERE c.name = d.class AND d.class_id IS NULL AND d.id > %(low)s AND d.id <= %(high)s
+    """)
+    add_constraint(conn, "detections_class_id_fkey", "FOREIGN KEY (class_id) REFERENCES detection_classes (id)")
+
+
+def _numeric_boxes(conn):
+    # confidence stays DOUBLE PRECISION on tables created before migration 1
+    # made it REAL: changing the type would rewrite the whole table
+    with transaction(conn) as cursor:
+        cursor.execute("""
+            ALTER TABLE detections
+                ADD COLUMN IF NOT EXISTS x1 REAL,
+                ADD COLUMN IF NOT EXISTS y1 REAL,
+                ADD COLUMN IF NOT EXISTS x2 REAL,
+                ADD COLUMN IF NOT EXISTS y2 REAL;
+        """)
+    backfill(conn, """
+        UPDATE detections SET
+            x1 = b[1], y1 = b[2], x2 = b[3], y2 = b[4]
+        FROM (
+            SELECT id AS box_id, string_to_array(btrim(box_coordinates, '[] '), ',')::REAL[] AS b
+            FROM detections
+            WHERE box_coordinates ~ '^\\[[-0-9., ]+\\]$' AND x1 IS NULL
+                AND id > %(low)s AND id <= %(high)s
+        ) parsed
+        WHERE detections.id = parsed.box_id
+    """)
+    add_constraint(conn, "detections_confidence_range", "CHECK (confidence >= 0 AND confidence <= 1)")
+
+
+def _s3_upload_state(conn):
+    with conn.cursor() as cursor:
+        # pending: row written while the upload is in flight; confirmed / failed once it settled.
+        # NULL for rows written before uploads moved to the background (uploaded before insert).
+        cursor.execute("ALTER TABLE detections ADD COLUMN IF NOT EXISTS s3_status TEXT")
+    create_indexes(conn, 8)
+
+
+MIGRATIONS = [
+    (1, "create detections", """
+        CREATE TABLE IF NOT EXISTS detections (
+            id SERIAL PRIMARY KEY,
+            class TEXT,
+            confidence REAL,
+            box_coordinates TEXT,
+            file_name TEXT,
+            s3_path TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """),
+    (2, "event aggregation columns", """
+        ALTER TABLE detections
+            ADD COLUMN IF NOT EXISTS first_frame INT DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS last_frame INT DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS box_count INT DEFAULT 1;
+    """),
+    (3, "class lookup table", _class_lookup),
+    (4, "numeric box columns", _numeric_boxes),
+    (5, "detections indexes", lambda conn: create_indexes(conn, 5)),
+    (6, "hourly and daily rollups", """
+        CREATE TABLE IF NOT EXISTS detection_rollup_hourly (
+            bucket TIMESTAMP NOT NULL,
+            class TEXT NOT NULL,
+            file_name TEXT NOT NULL DEFAULT '',
+            detections BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, class, file_name)
+        );
+        CREATE TABLE IF NOT EXISTS detection_rollup_daily (
+            bucket TIMESTAMP NOT NULL,
+            class TEXT NOT NULL,
+            file_name TEXT NOT NULL DEFAULT '',
+            detections BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket, class, file_name)
+        );
+        CREATE INDEX IF NOT EXISTS detection_rollup_hourly_class_idx ON detection_rollup_hourly (class, bucket);
+        CREATE INDEX IF NOT EXISTS detection_rollup_daily_class_idx ON detection_rollup_daily (class, bucket);
+
+        INSERT INTO detection_rollup_hourly (bucket, class, file_name, detections)
+            SELECT date_trunc('hour', created_at), class, COALESCE(file_name, ''), COUNT(*)
+            FROM detections WHERE class IS NOT NULL AND created_at IS NOT NULL
+            GROUP BY 1, 2, 3
+            ON CONFLICT (bucket, class, file_name) DO NOTHING;
+        INSERT INTO detection_rollup_daily (bucket, class, file_name, detections)
+            SELECT date_trunc('day', bucket), class, file_name, SUM(detections)
+            FROM detection_rollup_hourly
+            GROUP BY 1, 2, 3
+            ON CONFLICT (bucket, class, file_name) DO NOTHING;
+    """),
+    (7, "content-hash result cache", """
+        CREATE TABLE IF NOT EXISTS detection_results (
+            content_hash TEXT NOT NULL,
+            model_version TEXT NOT NULL,
+            frame_stride INT NOT NULL DEFAULT 1,
+            s3_path TEXT,
+            records JSONB NOT NULL,
+            size_bytes INT NOT NULL,
+            hits INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_hit_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (content_hash, model_version, frame_stride)
+        );
+        CREATE INDEX IF NOT EXISTS detection_results_last_hit_idx ON detection_results (last_hit_at);
+
+        CREATE TABLE IF NOT EXISTS detection_result_counters (
+            name TEXT PRIMARY KEY,
+            value BIGINT NOT NULL DEFAULT 0
+        );
+    """),
+    (8, "s3 upload state", _s3_upload_state),
+    (9, "drop duplicate created_at BRIN index", lambda conn: drop_index(conn, "detections_created_at_brin")),
+    # Bumped by insert_detections in the inserting transaction, so unlike
+    # MAX(id) it also changes when a row with a lower id commits late
+    (10, "detections write counter", """
+        CREATE TABLE IF NOT EXISTS detection_writes (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            version BIGINT NOT NULL DEFAULT 0
+        );
+        INSERT INTO detection_writes (id, version) VALUES (TRUE, 0) ON CONFLICT (id) DO NOTHING;
+    """),
+]
+
+
+def _ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+
+def applied_versions():
+    with db_connection(commit=True) as conn:
+        with conn.cursor() as cursor:
+            _ensure_migrations_table(cursor)
+            cursor.execute("SELECT version FROM schema_migrations")
+            return {row[0] for row in cursor.fetchall()}
+
+
+def pending_versions(target=None, migrations=MIGRATIONS):
+    done = applied_versions()
+    return [version for version, _, _ in migrations
+            if version not in done and (target is None or version <= target)]
+
+
+def apply_step(conn, step):
+    """Runs one migration's SQL (in a transaction) or step function on a connection in autocommit mode."""
+    if callable(step):
+        step(conn)
+    else:
+        with transaction(conn) as cursor:
+            cursor.execute(step)
+
+
+def _lock_migrations(cursor):
+    # Polls instead of waiting in pg_advisory_lock: a waiting session would
+    # hold a snapshot that CREATE INDEX CONCURRENTLY in the other one waits for
+    while True:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        if cursor.fetchone()[0]:
+            return
+        time.sleep(1.0)
+
+
+def migrate(target=None, migrations=MIGRATIONS):
+    """Applies pending migrations up to `target` (default: all). Returns the versions applied."""
+    applied = []
+    # A dedicated connection: steps switch autocommit, and closing it releases the session lock
+    conn = get_db_connection()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            _ensure_migrations_table(cursor)
+            _lock_migrations(cursor)
+            cursor.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in cursor.fetchall()}
+
+        for version, name, step in migrations:
+            if target is not None and version > target:
+                break
+            if version in done:
+                continue
+            if callable(step):
+                apply_step(conn, step)
+                with conn.cursor() as cursor:
+                    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (version, name))
+            else:
+                with transaction(conn) as cursor:
+                    cursor.execute(step)
+                    cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                                   (version, name))
+            applied.append(version)
+    finally:
+        conn.close()
+    _partition_check["at"] = None
+    maintain_partitions()
+    return applied
+
+
+def check_schema():
+    """Fails while migrations are pending (they are applied at deploy time), unless SCHEMA_AUTO_MIGRATE is set."""
+    pending = pending_versions()
+    if pending and SCHEMA_AUTO_MIGRATE:
+        return migrate()
+    if pending:
+        raise RuntimeError(f"database schema is out of date (pending migrations {pending}): "
+                           f"run `python migrations.py`")
+    return []
+
+
+resources.register("detections_schema", check_schema)
+_partition_check = {"at": None}
+_partition_lock = threading.Lock()
+
+
+def ensure_schema():
+    """Checks the schema once per process and keeps the next months' partitions created."""
+    applied = resources.get("detections_schema")
+    maintain_partitions()
+    return applied
+
+
+def maintain_partitions(max_age=PARTITION_CHECK_SECONDS):
+    """Creates upcoming monthly partitions if the last check in this process is older than `max_age`."""
+    with _partition_lock:
+        checked = _partition_check["at"]
+        if checked is not None and time.monotonic() - checked < max_age:
+            return False
+        try:
+            with db_connection(commit=True) as conn:
+                if is_partitioned(conn):
+                    ensure_monthly_partitions(conn)
+        except Exception as e:
+            # e.g. the month's rows already landed in detections_default; inserts still work
+            print(f"⚠️ Could not create upcoming partitions: {e}")
+        _partition_check["at"] = time.monotonic()
+        return True
+
+
+# -----------------------------
+# Optional monthly partitioning
+# -----------------------------
+def is_partitioned(conn, table="detections"):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT 1 FROM pg_partitioned_table p
+            JOIN pg_class c ON c.oid = p.partrelid
+            WHERE c.relname = %s AND c.relnamespace = to_regnamespace(current_schema())
+        """, (table,))
+        return cursor.fetchone() is not None
+
+
+def _month_start(d, offset=0):
+    index = d.year * 12 + d.month - 1 + offset
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def ensure_monthly_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD, start=None):
+    """Creates monthly partitions from `start` (default: this month) through months_ahead."""
+    first = _month_start(start or date.today())
+    last = _month_start(date.today(), months_ahead)
+    with conn.cursor() as cursor:
+        # Serialises concurrent creators (CREATE TABLE IF NOT EXISTS can still collide). Not the
+        # migration lock: a deploy holds that for as long as its backfills run.
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (PARTITION_LOCK_ID,))
+        month = first
+        while month <= last:
+            upper = _month_start(month, 1)
+            cursor.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS detections_{month:%Y_%m}
+                PARTITION OF detections FOR VALUES FROM (%s) TO (%s)
+                """,
+                (month, upper)
+            )
+            month = upper
+
+
+def partition_monthly(months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Converts detections into a table range-partitioned by month on created_at.
+    Rows are copied in one transaction; the primary key becomes (id, created_at).
+    """
+    migrate()
+    applied = applied_versions()
+    with db_connection(commit=True) as conn:
+        if is_partitioned(conn):
+            return False
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cursor.execute("LOCK TABLE detections IN ACCESS EXCLUSIVE MODE")
+            cursor.execute("SELECT COALESCE(MIN(created_at), NOW())::date FROM detections")
+            oldest = cursor.fetchone()[0]
+
+            cursor.execute("""
+                ALTER TABLE detections RENAME TO detections_unpartitioned;
+                ALTER TABLE detections_unpartitioned RENAME CONSTRAINT detections_pkey TO detections_unpartitioned_pkey;
+            """)
+            cursor.execute("""
+                CREATE TABLE detections (LIKE detections_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+                PARTITION BY RANGE (created_at);
+                ALTER TABLE detections ALTER COLUMN created_at SET NOT NULL;
+                ALTER TABLE detections ADD PRIMARY KEY (id, created_at);
+                ALTER TABLE detections ADD FOREIGN KEY (class_id) REFERENCES detection_classes (id);
+                CREATE TABLE detections_default PARTITION OF detections DEFAULT;
+            """)
+        ensure_monthly_partitions(conn, months_ahead, start=oldest)
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO detections SELECT * FROM detections_unpartitioned;
+                ALTER SEQUENCE detections_id_seq OWNED BY detections.id;
+                DROP TABLE detections_unpartitioned;
+                CREATE TRIGGER detections_class_id
+                    BEFORE INSERT OR UPDATE OF class ON detections
+                    FOR EACH ROW EXECUTE FUNCTION detections_set_class_id();
+            """)
+            # Re-create every applied migration's indexes on the partitioned parent
+            cursor.execute(detection_indexes_sql(applied))
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SafeRideAI schema migrations")
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations")
+    parser.add_argument("--target", type=int, default=None, help="Migrate up to this version")
+    parser.add_argument("--partition-monthly", action="store_true", help="Convert detections to monthly partitions")
+    args = parser.parse_args()
+
+    if args.status:
+        done = applied_versions()
+        for version, name, _ in MIGRATIONS:
+            print(f"{'✅' if version in done else '⏳'} {version:>3}  {name}")
+    elif args.partition_monthly:
+        print("✅ Partitioned detections by month" if partition_monthly() else "ℹ️ detections is already partitioned")
+    else:
+        applied = migrate(args.target)
+        print(f"✅ Applied migrations: {applied}" if applied else "✅ Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
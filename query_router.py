@@ -0,0 +1,293 @@
+# query_router.py
+"""
+Intent router for chatbot questions.
+
+Aggregate and time-range questions ("how many helmet violations this month",
+"accidents per day this week", "latest 5 accidents") are answered with
+parameterized SQL on detections instead of vector search. Only the
+whitelisted templates and filters below are ever executed; the question only
+supplies parameter values. Anything the router does not recognise returns
+None and goes through the usual RAG path; search_filters() turns the same
+vocabulary (plus month names, "accidents last March") into class and
+created_at filters for the vector index.
+
+    python query_router.py "how many helmet violations this month"
+"""
+import argparse
+import re
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from db_utils import db_cursor
+
+# -----------------------------
+# Whitelisted SQL
+# -----------------------------
+FILTERS = {
+    "class": "class IN (SELECT name FROM detection_classes WHERE name ILIKE ANY(%(patterns)s))",
+    "since": "created_at >= date_trunc(%(trunc)s, LOCALTIMESTAMP) + %(start)s::interval",
+    "until": "created_at < date_trunc(%(trunc)s, LOCALTIMESTAMP) + %(end)s::interval",
+    "from": "created_at >= %(from)s",
+    "to": "created_at < %(to)s",
+}
+
+TEMPLATES = {
+    "count": "SELECT COUNT(*) FROM detections WHERE {where}",
+    "count_by_class": """
+        SELECT class, COUNT(*) AS count FROM detections WHERE {where}
+        GROUP BY class ORDER BY count DESC
+    """,
+    "per_bucket": """
+        SELECT date_trunc(%(bucket)s, created_at) AS bucket, COUNT(*) AS count
+        FROM detections WHERE {where}
+        GROUP BY 1 ORDER BY 1
+    """,
+    "top_files": """
+        SELECT file_name, COUNT(*) AS count FROM detections WHERE {where}
+        GROUP BY file_name ORDER BY count DESC LIMIT %(limit)s
+    """,
+    "latest": """
+        SELECT class, confidence, file_name, created_at FROM detections WHERE {where}
+        ORDER BY created_at DESC LIMIT %(limit)s
+    """,
+}
+
+MAX_LIMIT = 50
+
+# -----------------------------
+# Vocabulary
+# -----------------------------
+# regex -> class name pattern (ILIKE), label used in result text
+CLASS_PATTERNS = [
+    (r"\b(without|no|missing)\s+helmets?\b|\bhelmet\s*less\b|\bhelmet\s+violations?\b",
+     "%Without Helmet%", "helmet violations"),
+    (r"\bwith\s+helmets?\b|\bcompliant\b", "%With Helmet%", "riders with helmets"),
+    (r"\baccidents?\b|\bcrash(es)?\b", "%Accident%", "accidents"),
+    (r"\btriple\b", "%Triple%", "triple riding"),
+]
+
+UNITS = {"hour": "hour", "hr": "hour", "day": "day", "week": "week", "month": "month", "year": "year"}
+
+# phrase -> (date_trunc unit, start offset, end offset or None)
+NAMED_RANGES = [
+    (r"\btoday\b", ("day", "0", None), "today"),
+    (r"\byesterday\b", ("day", "-1 day", "0"), "yesterday"),
+    (r"\bthis\s+week\b", ("week", "0", None), "this week"),
+    (r"\blast\s+week\b", ("week", "-1 week", "0"), "last week"),
+    (r"\bthis\s+month\b", ("month", "0", None), "this month"),
+    (r"\blast\s+month\b", ("month", "-1 month", "0"), "last month"),
+    (r"\bthis\s+year\b", ("year", "0", None), "this year"),
+]
+
+COUNT_WORDS = r"\b(how\s+many|count|number\s+of|total|how\s+often)\b"
+BUCKET_WORDS = [(r"\b(per|each|by)\s+hour\b|\bhourly\b", "hour"),
+                (r"\b(per|each|by)\s+day\b|\bdaily\b|\btrend\b", "day"),
+                (r"\b(per|each|by)\s+week\b|\bweekly\b", "week"),
+                (r"\b(per|each|by)\s+month\b|\bmonthly\b", "month")]
+FILE_WORDS = r"\b(which|what|top|most)\b.*\b(cameras?|files?|videos?|sources?)\b"
+BREAKDOWN_WORDS = r"\b(by|per|each)\s+(class|type|category)\b|\bbreakdown\b"
+LATEST_WORDS = r"\b(latest|recent|newest|last)\b"
+
+MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july",
+               "august", "september", "october", "november", "december"]
+MONTHS = {**{m: i for i, m in enumerate(MONTH_NAMES, 1)}, **{m[:3]: i for i, m in enumerate(MONTH_NAMES, 1)}, "sept": 9}
+MONTH_WORDS = (r"\b(?:(last|this|in|during|since|of)\s+)?(" + "|".join(sorted(MONTHS, key=len, reverse=True))
+               + r")\b\.?(?:\s+(\d{4})\b)?")
+
+Route = namedtuple("Route", "intent sql params description")
+SearchFilters = namedtuple("SearchFilters", "patterns since until label")
+
+
+def _time_range(text):
+    """(filters, params, label) for the time range mentioned in the question."""
+    month = _month_range(text, datetime.now())
+    if month:
+        since, until, label = month
+        return ["from"] + (["to"] if until else []), {"from": since, "to": until}, label
+    for pattern, (trunc, start, end), label in NAMED_RANGES:
+        if re.search(pattern, text):
+            filters = ["since"] + (["until"] if end is not None else [])
+            return filters, {"trunc": trunc, "start": start, "end": end}, label
+    m = re.search(r"\b(?:last|past|previous)\s+(\d+)?\s*(hour|hr|day|week|month|year)s?\b", text)
+    if m:
+        n = int(m.group(1) or 1)
+        unit = UNITS[m.group(2)]
+        return ["since"], {"trunc": "microseconds", "start": f"-{n} {unit}"}, f"in the last {n} {unit}{'s' if n > 1 else ''}"
+    return [], {}, "in total"
+
+
+def _classes(text):
+    patterns, labels = [], []
+    for regex, pattern, label in CLASS_PATTERNS:
+        if re.search(regex, text) and pattern not in patterns:
+            patterns.append(pattern)
+            labels.append(label)
+    return patterns, labels
+
+
+# -----------------------------
+# Vector search filters
+# -----------------------------
+def _add(moment, n, unit):
+    """moment + n units; months and years are calendar steps like Postgres intervals."""
+    if unit not in ("month", "year"):
+        return moment + timedelta(**{unit + "s": n})
+    months = moment.year * 12 + moment.month - 1 + n * (12 if unit == "year" else 1)
+    year, month = divmod(months, 12)
+    next_month = datetime(year + (month + 1) // 12, (month + 1) % 12 + 1, 1)
+    return moment.replace(year=year, month=month + 1, day=min(moment.day, (next_month - timedelta(days=1)).day))
+
+
+def _trunc(moment, unit):
+    """Python equivalent of date_trunc(unit, moment); weeks start on Monday."""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return {"hour": moment.replace(minute=0, second=0, microsecond=0), "day": day,
+            "week": day - timedelta(days=day.weekday()), "month": day.replace(day=1),
+            "year": day.replace(month=1, day=1)}[unit]
+
+
+def _offset(base, offset):
+    if offset == "0":
+        return base
+    n, unit = offset.split()
+    return _add(base, int(n), unit)
+
+
+def _month_range(text, now):
+    """(since, until, label) for a named month; without a year, the latest one that has started."""
+    for m in re.finditer(MONTH_WORDS, text):
+        prefix, name, year = m.groups()
+        if name == "may" and not (prefix or year):
+            continue          # "may" is usually not the month
+        month = MONTHS[name]
+        if year:
+            year = int(year)
+        elif month < now.month or (month == now.month and prefix != "last"):
+            year = now.year
+        else:
+            year = now.year - 1
+        start = datetime(year, month, 1)
+        if prefix == "since":
+            return start, None, f"since {start:%B %Y}"
+        return start, _add(start, 1, "month"), f"in {start:%B %Y}"
+    return None
+
+
+def _absolute_range(text, now):
+    """The time range of _time_range (and month names) as (since, until, label) datetimes."""
+    month = _month_range(text, now)
+    if month:
+        return month
+    for pattern, (trunc, start, end), label in NAMED_RANGES:
+        if re.search(pattern, text):
+            base = _trunc(now, trunc)
+            return _offset(base, start), None if end is None else _offset(base, end), label
+    m = re.search(r"\b(?:last|past|previous)\s+(\d+)?\s*(hour|hr|day|week|month|year)s?\b", text)
+    if m:
+        n = int(m.group(1) or 1)
+        unit = UNITS[m.group(2)]
+        return _add(now, -n, unit), None, f"in the last {n} {unit}{'s' if n > 1 else ''}"
+    return None, None, "at any time"
+
+
+def search_filters(question, now=None):
+    """Class patterns and created_at bounds mentioned in a question, for filtered vector search."""
+    text = question.lower()
+    patterns, labels = _classes(text)
+    since, until, range_label = _absolute_range(text, now or datetime.now())
+    return SearchFilters(patterns, since, until, f"{' and '.join(labels) or 'detections'} {range_label}")
+
+
+def route_question(question):
+    """Returns a Route for aggregate/time-range questions, or None for the RAG path."""
+    text = question.lower()
+    patterns, class_labels = _classes(text)
+    time_filters, params, range_label = _time_range(text)
+    has_range = bool(time_filters)
+    bucket = next((b for regex, b in BUCKET_WORDS if re.search(regex, text)), None)
+    limit_match = re.search(r"\b(\d{1,3})\b", re.sub(r"\b(?:last|past|previous)\s+\d+\s*\w+", " ", text))
+    limit = min(int(limit_match.group(1)), MAX_LIMIT) if limit_match else 5
+
+    if re.search(FILE_WORDS, text) and (re.search(COUNT_WORDS, text) or re.search(r"\bmost\b", text)):
+        intent = "top_files"
+    elif bucket and (patterns or has_range or re.search(COUNT_WORDS, text)):
+        intent = "per_bucket"
+    elif re.search(COUNT_WORDS, text) or re.search(BREAKDOWN_WORDS, text):
+        intent = "count" if len(patterns) == 1 and not re.search(BREAKDOWN_WORDS, text) else "count_by_class"
+    elif re.search(LATEST_WORDS, text) and patterns and not has_range:
+        intent = "latest"
+    else:
+        return None
+
+    filters = (["class"] if patterns else []) + time_filters
+    params.update({"patterns": patterns, "bucket": bucket or "day", "limit": limit})
+    where = " AND ".join(FILTERS[f] for f in filters) or "TRUE"
+    what = " and ".join(class_labels) or "detections"
+    description = {
+        "count": f"number of {what} {range_label}",
+        "count_by_class": f"{what} by class {range_label}",
+        "per_bucket": f"{what} per {bucket} {range_label}",
+        "top_files": f"sources with the most {what} {range_label}",
+        "latest": f"latest {limit} {what}",
+    }[intent]
+    return Route(intent, TEMPLATES[intent].format(where=where), params, description)
+
+
+# -----------------------------
+# Execution and result text
+# -----------------------------
+def run_route(route):
+    """Executes a routed query. Returns (rows, seconds)."""
+    start = time.perf_counter()
+    with db_cursor() as cursor:
+        cursor.execute(route.sql, route.params)
+        rows = cursor.fetchall()
+    return rows, time.perf_counter() - start
+
+
+def format_result(route, rows):
+    """Plain-text facts for the LLM to phrase (and a usable answer on its own)."""
+    if route.intent == "count":
+        return f"{route.description}: {rows[0][0]}"
+    if not rows:
+        return f"{route.description}: none"
+    if route.intent == "latest":
+        lines = [f"- {c} ({conf * 100:.1f}%) in {f} at {t:%Y-%m-%d %H:%M}" for c, conf, f, t in rows]
+    elif route.intent == "per_bucket":
+        fmt = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "week": "week of %Y-%m-%d", "month": "%Y-%m"}
+        lines = [f"- {b:{fmt[route.params['bucket']]}}: {n}" for b, n in rows]
+    else:
+        lines = [f"- {name or 'unknown'}: {n}" for name, n in rows]
+    return f"{route.description}:\n" + "\n".join(lines)
+
+
+def answer_messages(question, route, facts):
+    """Prompt that only asks the LLM to phrase an already computed result."""
+    return [
+        {"role": "system", "content": "You are SafeRideAI assistant. Phrase the database result as a short, friendly "
+                                      "answer to the question. Use the numbers exactly as given and do not add "
+                                      "detections or numbers that are not in the result."},
+        {"role": "user", "content": f"{question}\n\nDatabase result ({route.description}):\n{facts}"},
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Route a chatbot question to a whitelisted SQL template")
+    parser.add_argument("question")
+    parser.add_argument("--dry-run", action="store_true", help="Only show the template and parameters")
+    args = parser.parse_args()
+
+    route = route_question(args.question)
+    if route is None:
+        filters = search_filters(args.question)
+        print(f"ℹ️ Not an aggregate question: would use vector search over {filters.label}\n"
+              f"classes={filters.patterns} since={filters.since} until={filters.until}")
+        return
+    print(f"🧭 {route.intent}: {route.description}\n{route.sql.strip()}\n{route.params}")
+    if not args.dry_run:
+        rows, seconds = run_route(route)
+        print(f"\n{format_result(route, rows)}\n\n⏱️ {seconds * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
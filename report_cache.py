@@ -0,0 +1,111 @@
+# report_cache.py
+"""
+In-memory cache of rendered report PDFs.
+
+Entries are keyed by (report_type, window start, detections watermark), so
+a repeat request is served from cached bytes until a new detection is
+written or the report window moves to the next hour/day bucket. The
+watermark is the detection_writes counter, bumped in the transaction that
+inserts the rows: a row that commits after one with a higher id still
+changes it (MAX(id) would not). Eviction is LRU
+within a total size budget, plus a maximum age.
+"""
+import threading
+import time
+from collections import OrderedDict
+from db_utils import db_cursor
+from report_generate import REPORTS, render_report
+
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_AGE = 6 * 3600
+
+
+class ReportCache:
+    def __init__(self, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.entries = OrderedDict()     # key -> (pdf bytes, created)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and time.time() - entry[1] > self.max_age:
+                self._drop(key)
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, data):
+        with self._lock:
+            if key in self.entries:
+                self._drop(key)
+            if len(data) > self.max_bytes:
+                return
+            self.entries[key] = (data, time.time())
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.size,
+            }
+
+    def _drop(self, key):
+        data, _ = self.entries.pop(key)
+        self.size -= len(data)
+
+
+report_cache = ReportCache()
+
+
+def report_cache_key(report_type):
+    """(report_type, window start, detections write counter) for the report as it would be rendered now."""
+    spec = REPORTS[report_type]
+    granularity = "hour" if spec["bucket"] == "hour" else "day"
+    with db_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT
+                CASE WHEN %(interval)s::interval IS NULL THEN NULL
+                     ELSE date_trunc(%(granularity)s, NOW() - %(interval)s::interval) END,
+                (SELECT version FROM detection_writes)
+            """,
+            {"interval": spec.get("interval"), "granularity": granularity},
+        )
+        window_start, watermark = cursor.fetchone()
+    return (report_type, window_start, watermark)
+
+
+def get_report_pdf(report_type, include_details=True):
+    """Returns (pdf bytes, served_from_cache)."""
+    key = report_cache_key(report_type) + (include_details,)
+    cached = report_cache.get(key)
+    if cached is not None:
+        return cached, True
+    pdf_bytes = render_report(report_type, include_details=include_details)
+    report_cache.put(key, pdf_bytes)
+    return pdf_bytes, False
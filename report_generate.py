@@ -1,17 +1,111 @@
-import matplotlib.pyplot as plt
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 from io import BytesIO
 import pandas as pd
 from db_utils import fetch_data  # Your DB function
+from migrations import ensure_schema
+from rollups import ROLLUP_TABLES
+from report_render import STYLES, bar_chart, report_table
 
 
-def generate_report(report_type="last_24h", output_path="report.pdf"):
+# -----------------------
+# Report definitions: time window and/or class pattern, chart bucket size
+# Counts come from the hourly/daily rollups (windows are aligned to whole
+# rollup buckets); only the capped detail section reads raw detections.
+# Class filters resolve the pattern against the small detection_classes
+# lookup table so the (class, created_at) indexes can be used.
+# -----------------------
+REPORTS = {
+    "last_24h": {"interval": "24 HOURS", "bucket": "hour"},
+    "weekly": {"interval": "7 DAYS", "bucket": "day"},
+    "monthly": {"interval": "30 DAYS", "bucket": "day"},
+    "accident": {"pattern": "%Accident%", "bucket": "month"},
+    "helmet": {"pattern": "%Without Helmet%", "bucket": "month"},
+}
+DETAIL_LIMIT = 50
+
+
+def report_filter(report_type, time_column, granularity=None):
+    """WHERE clause and params for a report; `granularity` aligns the window start to a bucket."""
+    spec = REPORTS[report_type]
+    clauses, params = [], {}
+    if "interval" in spec:
+        start = "NOW() - %(interval)s::interval"
+        if granularity:
+            start = f"date_trunc('{granularity}', {start})"
+        clauses.append(f"{time_column} >= {start}")
+        params["interval"] = spec["interval"]
+    if "pattern" in spec:
+        clauses.append("class IN (SELECT name FROM detection_classes WHERE name ILIKE %(pattern)s)")
+        params["pattern"] = spec["pattern"]
+    return " AND ".join(clauses) or "TRUE", params
+
+
+def _rollup_for(report_type):
+    size = "hour" if REPORTS[report_type]["bucket"] == "hour" else "day"
+    return size, ROLLUP_TABLES[size]
+
+
+def fetch_class_counts(report_type):
+    """Per-class counts, read from the rollups."""
+    size, table = _rollup_for(report_type)
+    where, params = report_filter(report_type, "bucket", size)
+    return fetch_data(
+        f"""
+        SELECT class, SUM(detections)::BIGINT AS count
+        FROM {table} WHERE {where}
+        GROUP BY class ORDER BY count DESC
+        """,
+        params=params,
+    )
+
+
+def fetch_time_buckets(report_type):
+    """Detection counts per hour/day/month bucket, read from the rollups."""
+    size, table = _rollup_for(report_type)
+    where, params = report_filter(report_type, "bucket", size)
+    return fetch_data(
+        f"""
+        SELECT date_trunc(%(bucket)s, bucket) AS bucket, SUM(detections)::BIGINT AS count
+        FROM {table} WHERE {where}
+        GROUP BY 1 ORDER BY 1
+        """,
+        params={**params, "bucket": REPORTS[report_type]["bucket"]},
+    )
+
+
+def fetch_detail_rows(report_type, limit=DETAIL_LIMIT, offset=0):
+    """Newest raw rows for the detail section (same aligned window as the counts), one page at a time."""
+    where, params = report_filter(report_type, "created_at", _rollup_for(report_type)[0])
+    return fetch_data(
+        f"""
+        SELECT created_at, class, confidence, file_name
+        FROM detections WHERE {where}
+        ORDER BY created_at DESC
+        LIMIT %(limit)s OFFSET %(offset)s
+        """,
+        params={**params, "limit": limit, "offset": offset},
+    )
+
+
+def generate_report(report_type="last_24h", output_path="report.pdf", include_details=True, detail_limit=DETAIL_LIMIT,
+                    chart=None):
     """
-    Generate a PDF report for SafeRideAI detections.
+    Generate a PDF report for SafeRideAI detections and write it to output_path.
     Supports standard reports (last 24h, weekly, monthly, accident, helmet).
     """
+    pdf_bytes = render_report(report_type, include_details, detail_limit, chart)
+    with open(output_path, "wb") as f:
+        f.write(pdf_bytes)
+    return output_path
+
+
+def render_report(report_type="last_24h", include_details=True, detail_limit=DETAIL_LIMIT, chart=None):
+    """
+    Build the PDF report in memory and return its bytes.
+    Counts and time buckets are computed with GROUP BY queries; raw rows are
+    only fetched for the (capped) detail section. `chart` is "png" or
+    "vector" (default: REPORT_CHART).
+    """
 
     # -----------------------
     # Title mapping
@@ -28,33 +122,32 @@ def generate_report(report_type="last_24h", output_path="report.pdf"):
     # -----------------------
     # Build PDF
     # -----------------------
-    doc = SimpleDocTemplate(output_path, title=title)
-    styles = getSampleStyleSheet()
+    pdf_buf = BytesIO()
+    doc = SimpleDocTemplate(pdf_buf, title=title)
+    styles = STYLES
     story = [Paragraph(title, styles['Title']), Spacer(1, 20)]
 
     # -----------------------
-    # Fetch data
+    # Fetch aggregates
     # -----------------------
-    query_dict = {
-        "last_24h": "SELECT * FROM detections WHERE created_at >= NOW() - INTERVAL '24 HOURS'",
-        "weekly": "SELECT * FROM detections WHERE created_at >= NOW() - INTERVAL '7 DAYS'",
-        "monthly": "SELECT * FROM detections WHERE created_at >= NOW() - INTERVAL '30 DAYS'",
-        "accident": "SELECT * FROM detections WHERE class ILIKE '%Accident%'",
-        "helmet": "SELECT * FROM detections WHERE class ILIKE '%Without Helmet%'"
-    }
-    query = query_dict.get(report_type)
-    df = fetch_data(query)
+    try:
+        ensure_schema()
+    except Exception as e:
+        print(f"⚠️ Schema check failed: {e}")
+    class_counts = fetch_class_counts(report_type)
 
     # -----------------------
     # Build report content
     # -----------------------
-    if df.empty:
+    if class_counts.empty:
         story.append(Paragraph("✅ No records found for this report.", styles['Normal']))
     else:
         # Summary
-        total = len(df)
-        accident_count = df['class'].str.contains("Accident", case=False).sum()
-        helmet_count = df['class'].str.contains("Without Helmet", case=False).sum()
+        class_counts.columns = ["Class", "Count"]
+        class_counts["Count"] = class_counts["Count"].astype(int)
+        total = int(class_counts["Count"].sum())
+        accident_count = int(class_counts.loc[class_counts["Class"].str.contains("Accident", case=False), "Count"].sum())
+        helmet_count = int(class_counts.loc[class_counts["Class"].str.contains("Without Helmet", case=False), "Count"].sum())
         summary = f"""
         In the selected period, a total of <b>{total}</b> detections were recorded.<br/>
         Out of these, <b>{accident_count}</b> were accidents and <b>{helmet_count}</b> were helmet violations.<br/>
@@ -63,30 +156,36 @@ def generate_report(report_type="last_24h", output_path="report.pdf"):
         story.append(Spacer(1, 20))
 
         # Table
-        class_counts = df['class'].value_counts().reset_index()
-        class_counts.columns = ["Class", "Count"]
         table_data = [["Class", "Count"]] + class_counts.values.tolist()
-        table = Table(table_data, hAlign="LEFT")
-        table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey)
-        ]))
-        story.append(table)
+        story.append(report_table(table_data))
         story.append(Spacer(1, 20))
 
         # Chart
-        fig, ax = plt.subplots()
-        class_counts.set_index("Class")["Count"].plot(kind="bar", ax=ax)
-        plt.title("Detections by Class")
-        plt.xticks(rotation=45, ha="right")
-        plt.tight_layout()
-        img_buf = BytesIO()
-        plt.savefig(img_buf, format="png")
-        plt.close(fig)
-        img_buf.seek(0)
-        story.append(Image(img_buf, width=400, height=200))
+        story.append(bar_chart(class_counts["Class"].tolist(), class_counts["Count"].tolist(),
+                               "Detections by Class", chart))
         story.append(Spacer(1, 20))
 
+        # Time buckets
+        buckets = fetch_time_buckets(report_type)
+        if not buckets.empty:
+            bucket = REPORTS[report_type]["bucket"]
+            fmt = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "month": "%Y-%m"}[bucket]
+            story.append(Paragraph(f"Detections per {bucket}", styles['Heading2']))
+            rows = [[pd.Timestamp(b).strftime(fmt), int(c)] for b, c in buckets.itertuples(index=False)]
+            story.append(report_table([[bucket.title(), "Count"]] + rows))
+            story.append(Spacer(1, 20))
+
+        # Detail rows (capped)
+        if include_details:
+            details = fetch_detail_rows(report_type, limit=detail_limit)
+            if not details.empty:
+                story.append(Paragraph(f"Latest {len(details)} of {total} detections", styles['Heading2']))
+                rows = [
+                    [pd.Timestamp(t).strftime("%Y-%m-%d %H:%M"), c, f"{conf * 100:.1f}%", f]
+                    for t, c, conf, f in details.itertuples(index=False)
+                ]
+                story.append(report_table([["Time", "Class", "Confidence", "File"]] + rows))
+                story.append(Spacer(1, 20))
+
     doc.build(story)
-    return output_path
+    return pdf_buf.getvalue()
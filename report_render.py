@@ -0,0 +1,145 @@
+# report_render.py
+"""
+Shared PDF rendering layer for report_generate and chat_report.
+
+Stylesheets, paragraph and table styles are built once at import. Bar charts
+are drawn either as PNG on a per-thread, reused Agg figure (no pyplot global
+state, so no lock) or as a ReportLab-native vector drawing that skips
+rasterization entirely (REPORT_CHART=vector).
+"""
+import os
+import threading
+from io import BytesIO
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Image, Paragraph, Table, TableStyle
+
+REPORT_CHART = os.getenv("REPORT_CHART", "png")   # "png" or "vector"
+CHART_WIDTH = 400
+CHART_HEIGHT = 200
+CHART_DPI = 100
+CELL_PADDING = 12   # Table's default left + right cell padding
+
+# -----------------------------
+# Shared styles (built once)
+# -----------------------------
+STYLES = getSampleStyleSheet()
+CELL_STYLE = ParagraphStyle(
+    "CellStyle",
+    parent=STYLES["Normal"],
+    fontSize=9,
+    leading=11,
+    alignment=0  # 0=left, 1=center, 2=right
+)
+USER_STYLE = ParagraphStyle(
+    "UserStyle",
+    parent=STYLES["Normal"],
+    alignment=0,
+    textColor=colors.darkblue,
+    spaceAfter=6
+)
+ASSISTANT_STYLE = ParagraphStyle(
+    "AssistantStyle",
+    parent=STYLES["Normal"],
+    alignment=0,
+    textColor=colors.black,
+    spaceAfter=6
+)
+REPORT_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey)
+])
+CHAT_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),  # header center
+    ('ALIGN', (0, 1), (-1, -1), 'LEFT'),   # body left
+    ('ROWBACKGROUNDS', (1, 1), (-1, -1), [colors.whitesmoke, colors.lightcyan]),
+    ('FONTSIZE', (0, 0), (-1, -1), CELL_STYLE.fontSize),  # plain-string cells match CELL_STYLE
+    ('LEADING', (0, 0), (-1, -1), CELL_STYLE.leading),
+])
+
+
+def table_cell(text, width):
+    """
+    Plain string for short cells without markup (no Paragraph parse/wrap cost);
+    a wrapping Paragraph otherwise.
+    """
+    if "<" not in text and "&" not in text and \
+            stringWidth(text, CELL_STYLE.fontName, CELL_STYLE.fontSize) <= width - CELL_PADDING:
+        return text
+    return Paragraph(text, CELL_STYLE)
+
+
+def report_table(table_data):
+    table = Table(table_data, hAlign="LEFT")
+    table.setStyle(REPORT_TABLE_STYLE)
+    return table
+
+
+# -----------------------------
+# PNG charts on a reused Agg figure
+# -----------------------------
+_local = threading.local()
+
+
+def _figure():
+    """One Figure per thread, created on first use and cleared between charts."""
+    fig = getattr(_local, "figure", None)
+    if fig is None:
+        fig = Figure(figsize=(CHART_WIDTH / CHART_DPI * 2, CHART_HEIGHT / CHART_DPI * 2), dpi=CHART_DPI)
+        FigureCanvasAgg(fig)
+        # Fixed margins instead of tight_layout (which re-measures every label)
+        fig.subplots_adjust(left=0.1, right=0.98, top=0.9, bottom=0.35)
+        fig.add_subplot(111)
+        _local.figure = fig
+    return fig
+
+
+def bar_chart_png(labels, values, title):
+    fig = _figure()
+    ax = fig.axes[0]
+    ax.clear()
+    ax.bar(range(len(values)), values)
+    ax.set_xticks(range(len(labels)))
+    ax.set_xticklabels(labels, rotation=45, ha="right")
+    ax.set_title(title)
+    buf = BytesIO()
+    fig.savefig(buf, format="png")
+    buf.seek(0)
+    return Image(buf, width=CHART_WIDTH, height=CHART_HEIGHT)
+
+
+# -----------------------------
+# Vector charts (ReportLab graphics)
+# -----------------------------
+def bar_chart_vector(labels, values, title):
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    chart = VerticalBarChart()
+    chart.x, chart.y = 40, 60
+    chart.width, chart.height = CHART_WIDTH - 60, CHART_HEIGHT - 85
+    chart.data = [list(values)]
+    chart.valueAxis.valueMin = 0
+    chart.categoryAxis.categoryNames = [str(label) for label in labels]
+    chart.categoryAxis.labels.angle = 45
+    chart.categoryAxis.labels.boxAnchor = "ne"
+    chart.categoryAxis.labels.fontSize = 7
+    chart.bars[0].fillColor = colors.HexColor("#1f77b4")
+    drawing.add(chart)
+    drawing.add(String(CHART_WIDTH / 2, CHART_HEIGHT - 12, title, textAnchor="middle", fontSize=11))
+    return drawing
+
+
+def bar_chart(labels, values, title, mode=None):
+    """Bar chart flowable; `mode` is "png" or "vector" (default REPORT_CHART)."""
+    if (mode or REPORT_CHART) == "vector":
+        return bar_chart_vector(labels, values, title)
+    return bar_chart_png(labels, values, title)
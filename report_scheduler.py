@@ -0,0 +1,208 @@
+# report_scheduler.py
+"""
+Scheduled report worker.
+
+Runs configured daily/weekly/monthly report jobs off the UI thread on a
+bounded worker pool. Each run renders its PDF in memory (no shared
+report.pdf) and emails it to every recipient of the job.
+
+Jobs are read from REPORT_JOBS_FILE (default report_jobs.json), e.g.
+
+    [
+      {"name": "daily-ops", "report_type": "last_24h", "schedule": "daily", "at": "07:00",
+       "recipients": ["ops@example.com"]},
+      {"name": "weekly-summary", "report_type": "weekly", "schedule": "weekly", "weekday": 0,
+       "at": "08:00", "recipients": ["lead@example.com", "ops@example.com"]},
+      {"name": "monthly-accidents", "report_type": "accident", "schedule": "monthly", "day": 1,
+       "at": "09:00", "recipients": ["safety@example.com"]}
+    ]
+
+    python report_scheduler.py              # run forever
+    python report_scheduler.py --run-now daily-ops
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from mailreport import send_bulk
+from report_cache import get_report_pdf, report_cache
+
+REPORT_JOBS_FILE = os.getenv("REPORT_JOBS_FILE", "report_jobs.json")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+POLL_SECONDS = 30
+DEFAULT_BODY = "Hello,\n\nPlease find the attached SafeRideAI report.\n\nRegards,\nSafeRideAI"
+
+
+# -----------------------------
+# Schedules
+# -----------------------------
+def next_run(job, after):
+    """Next run time strictly after `after` for a daily/weekly/monthly job."""
+    hour, minute = (int(x) for x in job.get("at", "07:00").split(":"))
+    candidate = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    schedule = job["schedule"]
+
+    if schedule == "daily":
+        if candidate <= after:
+            candidate += timedelta(days=1)
+    elif schedule == "weekly":
+        candidate += timedelta(days=(int(job.get("weekday", 0)) - candidate.weekday()) % 7)
+        if candidate <= after:
+            candidate += timedelta(days=7)
+    elif schedule == "monthly":
+        day = int(job.get("day", 1))
+        if day > 28:
+            raise ValueError("monthly jobs must use day 1-28")
+        candidate = candidate.replace(day=day)
+        if candidate <= after:
+            month = candidate.month % 12 + 1
+            candidate = candidate.replace(year=candidate.year + (month == 1), month=month)
+    else:
+        raise ValueError(f"Unknown schedule: {schedule}")
+    return candidate
+
+
+def load_jobs(path=REPORT_JOBS_FILE):
+    with open(path, encoding="utf-8") as f:
+        jobs = json.load(f)
+    for job in jobs:
+        if not job.get("recipients"):
+            raise ValueError(f"Job {job.get('name')} has no recipients")
+        next_run(job, datetime.now())   # validates the schedule
+    return jobs
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+class ReportScheduler:
+    def __init__(self, jobs, workers=REPORT_WORKERS):
+        self.jobs = {job["name"]: job for job in jobs}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-worker")
+        self.next_runs = {name: next_run(job, datetime.now()) for name, job in self.jobs.items()}
+        self.running = set()
+        self.queued = 0
+        self.durations = {}          # job name -> list of seconds
+        self.failures = {}
+        self.renders = {}            # job name -> (render seconds, served from cache) of the last run
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def submit(self, name):
+        """Queues one run of a job; a job never runs twice concurrently."""
+        with self._lock:
+            if name in self.running:
+                return None
+            self.running.add(name)
+            self.queued += 1
+        return self.executor.submit(self._run_job, self.jobs[name])
+
+    def run_forever(self, poll_seconds=POLL_SECONDS):
+        print(f"🗓️ Report scheduler started with {len(self.jobs)} jobs")
+        while not self._stop.is_set():
+            now = datetime.now()
+            for name, due in list(self.next_runs.items()):
+                if due <= now:
+                    self.submit(name)
+                    self.next_runs[name] = next_run(self.jobs[name], now)
+            self._stop.wait(poll_seconds)
+
+    def stop(self, wait=True):
+        self._stop.set()
+        self.executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queued,
+                "running": sorted(self.running),
+                "report_cache": report_cache.stats(),
+                "jobs": {
+                    name: {
+                        "runs": len(self.durations.get(name, [])),
+                        "failures": self.failures.get(name, 0),
+                        "last_s": self.durations[name][-1] if self.durations.get(name) else None,
+                        "avg_s": sum(self.durations[name]) / len(self.durations[name]) if self.durations.get(name) else None,
+                        "last_render_s": self.renders[name][0] if name in self.renders else None,
+                        "last_cached": self.renders[name][1] if name in self.renders else None,
+                        "next_run": self.next_runs.get(name),
+                    }
+                    for name in self.jobs
+                },
+            }
+
+    def _run_job(self, job):
+        with self._lock:
+            self.queued -= 1
+            self.renders.pop(job["name"], None)
+        start = time.perf_counter()
+        ok = False
+        try:
+            render_start = time.perf_counter()
+            pdf_bytes, cached = get_report_pdf(job["report_type"])
+            with self._lock:
+                self.renders[job["name"]] = (time.perf_counter() - render_start, cached)
+            subject = job.get("subject", f"SafeRideAI {job['report_type'].replace('_', ' ').title()} Report")
+            name = f"saferideai_{job['report_type']}_{datetime.now():%Y%m%d_%H%M}.pdf"
+            results, mail_stats = send_bulk(
+                job["recipients"], subject, job.get("body", DEFAULT_BODY),
+                attachment_data=pdf_bytes, attachment_name=name,
+            )
+            sent = sum(results.values())
+            ok = sent == len(job["recipients"])
+            print(f"📤 {job['name']}: sent to {sent}/{len(job['recipients'])} recipients"
+                  f" ({mail_stats.get('messages_per_sec', 0):.1f} msg/s)"
+                  f"{' (cached PDF)' if cached else ''}")
+        except Exception as e:
+            print(f"⚠️ Report job {job['name']} failed: {e}")
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.running.discard(job["name"])
+                self.durations.setdefault(job["name"], []).append(elapsed)
+                self.durations[job["name"]] = self.durations[job["name"]][-100:]
+                if not ok:
+                    self.failures[job["name"]] = self.failures.get(job["name"], 0) + 1
+            print(f"⏱️ {job['name']} finished in {elapsed:.2f}s (queue depth {self.queued})")
+            self._log_stats(job["name"])
+        return ok
+
+    def _log_stats(self, name):
+        """One line per run with the render time and report cache counters (scheduled runs have no other output)."""
+        with self._lock:
+            render = self.renders.get(name)
+        cache = report_cache.stats()
+        rendered = (f"PDF {'from cache' if render[1] else f'rendered in {render[0]:.2f}s'}"
+                    if render else "PDF not rendered")
+        print(f"📊 {name}: {rendered}; report cache {cache['hits']} hits / {cache['misses']} misses "
+              f"({cache['hit_rate']:.0%}), {cache['entries']} entries, {cache['bytes'] / 1e6:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SafeRideAI scheduled report worker")
+    parser.add_argument("--jobs", default=REPORT_JOBS_FILE, help="Path to the jobs JSON file")
+    parser.add_argument("--workers", type=int, default=REPORT_WORKERS)
+    parser.add_argument("--run-now", nargs="+", metavar="JOB", help="Run these jobs once and exit")
+    args = parser.parse_args()
+
+    scheduler = ReportScheduler(load_jobs(args.jobs), workers=args.workers)
+    if args.run_now:
+        futures = [scheduler.submit(name) for name in args.run_now]
+        for future in futures:
+            if future:
+                future.result()
+        scheduler.stop()
+        print(json.dumps(scheduler.stats(), default=str, indent=2))
+        return
+
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop(wait=False)
+
+
+if __name__ == "__main__":
+    main()
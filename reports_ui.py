@@ -1,6 +1,6 @@
 import streamlit as st 
-from mailreport import send_email_report
-from report_generate import generate_report
+from mailreport import send_bulk
+from report_cache import get_report_pdf, report_cache
 
 
 def reports_ui():
@@ -13,7 +13,7 @@ def reports_ui():
     )
 
     # 🔹 Email inputs
-    to_email = st.text_input("Recipient Email:", placeholder="example@gmail.com")
+    to_email = st.text_input("Recipient Email(s):", placeholder="example@gmail.com, team@gmail.com")
     subject = st.text_input("Email Subject:", value="SafeRideAI Report")
     body = st.text_area(
         "Email Body:",
@@ -26,21 +26,37 @@ def reports_ui():
             st.warning("⚠️ Please enter recipient email.")
             return
 
-        # Generate PDF
-        file_path = generate_report(
-            report_type=report_type_ui,
-            output_path="report.pdf"
-        )
+        # Generate PDF (served from cache when no new detections arrived)
+        try:
+            pdf_bytes, cached = get_report_pdf(report_type_ui)
+        except Exception as e:
+            st.error(f"⚠️ Could not generate report: {e}")
+            return
+        if cached:
+            st.info("♻️ Report unchanged since last generation, using cached PDF.")
 
-        # Send email
-        success = send_email_report(
-            to_email=to_email,
+        # Send email (one SMTP session for every recipient)
+        recipients = [r.strip() for r in to_email.split(",") if r.strip()]
+        results, mail_stats = send_bulk(
+            recipients,
             subject=subject,
             body=body,
-            attachment_path=file_path
+            attachment_data=pdf_bytes,
+            attachment_name=f"saferideai_{report_type_ui}_report.pdf"
         )
 
-        if success:
-            st.success(f"✅ {report_type_ui.replace('_', ' ').title()} report sent successfully to {to_email}")
-        else:
-            st.error("⚠️ Failed to send email. Check logs for details.")
+        sent = [r for r, ok in results.items() if ok]
+        failed = [r for r, ok in results.items() if not ok]
+        if sent:
+            st.success(f"✅ {report_type_ui.replace('_', ' ').title()} report sent successfully to {', '.join(sent)}")
+        if failed:
+            st.error(f"⚠️ Failed to send email to {', '.join(failed)}. Check logs for details.")
+
+    # 🔹 Report cache statistics
+    stats = report_cache.stats()
+    with st.expander("🗄️ Report cache"):
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Hits", stats["hits"])
+        col2.metric("Misses", stats["misses"])
+        col3.metric("Hit rate", f"{stats['hit_rate'] * 100:.0f}%")
+        col4.metric("Cached", f"{stats['entries']} ({stats['bytes'] / 1024:.0f} KB)")
@@ -0,0 +1,100 @@
+# resources.py
+"""
+Lazy, process-wide registry for heavy dependencies (YOLO weights, embedder,
+FAISS index, S3/LLM clients, schema check). Modules register a factory at
+import time; the factory only runs on the first get() from the tab that
+needs it. Failed initialisations are not cached, so the next use retries.
+
+    python resources.py --profile
+"""
+import argparse
+import importlib
+import threading
+import time
+
+
+class _Resource:
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.value = None
+        self.loaded = False
+        self.seconds = None
+        self.lock = threading.Lock()
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def register(name, factory):
+    """Registers (or replaces) a lazily built resource."""
+    with _registry_lock:
+        _registry[name] = _Resource(name, factory)
+
+
+def get(name):
+    """Returns the resource, building it on first use."""
+    resource = _registry[name]
+    if resource.loaded:
+        return resource.value
+    with resource.lock:
+        if not resource.loaded:
+            start = time.perf_counter()
+            resource.value = resource.factory()
+            resource.seconds = time.perf_counter() - start
+            resource.loaded = True
+    return resource.value
+
+
+def reset(name):
+    """Drops a built resource so the next get() rebuilds it."""
+    resource = _registry[name]
+    with resource.lock:
+        resource.value = None
+        resource.loaded = False
+        resource.seconds = None
+
+
+def status():
+    """Name -> (loaded, init seconds) for every registered resource."""
+    return {name: (r.loaded, r.seconds) for name, r in _registry.items()}
+
+
+# -----------------------------
+# Startup profile
+# -----------------------------
+UI_MODULES = ["detection_ui", "chatbot_ui", "reports_ui"]
+
+
+def profile():
+    """Times importing each dashboard module, then building each registered resource."""
+    rows = []
+    for module in UI_MODULES:
+        start = time.perf_counter()
+        importlib.import_module(module)
+        rows.append(("import", module, time.perf_counter() - start, None))
+    for name in list(_registry):
+        try:
+            get(name)
+            rows.append(("resource", name, _registry[name].seconds, None))
+        except Exception as e:
+            rows.append(("resource", name, None, str(e)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SafeRideAI lazy resource registry")
+    parser.add_argument("--profile", action="store_true", help="Show import and first-use cost of each resource")
+    args = parser.parse_args()
+    if not args.profile:
+        parser.print_help()
+        return
+
+    for kind, name, seconds, error in profile():
+        cost = f"{seconds * 1000:10.1f} ms" if seconds is not None else f"{'failed':>13}"
+        print(f"{kind:<9} {name:<20} {cost}" + (f"  ({error})" if error else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# response_cache.py
+"""
+Semantic cache of chatbot answers.
+
+Entries are keyed by the normalized query embedding: a new question whose
+cosine similarity to a cached one is at least RESPONSE_CACHE_THRESHOLD gets
+the cached answer without an LLM call. Every entry is stamped with the
+watermark it was answered at (the number of vectors in the search index);
+when new detections reach the index all entries are dropped. Eviction is LRU
+by entry count.
+
+Routed (SQL template) questions are cached separately by RouteAnswerCache,
+keyed exactly by route and watermark (the detection_writes counter).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92"))
+# Relative ranges ("last 24 hours", "today") move without new detections
+ROUTE_CACHE_TTL = float(os.getenv("ROUTE_CACHE_TTL", "60"))
+
+
+def normalize(vector):
+    vector = np.asarray(vector, dtype="float32").reshape(-1)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticResponseCache:
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, threshold=RESPONSE_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.entries = OrderedDict()     # key -> (unit vector, query, answer)
+        self.watermark = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._next_key = 0
+        self._lock = threading.Lock()
+
+    def _check_watermark(self, watermark):
+        if watermark != self.watermark:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.watermark = watermark
+
+    def get(self, query_vector, watermark):
+        """Returns (answer, similarity, cached query) for the closest match above threshold, or None."""
+        with self._lock:
+            self._check_watermark(watermark)
+            if not self.entries:
+                self.misses += 1
+                return None
+            keys = list(self.entries)
+            matrix = np.stack([self.entries[k][0] for k in keys])
+            scores = matrix @ normalize(query_vector)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+            key = keys[best]
+            self.entries.move_to_end(key)
+            self.hits += 1
+            _, query, answer = self.entries[key]
+            return answer, float(scores[best]), query
+
+    def put(self, query_vector, query, answer, watermark):
+        with self._lock:
+            self._check_watermark(watermark)
+            self.entries[self._next_key] = (normalize(query_vector), query, answer)
+            self._next_key += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self.entries),
+                "watermark": self.watermark,
+            }
+
+
+class RouteAnswerCache:
+    """Answers to routed questions by (intent, SQL, params, watermark); entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=ROUTE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()     # key -> (answer, stored at)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(route, watermark):
+        params = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in route.params.items()))
+        return route.intent, route.sql, params, watermark
+
+    def get(self, route, watermark):
+        key = self.key(route, watermark)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, route, watermark, answer):
+        with self._lock:
+            self.entries[self.key(route, watermark)] = (answer, time.monotonic())
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+            }
+
+
+response_cache = SemanticResponseCache()
+route_answer_cache = RouteAnswerCache()
@@ -0,0 +1,269 @@
+# result_cache.py
+"""
+Content-addressed handling of uploads.
+
+Files are identified by the SHA-256 of their bytes, computed while they are
+copied from the uploader (or spooled by the detection service), so the same
+snapshot or clip uploaded twice - under any name - is recognised:
+  - S3 keys are derived from the hash (detections/ab/abcd....jpg), so
+    different files with the same name no longer overwrite each other
+  - detection_results (migration 7) keeps the display records of every run,
+    keyed by (content hash, model version, frame stride); a known file is
+    answered from there without inference, S3 upload or INSERT
+
+Eviction drops entries not requested for RESULT_CACHE_MAX_AGE_DAYS, then the
+least recently requested ones until the stored records fit RESULT_CACHE_MAX_MB.
+Hit/miss counters are kept per process and added to the shared database
+counters (all workers) every RESULT_CACHE_COUNTER_FLUSH seconds, on stats()
+and at exit, so a lookup does not write to one hot counter row.
+
+    python result_cache.py --stats
+    python result_cache.py --evict
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from db_utils import db_cursor
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE", "1") != "0"
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+RESULT_CACHE_MAX_AGE_DAYS = float(os.getenv("RESULT_CACHE_MAX_AGE_DAYS", "30"))
+# Eviction runs after every Nth store (and from the CLI)
+RESULT_CACHE_EVICT_EVERY = 50
+# Seconds between writes of the per-process counters to detection_result_counters
+RESULT_CACHE_COUNTER_FLUSH = 30.0
+HASH_CHUNK = 1024 * 1024
+
+
+# -----------------------------
+# Hashing
+# -----------------------------
+def copy_hashed(source, destination, chunk_size=HASH_CHUNK):
+    """Copies a file-like object into `destination` chunk by chunk. Returns the SHA-256 hex digest."""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: source.read(chunk_size), b""):
+        digest.update(chunk)
+        destination.write(chunk)
+    return digest.hexdigest()
+
+
+def hash_file(file_path, chunk_size=HASH_CHUNK):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_key(content_hash, file_name, prefix="detections"):
+    """S3 key for a file's content; the extension is kept for content types and viewers."""
+    return f"{prefix}/{content_hash[:2]}/{content_hash}{Path(file_name).suffix.lower()}"
+
+
+# -----------------------------
+# Result cache (detection_results)
+# -----------------------------
+class ResultCache:
+    def __init__(self, max_mb=RESULT_CACHE_MAX_MB, max_age_days=RESULT_CACHE_MAX_AGE_DAYS,
+                 evict_every=RESULT_CACHE_EVICT_EVERY, counter_flush=RESULT_CACHE_COUNTER_FLUSH):
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age_days = max_age_days
+        self.evict_every = evict_every
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.counter_flush = counter_flush
+        self._unflushed = {}
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get(self, content_hash, model_version, frame_stride=1):
+        """Returns (records, s3_path) for known content, or None. Counts the lookup."""
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(
+                """
+                UPDATE detection_results
+                SET hits = hits + 1, last_hit_at = LOCALTIMESTAMP
+                WHERE content_hash = %s AND model_version = %s AND frame_stride = %s
+                  AND last_hit_at >= LOCALTIMESTAMP - %s * INTERVAL '1 day'
+                RETURNING records, s3_path
+                """,
+                (content_hash, model_version, frame_stride, self.max_age_days)
+            )
+            row = cursor.fetchone()
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self._count("hits" if row else "misses")
+        return (row[0], row[1]) if row else None
+
+    def put(self, content_hash, model_version, frame_stride, records, s3_path):
+        payload = json.dumps(records, default=str)
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(
+                """
+                INSERT INTO detection_results
+                    (content_hash, model_version, frame_stride, s3_path, records, size_bytes)
+                VALUES (%s, %s, %s, %s, %s::jsonb, %s)
+                ON CONFLICT (content_hash, model_version, frame_stride) DO UPDATE SET
+                    s3_path = EXCLUDED.s3_path, records = EXCLUDED.records, size_bytes = EXCLUDED.size_bytes,
+                    created_at = LOCALTIMESTAMP, last_hit_at = LOCALTIMESTAMP
+                """,
+                (content_hash, model_version, frame_stride, s3_path, payload, len(payload))
+            )
+        with self._lock:
+            self.stores += 1
+            due = self.stores % self.evict_every == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Applies the age and size limits. Returns the number of entries removed."""
+        with db_cursor(commit=True) as cursor:
+            cursor.execute(
+                "DELETE FROM detection_results WHERE last_hit_at < LOCALTIMESTAMP - %s * INTERVAL '1 day'",
+                (self.max_age_days,)
+            )
+            removed = cursor.rowcount
+            cursor.execute(
+                """
+                DELETE FROM detection_results d
+                USING (
+                    SELECT content_hash, model_version, frame_stride,
+                           SUM(size_bytes) OVER (ORDER BY last_hit_at DESC, created_at DESC) AS running
+                    FROM detection_results
+                ) ranked
+                WHERE ranked.running > %s
+                  AND d.content_hash = ranked.content_hash
+                  AND d.model_version = ranked.model_version
+                  AND d.frame_stride = ranked.frame_stride
+                """,
+                (self.max_bytes,)
+            )
+            removed += cursor.rowcount
+        with self._lock:
+            self.evictions += removed
+        if removed:
+            self._count("evictions", removed)
+        return removed
+
+    def discard(self, s3_path):
+        """Drops results that point at `s3_path` (e.g. its upload failed)."""
+        with db_cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM detection_results WHERE s3_path = %s", (s3_path,))
+            return cursor.rowcount
+
+    def clear(self):
+        with db_cursor(commit=True) as cursor:
+            cursor.execute("DELETE FROM detection_results")
+
+    def stats(self):
+        """Process counters plus the shared table and counters."""
+        self.flush_counters()
+        with db_cursor() as cursor:
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM detection_results")
+            entries, size = cursor.fetchone()
+            cursor.execute("SELECT name, value FROM detection_result_counters")
+            shared = dict(cursor.fetchall())
+        with self._lock:
+            lookups = self.hits + self.misses
+            shared_lookups = shared.get("hits", 0) + shared.get("misses", 0)
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": entries,
+                "bytes": int(size),
+                "total_hits": shared.get("hits", 0),
+                "total_misses": shared.get("misses", 0),
+                "total_hit_rate": shared.get("hits", 0) / shared_lookups if shared_lookups else 0.0,
+                "total_evictions": shared.get("evictions", 0),
+            }
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._unflushed[name] = self._unflushed.get(name, 0) + n
+            due = time.monotonic() - self._flushed_at >= self.counter_flush
+        if due:
+            try:
+                self.flush_counters()
+            except Exception as e:
+                print(f"⚠️ Could not save result cache counters: {e}")
+
+    def flush_counters(self):
+        """Adds this process's counts since the last flush to detection_result_counters."""
+        with self._lock:
+            counts, self._unflushed = self._unflushed, {}
+            self._flushed_at = time.monotonic()
+        if not counts:
+            return
+        try:
+            with db_cursor(commit=True) as cursor:
+                for name, n in counts.items():
+                    cursor.execute(
+                        """
+                        INSERT INTO detection_result_counters (name, value) VALUES (%s, %s)
+                        ON CONFLICT (name) DO UPDATE SET value = detection_result_counters.value + EXCLUDED.value
+                        """,
+                        (name, n)
+                    )
+        except Exception:
+            # Keep the counts for the next flush
+            with self._lock:
+                for name, n in counts.items():
+                    self._unflushed[name] = self._unflushed.get(name, 0) + n
+            raise
+
+
+result_cache = ResultCache()
+
+
+def _flush_at_exit():
+    try:
+        result_cache.flush_counters()
+    except Exception as e:
+        print(f"⚠️ Could not save result cache counters: {e}")
+
+
+atexit.register(_flush_at_exit)
+
+
+def main():
+    from migrations import ensure_schema
+
+    parser = argparse.ArgumentParser(description="Detection result cache maintenance")
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--evict", action="store_true", help="Apply the size/age limits now")
+    parser.add_argument("--clear", action="store_true")
+    parser.add_argument("--hash", metavar="FILE", help="Print the content hash and S3 key of a file")
+    args = parser.parse_args()
+
+    if args.hash:
+        digest = hash_file(args.hash)
+        print(f"{digest}  {content_key(digest, args.hash)}")
+        return
+    ensure_schema()
+    if args.clear:
+        result_cache.clear()
+        print("🧹 Result cache cleared")
+    if args.evict:
+        print(f"🧹 Evicted {result_cache.evict()} entries")
+    stats = result_cache.stats()
+    print(f"📦 {stats['entries']} entries, {stats['bytes'] / 1e6:.1f} MB "
+          f"(limit {RESULT_CACHE_MAX_MB:.0f} MB, {RESULT_CACHE_MAX_AGE_DAYS:g} days)")
+    print(f"🎯 {stats['total_hits']} hits / {stats['total_misses']} misses "
+          f"({stats['total_hit_rate']:.1%}), {stats['total_evictions']} evicted")
+
+
+if __name__ == "__main__":
+    main()
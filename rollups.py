@@ -0,0 +1,88 @@
+# rollups.py
+"""
+Hourly and daily detection counts per class and source file.
+
+Rollups are updated in the same transaction as the detections INSERT
+(see detection_store.insert_detections), so reports and the chatbot can
+read a few hundred aggregate rows instead of scanning raw detections.
+rebuild() recomputes them from detections for repair or backfill.
+"""
+import argparse
+from collections import Counter
+from psycopg2.extras import execute_values
+from db_utils import db_cursor
+
+ROLLUP_TABLES = {"hour": "detection_rollup_hourly", "day": "detection_rollup_daily"}
+
+
+def record_batch(cursor, rows, file_name):
+    """Adds one inserted batch to both rollups. Rows take created_at = LOCALTIMESTAMP."""
+    counts = Counter(d.label for d in rows if d.label is not None)
+    if not counts:
+        return
+    values = [(label, file_name or "", n) for label, n in counts.items()]
+    for size, table in ROLLUP_TABLES.items():
+        execute_values(
+            cursor,
+            f"""
+            INSERT INTO {table} (bucket, class, file_name, detections)
+            VALUES %s
+            ON CONFLICT (bucket, class, file_name)
+            DO UPDATE SET detections = {table}.detections + EXCLUDED.detections
+            """,
+            values,
+            template=f"(date_trunc('{size}', LOCALTIMESTAMP), %s, %s, %s)",
+        )
+
+
+def rebuild(since=None):
+    """Recomputes rollups from detections, optionally only for buckets at or after `since`."""
+    conditions = ["class IS NOT NULL", "created_at IS NOT NULL"]
+    bucket_filter = ""
+    if since:
+        conditions.append("created_at >= date_trunc('day', %(since)s::timestamp)")
+        bucket_filter = "WHERE bucket >= date_trunc('day', %(since)s::timestamp)"
+    params = {"since": since}
+
+    with db_cursor(commit=True) as cursor:
+        for size, table in ROLLUP_TABLES.items():
+            cursor.execute(f"DELETE FROM {table} {bucket_filter}", params)
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (bucket, class, file_name, detections)
+                SELECT date_trunc('{size}', created_at), class, COALESCE(file_name, ''), COUNT(*)
+                FROM detections
+                WHERE {" AND ".join(conditions)}
+                GROUP BY 1, 2, 3
+                """,
+                params,
+            )
+
+
+def recent_class_counts(windows=(("last 24h", "hour", "24 HOURS"), ("last 7 days", "day", "7 DAYS"))):
+    """(window label, class, count) rows read from the rollups, for quick summaries."""
+    results = []
+    with db_cursor() as cursor:
+        for label, size, interval in windows:
+            cursor.execute(
+                f"""
+                SELECT class, SUM(detections) FROM {ROLLUP_TABLES[size]}
+                WHERE bucket >= date_trunc(%s, NOW() - %s::interval)
+                GROUP BY class ORDER BY 2 DESC
+                """,
+                (size, interval),
+            )
+            results.extend((label, cls, int(n)) for cls, n in cursor.fetchall())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild detection rollups from raw detections")
+    parser.add_argument("--since", default=None, help="Only rebuild from this date (YYYY-MM-DD)")
+    args = parser.parse_args()
+    rebuild(args.since)
+    print("✅ Rollups rebuilt" + (f" since {args.since}" if args.since else ""))
+
+
+if __name__ == "__main__":
+    main()
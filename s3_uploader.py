@@ -0,0 +1,305 @@
+# s3_uploader.py
+"""
+Background S3 uploads for detection sources.
+
+Uploads run on a small thread pool, so detection results are shown (and
+inserted) without waiting for a large video to reach S3. Each upload is an
+Upload handle: its s3_path is known at once, and its status moves from
+"pending" to "confirmed" or "failed" when the transfer settles. Rows are
+inserted with the pending state and flipped by the `on_settled` callback
+(see detection_pipeline), so readers can tell uploads that are still in flight.
+
+Large files use multipart transfers (S3_MULTIPART_CHUNK_MB parts,
+S3_MAX_CONCURRENCY parts in parallel); failed transfers are retried with
+backoff on top of botocore's own request retries. S3_ENDPOINT_URL points
+the client at MinIO or a moto server for local testing:
+
+    python s3_uploader.py clip.mp4 --endpoint-url http://127.0.0.1:5000 --create-bucket
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+S3_BUCKET = os.getenv("S3_BUCKET", "saferideai-detections-2025")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "4"))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16"))
+S3_MULTIPART_CHUNK_MB = int(os.getenv("S3_MULTIPART_CHUNK_MB", "16"))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "8"))
+S3_UPLOAD_RETRIES = int(os.getenv("S3_UPLOAD_RETRIES", "3"))
+# full: upload the source file; keyframes: for videos, only annotated keyframes
+S3_UPLOAD_MODE = os.getenv("S3_UPLOAD_MODE", "full")
+S3_KEYFRAME_GAP = int(os.getenv("S3_KEYFRAME_GAP", "30"))
+S3_MAX_KEYFRAMES = int(os.getenv("S3_MAX_KEYFRAMES", "50"))
+KEYFRAME_DIR = os.path.join(tempfile.gettempdir(), "saferide_keyframes")
+RETRY_BACKOFF = 0.5
+MB = 1024 * 1024
+
+
+# -----------------------------
+# Client and transfer settings
+# -----------------------------
+def create_s3_client(endpoint_url=S3_ENDPOINT_URL, workers=S3_UPLOAD_WORKERS, max_concurrency=S3_MAX_CONCURRENCY):
+    import boto3
+    from botocore.config import Config
+    return boto3.client("s3", endpoint_url=endpoint_url, config=Config(
+        retries={"max_attempts": 5, "mode": "adaptive"},
+        # every worker can have max_concurrency parts in flight
+        max_pool_connections=max(10, workers * max_concurrency),
+    ))
+
+
+def transfer_config(threshold_mb=S3_MULTIPART_THRESHOLD_MB, chunk_mb=S3_MULTIPART_CHUNK_MB,
+                    max_concurrency=S3_MAX_CONCURRENCY):
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=threshold_mb * MB,
+        multipart_chunksize=chunk_mb * MB,
+        max_concurrency=max_concurrency,
+        use_threads=max_concurrency > 1,
+    )
+
+
+def has_credentials():
+    """True if boto3 can find credentials (env, config files or instance role)."""
+    import boto3
+    return boto3.Session().get_credentials() is not None
+
+
+def object_exists(client, bucket, key):
+    from botocore.exceptions import BotoCoreError, ClientError
+    try:
+        client.head_object(Bucket=bucket, Key=key)
+        return True
+    except (BotoCoreError, ClientError):
+        return False
+
+
+# -----------------------------
+# Upload handle
+# -----------------------------
+class Upload:
+    """One source upload (a file, or a group of keyframes under one prefix)."""
+
+    def __init__(self, s3_path):
+        self.s3_path = s3_path
+        self.status = "pending"
+        self.error = None
+        self.bytes = 0
+        self.seconds = 0.0
+        self._lock = threading.RLock()
+        self._settled = threading.Event()
+
+    @contextmanager
+    def state(self):
+        """
+        Holds the status steady while the caller writes rows with it, so a
+        row is either inserted after the upload settled (and gets the final
+        status) or is already committed when the on_settled callback runs.
+        """
+        with self._lock:
+            yield self.s3_path, self.status
+
+    def settle(self, status, error=None, callbacks=()):
+        with self._lock:
+            self.status = status
+            self.error = error
+            for callback in callbacks:
+                try:
+                    callback(self)
+                except Exception as e:
+                    print(f"⚠️ Upload callback failed for {self.s3_path}: {e}")
+        self._settled.set()
+
+    def wait(self, timeout=None):
+        """Blocks until the upload settled. Returns True if it was confirmed."""
+        self._settled.wait(timeout)
+        return self.status == "confirmed"
+
+    def __str__(self):
+        return self.s3_path or ""
+
+
+# -----------------------------
+# Uploader
+# -----------------------------
+class S3Uploader:
+    def __init__(self, bucket=S3_BUCKET, workers=S3_UPLOAD_WORKERS, client=None, config=None,
+                 retries=S3_UPLOAD_RETRIES, on_settled=None):
+        self.bucket = bucket
+        self.workers = workers
+        self.client = client or create_s3_client(workers=workers)
+        self.config = config or transfer_config()
+        self.retries = retries
+        self.on_settled = [on_settled] if on_settled else []
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="s3-upload")
+        self.queued = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def uri(self, key):
+        return f"s3://{self.bucket}/{key}"
+
+    def pending(self, key):
+        """A handle for an upload whose files are handed over later with start()."""
+        return Upload(self.uri(key))
+
+    def submit(self, file_path, key, skip_existing=False, delete_after=False):
+        """Queues one file. Returns its Upload handle immediately."""
+        upload = self.pending(key)
+        self.start(upload, [(file_path, key)], skip_existing, delete_after)
+        return upload
+
+    def start(self, upload, files, skip_existing=False, delete_after=False):
+        """Queues the (file_path, key) pairs of `upload`; it settles when all of them are done."""
+        with self._lock:
+            self.queued += 1
+        self.executor.submit(self._run, upload, list(files), skip_existing, delete_after)
+        return upload
+
+    def _run(self, upload, files, skip_existing, delete_after):
+        start = time.perf_counter()
+        try:
+            for file_path, key in files:
+                if skip_existing and object_exists(self.client, self.bucket, key):
+                    with self._lock:
+                        self.skipped += 1
+                    continue
+                self._upload_with_retries(file_path, key)
+                upload.bytes += os.path.getsize(file_path)
+            status, error = "confirmed", None
+        except Exception as e:
+            status, error = "failed", repr(e)
+            print(f"⚠️ S3 upload failed for {upload.s3_path}: {e}")
+        finally:
+            if delete_after:
+                for file_path, _ in files:
+                    try:
+                        os.remove(file_path)
+                    except OSError:
+                        pass
+        upload.seconds = time.perf_counter() - start
+        with self._lock:
+            self.queued -= 1
+            self.confirmed += status == "confirmed"
+            self.failed += status == "failed"
+            self.bytes += upload.bytes
+            self.seconds += upload.seconds
+        upload.settle(status, error, self.on_settled)
+
+    def _upload_with_retries(self, file_path, key):
+        from botocore.exceptions import NoCredentialsError
+        for attempt in range(self.retries + 1):
+            try:
+                self.client.upload_file(file_path, self.bucket, key, Config=self.config)
+                return
+            except NoCredentialsError:
+                raise
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(RETRY_BACKOFF * 2 ** attempt * (0.5 + random.random()))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self.queued,
+                "confirmed": self.confirmed,
+                "failed": self.failed,
+                "skipped_existing": self.skipped,
+                "bytes": self.bytes,
+                "upload_seconds": self.seconds,
+                "mb_per_sec": self.bytes / MB / self.seconds if self.seconds else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+# -----------------------------
+# Keyframes
+# -----------------------------
+class KeyframeSet:
+    """
+    Annotated keyframes of one video: a frame with detections is kept when a
+    class shows up that the previous keyframe did not have, or when at least
+    `min_gap` frames have passed since it, up to `max_frames` in total.
+    """
+
+    def __init__(self, min_gap=S3_KEYFRAME_GAP, max_frames=S3_MAX_KEYFRAMES, directory=KEYFRAME_DIR):
+        self.min_gap = min_gap
+        self.max_frames = max_frames
+        self.directory = directory
+        self.token = uuid.uuid4().hex
+        self.frames = []                 # (frame index, local path)
+        self.last_frame = None
+        self.last_classes = set()
+
+    def add(self, frame_index, result, rows):
+        """Saves result.plot() as JPEG if the frame qualifies. Returns True if it was kept."""
+        if not rows or len(self.frames) >= self.max_frames:
+            return False
+        classes = {d.label for d in rows}
+        if self.last_frame is not None and classes <= self.last_classes \
+                and frame_index - self.last_frame < self.min_gap:
+            return False
+        import cv2
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.token}_{frame_index:07d}.jpg")
+        cv2.imwrite(path, result.plot(), [cv2.IMWRITE_JPEG_QUALITY, 85])
+        self.frames.append((frame_index, path))
+        self.last_frame, self.last_classes = frame_index, classes
+        return True
+
+    def files(self, prefix):
+        """(local path, S3 key) pairs under `prefix`."""
+        return [(path, f"{prefix}frame_{index:07d}.jpg") for index, path in self.frames]
+
+    def discard(self):
+        for _, path in self.frames:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.frames = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload files with the background S3 uploader")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--bucket", default=S3_BUCKET)
+    parser.add_argument("--prefix", default="uploads")
+    parser.add_argument("--endpoint-url", default=S3_ENDPOINT_URL, help="MinIO / moto server URL")
+    parser.add_argument("--create-bucket", action="store_true")
+    parser.add_argument("--workers", type=int, default=S3_UPLOAD_WORKERS)
+    parser.add_argument("--chunk-mb", type=int, default=S3_MULTIPART_CHUNK_MB)
+    parser.add_argument("--concurrency", type=int, default=S3_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    client = create_s3_client(args.endpoint_url, args.workers, args.concurrency)
+    if args.create_bucket:
+        client.create_bucket(Bucket=args.bucket)
+    uploader = S3Uploader(args.bucket, args.workers, client,
+                          transfer_config(args.chunk_mb, args.chunk_mb, args.concurrency))
+    uploads = [uploader.submit(f, f"{args.prefix}/{Path(f).name}") for f in args.files]
+    for upload in uploads:
+        print(f"{'✅' if upload.wait() else '⚠️'} {upload.s3_path} ({upload.bytes / MB:.1f} MB "
+              f"in {upload.seconds:.2f}s){' ' + upload.error if upload.error else ''}")
+    uploader.shutdown()
+    stats = uploader.stats()
+    print(f"📦 {stats['confirmed']} uploaded, {stats['failed']} failed, {stats['mb_per_sec']:.1f} MB/s per upload")
+
+
+if __name__ == "__main__":
+    main()
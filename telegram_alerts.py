@@ -0,0 +1,220 @@
+# telegram_alerts.py
+"""
+Background Telegram alert dispatcher.
+
+Alerts are enqueued without blocking the Streamlit thread. A single worker
+owns a keep-alive requests.Session, coalesces alerts that arrive within
+COALESCE_WINDOW seconds into one message per file, splits long captions to Telegram's size limits,
+spaces requests to respect the per-chat rate limit and retries 429/5xx
+responses with backoff. Set TELEGRAM_API_URL to point at a local stub server
+instead of https://api.telegram.org.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+import requests
+
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+CAPTION_LIMIT = 1024      # sendPhoto caption
+MESSAGE_LIMIT = 4096      # sendMessage text
+COALESCE_WINDOW = float(os.getenv("TELEGRAM_COALESCE_WINDOW", "2.0"))
+MIN_SEND_INTERVAL = float(os.getenv("TELEGRAM_MIN_INTERVAL", "1.0"))   # ~1 msg/sec per chat
+MAX_RETRIES = 5
+QUEUE_SIZE = 1000
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+# -----------------------------
+# Caption helpers
+# -----------------------------
+def format_detection(det, timestamp, s3_path=None):
+    line = (f"🕒 {timestamp}\n🏷️ Class: {det['Class']}\n✅ Confidence: {det['Confidence']:.1f}%"
+            f"\n📍 Location: {det['Box Coordinates']}")
+    if s3_path:
+        line += f"\nS3 Path: {s3_path}"
+    return line
+
+
+def chunk_text(blocks, limit):
+    """Packs text blocks into chunks of at most `limit` characters, splitting oversized blocks."""
+    chunks, current = [], ""
+    for block in blocks:
+        while len(block) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(block[:limit])
+            block = block[limit:]
+        candidate = f"{current}\n\n{block}" if current else block
+        if len(candidate) > limit:
+            chunks.append(current)
+            current = block
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# -----------------------------
+# Dispatcher
+# -----------------------------
+class AlertDispatcher:
+    def __init__(self, token, chat_id, api_url=TELEGRAM_API_URL, coalesce_window=COALESCE_WINDOW,
+                 min_interval=MIN_SEND_INTERVAL, max_retries=MAX_RETRIES):
+        self.base_url = f"{api_url.rstrip('/')}/bot{token}"
+        self.chat_id = chat_id
+        self.coalesce_window = coalesce_window
+        self.min_interval = min_interval
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.counts = {"enqueued": 0, "dropped": 0, "sent": 0, "retries": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._last_send = 0.0
+        self._stop = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="telegram-alerts", daemon=True)
+        self._worker.start()
+
+    def enqueue(self, file_path, detection_data, s3_path=None, photo=None):
+        """
+        Non-blocking; returns False when the queue is full and the alert is
+        dropped. `photo` is the image's bytes when file_path may be gone (or on
+        another process's spool) by the time the alert is sent.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        blocks = [format_detection(det, timestamp, s3_path) for det in detection_data]
+        try:
+            self.queue.put_nowait((file_path, blocks, photo))
+            self._count("enqueued")
+            return True
+        except queue.Full:
+            self._count("dropped")
+            return False
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def join(self, timeout=None):
+        """Waits until every queued alert has been handled (used by tests and shutdown)."""
+        deadline = time.monotonic() + timeout if timeout else None
+        while self.queue.unfinished_tasks:
+            if deadline and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def stop(self):
+        self._stop.set()
+        self._worker.join(timeout=5)
+        self.session.close()
+
+    # -- worker side --
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.coalesce_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._deliver(batch)
+            except Exception as e:
+                self._count("failed")
+                print(f"⚠️ Telegram alert failed: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _deliver(self, batch):
+        """Sends the coalesced alerts as one message (or photo) per file, in arrival order."""
+        by_file, photos = {}, {}
+        for path, alert_blocks, photo in batch:
+            by_file.setdefault(path, []).extend(alert_blocks)
+            if photo is not None:
+                photos.setdefault(path, photo)
+        for path, blocks in by_file.items():
+            self._deliver_file(path, blocks, photos.get(path))
+
+    def _deliver_file(self, path, blocks, photo=None):
+        is_image = bool(path) and path.lower().endswith(IMAGE_EXTENSIONS)
+        if is_image and photo is None and os.path.exists(path):
+            with open(path, "rb") as img:
+                photo = img.read()
+        if is_image and photo is not None:
+            caption_chunks = chunk_text(blocks, CAPTION_LIMIT)
+            self._post("sendPhoto", data={"chat_id": self.chat_id, "caption": caption_chunks[0]},
+                       files={"photo": (os.path.basename(path), photo)})
+            rest = "\n\n".join(caption_chunks[1:])
+            message_chunks = chunk_text([rest], MESSAGE_LIMIT) if rest else []
+        else:
+            message_chunks = chunk_text(blocks, MESSAGE_LIMIT)
+
+        for text in message_chunks:
+            self._post("sendMessage", json={"chat_id": self.chat_id, "text": text})
+
+    def _post(self, method, **kwargs):
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_send + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_send = time.monotonic()
+            try:
+                resp = self.session.post(f"{self.base_url}/{method}", timeout=15, **kwargs)
+            except requests.RequestException:
+                resp = None
+
+            if resp is not None and resp.ok:
+                self._count("sent")
+                return resp
+            if resp is not None and resp.status_code != 429 and resp.status_code < 500:
+                raise RuntimeError(f"{method} rejected: {resp.status_code} {resp.text[:200]}")
+            if attempt == self.max_retries:
+                break
+
+            self._count("retries")
+            delay = backoff
+            if resp is not None and resp.status_code == 429:
+                try:
+                    delay = float(resp.json().get("parameters", {}).get("retry_after", backoff))
+                except ValueError:
+                    pass
+            time.sleep(delay)
+            backoff = min(backoff * 2, 30.0)
+        raise RuntimeError(f"{method} failed after {self.max_retries} retries")
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def alerts_configured():
+    return bool(os.getenv("TELEGRAM_BOT_TOKEN") and os.getenv("TELEGRAM_CHAT_ID"))
+
+
+def get_dispatcher():
+    """Process-wide dispatcher, or None when TELEGRAM_BOT_TOKEN / TELEGRAM_CHAT_ID are not set."""
+    global _dispatcher
+    if not alerts_configured():
+        return None
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher(os.getenv("TELEGRAM_BOT_TOKEN"), os.getenv("TELEGRAM_CHAT_ID"))
+    return _dispatcher
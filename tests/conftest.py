@@ -0,0 +1,44 @@
+# tests/conftest.py
+"""
+Shared fixtures. Database tests run against a throwaway database created on
+the PostgreSQL server named by SAFERIDE_TEST_DB (a libpq DSN, e.g.
+"host=localhost user=postgres password=..."), and are skipped without it.
+"""
+import os
+import uuid
+import pytest
+
+
+@pytest.fixture
+def scratch_db(monkeypatch):
+    """Points db_utils at a new empty database for the duration of one test."""
+    dsn = os.getenv("SAFERIDE_TEST_DB")
+    if not dsn:
+        pytest.skip("SAFERIDE_TEST_DB is not set")
+    import psycopg2
+    import psycopg2.extensions
+    import db_utils
+    import migrations
+    import resources
+    from result_cache import result_cache
+
+    params = psycopg2.extensions.parse_dsn(dsn)
+    name = f"saferide_test_{uuid.uuid4().hex[:12]}"
+    admin = psycopg2.connect(**params)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE {name}")
+
+    db_utils.close_pool()
+    monkeypatch.setattr(db_utils, "DB_CONFIG", {**params, "dbname": name})
+    monkeypatch.setitem(migrations._partition_check, "at", None)
+    resources.reset("detections_schema")
+    try:
+        yield name
+    finally:
+        result_cache.flush_counters()       # not at exit, against a database that is gone
+        db_utils.close_pool()
+        resources.reset("detections_schema")
+        with admin.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS {name} WITH (FORCE)")
+        admin.close()
@@ -0,0 +1,28 @@
+# tests/test_detection_pipeline.py
+import detection_pipeline
+import migrations
+from result_cache import result_cache
+from s3_uploader import Upload
+
+RECORDS = [{"Class": "Accident", "Confidence": 91.5, "Box Coordinates": "[10, 20, 110, 220]"}]
+
+
+def cached(content_hash):
+    return result_cache.get(content_hash, "test-model", 1)
+
+
+def test_store_cached_skips_failed_and_discards_late_failures(scratch_db, monkeypatch):
+    monkeypatch.setattr(detection_pipeline, "get_model_version", lambda: "test-model")
+    migrations.migrate()
+    assert detection_pipeline.ensure_table()
+
+    failed = Upload("detections/failed.mp4")
+    failed.settle("failed", "upload error")
+    detection_pipeline.store_cached("failed-hash", 1, RECORDS, failed)
+    assert cached("failed-hash") is None
+
+    upload = Upload("detections/late.mp4")
+    detection_pipeline.store_cached("late-hash", 1, RECORDS, upload)
+    assert cached("late-hash") is not None
+    upload.settle("failed", "upload error", callbacks=[detection_pipeline.record_upload])
+    assert cached("late-hash") is None
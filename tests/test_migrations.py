@@ -0,0 +1,70 @@
+# tests/test_migrations.py
+import pytest
+import migrations
+import resources
+from db_utils import db_cursor
+
+
+def index_names(table="detections"):
+    with db_cursor() as cursor:
+        cursor.execute("SELECT indexname FROM pg_indexes WHERE tablename = %s", (table,))
+        return {row[0] for row in cursor.fetchall()}
+
+
+def expected_indexes():
+    return {name for _, name, _ in migrations.DETECTION_INDEXES}
+
+
+def test_migrate_creates_every_detection_index(scratch_db):
+    migrations.migrate()
+    names = index_names()
+    assert expected_indexes() <= names
+    assert "detections_created_at_brin" not in names
+
+
+def test_schema_check_does_not_migrate(scratch_db, monkeypatch):
+    monkeypatch.setattr(migrations, "SCHEMA_AUTO_MIGRATE", False)
+    with pytest.raises(RuntimeError, match="python migrations.py"):
+        migrations.ensure_schema()
+    assert migrations.pending_versions() == [version for version, _, _ in migrations.MIGRATIONS]
+
+    migrations.migrate()
+    resources.reset("detections_schema")
+    assert migrations.ensure_schema() == []
+
+
+def test_existing_rows_are_backfilled_in_batches(scratch_db, monkeypatch):
+    migrations.migrate(target=2)
+    with db_cursor(commit=True) as cursor:
+        cursor.execute("""
+            INSERT INTO detections (class, confidence, box_coordinates, file_name)
+            SELECT (ARRAY['Accident', 'With Helmet', 'Without Helmet'])[1 + g % 3], 0.5, '[1, 2, 3, 4]', 'cam.jpg'
+            FROM generate_series(1, 250) g
+        """)
+    monkeypatch.setattr(migrations, "MIGRATION_BATCH_ROWS", 40)
+    migrations.migrate()
+
+    with db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) FILTER (WHERE class_id IS NULL), COUNT(*) FILTER (WHERE x2 <> 3) "
+                       "FROM detections")
+        assert cursor.fetchone() == (0, 0)
+        cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = 'detections'::regclass "
+                       "AND NOT convalidated")
+        assert cursor.fetchall() == []
+
+
+def test_partition_monthly_recreates_every_detection_index(scratch_db):
+    migrations.migrate()
+    with db_cursor(commit=True) as cursor:
+        cursor.execute("INSERT INTO detections (class, confidence, file_name, s3_path, s3_status) "
+                       "VALUES ('Accident', 0.9, 'cam.jpg', 's3://b/cam.jpg', 'pending')")
+
+    assert migrations.partition_monthly()
+
+    with db_cursor() as cursor:
+        assert migrations.is_partitioned(cursor.connection)
+        cursor.execute("SELECT COUNT(*) FROM detections WHERE s3_status = 'pending'")
+        assert cursor.fetchone()[0] == 1
+    names = index_names()
+    assert "detections_s3_unconfirmed_idx" in names
+    assert expected_indexes() <= names
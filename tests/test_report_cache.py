@@ -0,0 +1,23 @@
+# tests/test_report_cache.py
+import migrations
+from db_utils import get_db_connection
+from report_cache import report_cache_key
+
+
+def test_report_key_changes_when_a_lower_id_commits_late(scratch_db):
+    migrations.migrate()
+    slow = get_db_connection()
+    with slow.cursor() as cursor:
+        cursor.execute("INSERT INTO detections (class, confidence, file_name) VALUES ('Accident', 0.9, 'slow.jpg')")
+        cursor.execute("UPDATE detection_writes SET version = version + 1")
+    fast = get_db_connection()
+    with fast.cursor() as cursor:
+        cursor.execute("INSERT INTO detections (class, confidence, file_name) VALUES ('Accident', 0.9, 'fast.jpg')")
+        cursor.execute("UPDATE detection_writes SET version = version + 1")
+    before = report_cache_key("accident")
+    slow.commit()
+    fast.commit()
+    slow.close()
+    fast.close()
+    after = report_cache_key("accident")
+    assert before != after
@@ -0,0 +1,50 @@
+# tests/test_vector_index.py
+import hashlib
+import numpy as np
+import migrations
+from db_utils import db_cursor, get_db_connection
+from detection_store import Detection, insert_detections
+from vector_index import DetectionVectorIndex
+
+
+class HashEmbedder:
+    """Deterministic 16-d "embeddings" so the test does not load a model."""
+
+    def get_sentence_embedding_dimension(self):
+        return 16
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True):
+        return np.array([np.frombuffer(hashlib.sha256(t.encode()).digest()[:16], dtype=np.uint8)
+                         for t in texts], dtype="float32")
+
+
+def detections_version():
+    with db_cursor() as cursor:
+        cursor.execute("SELECT version FROM detection_writes")
+        return cursor.fetchone()[0]
+
+
+def test_refresh_adds_rows_that_commit_late(scratch_db):
+    migrations.migrate()
+    insert_detections([Detection("Accident", 0.9, (0, 0, 10, 10))] * 3, "old.jpg", None)
+    index = DetectionVectorIndex(HashEmbedder(), kind="flat", directory="")
+    assert index.build(log=lambda _: None) == 3
+
+    # A writer takes an id, then a later writer commits a higher one first
+    slow = get_db_connection()
+    with slow.cursor() as cursor:
+        cursor.execute("INSERT INTO detections (class, confidence, file_name) VALUES ('Accident', 0.8, 'slow.jpg') "
+                       "RETURNING id")
+        late_id = cursor.fetchone()[0]
+    version = detections_version()
+    insert_detections([Detection("Without Helmet", 0.7, (0, 0, 10, 10))], "fast.jpg", None)
+    assert detections_version() == version + 1
+    assert index.refresh() == 1
+    assert index.max_id > late_id
+
+    slow.commit()
+    slow.close()
+    assert index.refresh() == 1
+    assert late_id in index.ids and list(index.ids) == sorted(index.ids)
+    assert index.late_rows == 1
+    assert index.refresh() == 0
@@ -0,0 +1,608 @@
+# vector_index.py
+"""
+Approximate nearest-neighbour index over the full detections history.
+
+The chatbot's old index held only the newest INDEX_WINDOW rows in a flat
+index, so older detections could not be retrieved and a bigger window made
+every query linear in its size. This index covers every row:
+  - the index type follows the history size (VECTOR_INDEX_TYPE=auto): exact
+    flat search below 50k vectors, IVF-Flat below 2M, IVF-PQ (48 bytes per
+    vector, re-ranked exactly) above; HNSW can be picked explicitly
+  - IVF centroids and PQ codebooks are trained on a random TABLESAMPLE of
+    the table, then the whole history is embedded and added in id-ordered
+    chunks (keyset pagination, VECTOR_EMBED_CHUNK rows per round trip)
+  - class id and created_at of every vector are kept next to the index, so
+    "accidents last March" only scores vectors that pass the filter (a
+    bitmap IDSelector); nprobe / efSearch grow as the filter gets narrower
+  - refresh() embeds rows with id > max_id, like the old index, and
+    re-scans the last VECTOR_REFRESH_LOOKBACK ids for rows that committed
+    after a higher id was indexed; it never builds: a missing index is built
+    by start_build() in a background thread (or ahead of time with --build)
+    while callers fall back to recent rows
+  - the saved index is memory-mapped on load (IO_FLAG_MMAP; IVF lists are
+    read into memory before the first refresh adds to them), and embeddings
+    are kept in a content-hash cache next to it, so a restart or a --build
+    only embeds texts it has not seen
+
+Texts are read back from detections for the returned ids only.
+
+    python vector_index.py --build --type auto
+    python vector_index.py --search "accidents last March" -k 5
+    python vector_index.py --stats
+    python vector_index.py --profile-startup
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+import faiss
+import numpy as np
+from db_utils import db_cursor
+from faiss_index import INDEX_DIR, EmbeddingCache, atomic_write, detection_text, save_json
+
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto")
+VECTOR_INDEX_DIR = os.path.join(INDEX_DIR, "history") if INDEX_DIR else ""
+EMBED_CHUNK = int(os.getenv("VECTOR_EMBED_CHUNK", "20000"))     # rows per DB round trip
+EMBED_BATCH = int(os.getenv("VECTOR_EMBED_BATCH", "256"))       # texts per encode() batch
+TRAIN_SAMPLE = int(os.getenv("VECTOR_TRAIN_SAMPLE", "100000"))
+NPROBE = int(os.getenv("VECTOR_NPROBE", "16"))
+EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "64"))
+HNSW_M = 32
+TRAIN_POINTS_PER_LIST = 50
+# Filters matching at most this many vectors are searched exactly (flat / HNSW)
+EXACT_FILTER_LIMIT = 20000
+MAX_EF_SEARCH = 4096
+# PQ distances are approximate: RERANK_FACTOR x k candidates are re-embedded and ranked exactly
+RERANK_FACTOR = 4
+# Ids below max_id re-scanned by refresh(): a transaction that commits late leaves a gap there
+REFRESH_LOOKBACK = int(os.getenv("VECTOR_REFRESH_LOOKBACK", "5000"))
+# Refreshed rows are written to disk once this many are pending (and after a build)
+SAVE_EVERY = 1000
+# A background build that found no detections (or failed) is retried after this long
+BUILD_RETRY_SECONDS = 300
+
+INDEX_TYPES = ("auto", "flat", "ivf", "ivfpq", "hnsw")
+
+
+# -----------------------------
+# Index layout
+# -----------------------------
+def choose_type(n):
+    if n < 50_000:
+        return "flat"
+    return "ivf" if n < 2_000_000 else "ivfpq"
+
+
+def nlist_for(n):
+    """About 4*sqrt(n) inverted lists (a power of two), with enough vectors to train each one."""
+    nlist = 2 ** round(math.log2(max(1.0, 4 * math.sqrt(n))))
+    return max(1, min(nlist, n // 39))
+
+
+def pq_subquantizers(dim):
+    """8 dimensions per 8-bit code where possible (384-d MiniLM vectors -> 48 bytes)."""
+    for width in (8, 4, 2, 1):
+        if dim % width == 0:
+            return dim // width
+
+
+def factory_string(kind, dim, n):
+    if kind == "flat":
+        return "IDMap2,Flat"
+    if kind == "hnsw":
+        return f"IDMap2,HNSW{HNSW_M}"
+    nlist = nlist_for(n)
+    # Large coarse quantizers are searched with HNSW instead of a linear scan over the centroids
+    coarse = f"IVF{nlist}_HNSW32" if nlist >= 8192 else f"IVF{nlist}"
+    # np: no polysemous training (several times slower to train, unused by IVF search)
+    return f"{coarse},Flat" if kind == "ivf" else f"{coarse},PQ{pq_subquantizers(dim)}x8np"
+
+
+def train_size(kind, n, sample_size=TRAIN_SAMPLE):
+    if kind not in ("ivf", "ivfpq"):
+        return 0
+    return min(n, max(sample_size, TRAIN_POINTS_PER_LIST * nlist_for(n)))
+
+
+def id_selector(ids, mask):
+    """
+    IDSelector for the ids where mask is set, plus its backing array (keep it
+    alive for the search). Dense ids use a bitmap: one bit per id, no hashing.
+    """
+    selected = ids[mask]
+    max_id = int(ids[-1]) if len(ids) else 0
+    if max_id < 64 * max(1, len(ids)):
+        dense = np.zeros(max_id + 1, dtype=bool)
+        dense[selected] = True
+        bitmap = np.packbits(dense, bitorder="little")
+        return faiss.IDSelectorBitmap(len(dense), faiss.swig_ptr(bitmap)), bitmap
+    selected = np.ascontiguousarray(selected, dtype="int64")
+    return faiss.IDSelectorBatch(len(selected), faiss.swig_ptr(selected)), selected
+
+
+def search_params(index, selector=None, selectivity=1.0, nprobe=NPROBE, ef_search=EF_SEARCH):
+    """
+    SearchParameters for `index`. A filter that keeps a fraction `selectivity`
+    of the vectors leaves that fraction of neighbours in every probed list, so
+    nprobe / efSearch are scaled by 1/selectivity (IVF up to every list).
+    """
+    boost = 1.0 / max(selectivity, 1e-9)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=int(min(ivf.nlist, math.ceil(nprobe * boost))))
+    inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(inner, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=int(min(MAX_EF_SEARCH, math.ceil(ef_search * boost))))
+    return faiss.SearchParameters(sel=selector)
+
+
+def filtered_search(index, ids, query, k, mask=None, nprobe=NPROBE, ef_search=EF_SEARCH):
+    """
+    Ids of the k nearest vectors to `query` (1 x dim) among those where `mask`
+    (aligned with `ids`, the sorted ids in the index) is set; None searches all.
+    """
+    if mask is None:
+        _, found = index.search(query, k, params=search_params(index, nprobe=nprobe, ef_search=ef_search))
+        return [int(i) for i in found[0] if i >= 0]
+    selected = int(mask.sum())
+    if selected == 0:
+        return []
+    if selected <= EXACT_FILTER_LIMIT and isinstance(index, faiss.IndexIDMap2):
+        return exact_search(index, query, ids[mask], k)
+    selector, _backing = id_selector(ids, mask)
+    _, found = index.search(query, k, params=search_params(index, selector, selected / len(ids), nprobe, ef_search))
+    return [int(i) for i in found[0] if i >= 0]
+
+
+def exact_search(index, query, ids, k):
+    """Exact k-NN among `ids` from vectors stored in an IDMap2 index (flat / HNSW)."""
+    vectors = index.reconstruct_batch(np.ascontiguousarray(ids, dtype="int64"))
+    distances = ((vectors - query) ** 2).sum(axis=1)
+    top = np.argsort(distances)[:k] if len(ids) <= k else np.argpartition(distances, k)[:k]
+    top = top[np.argsort(distances[top])]
+    return [int(ids[i]) for i in top]
+
+
+# -----------------------------
+# Detections access
+# -----------------------------
+def count_detections():
+    with db_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM detections")
+        return cursor.fetchone()
+
+
+def iter_detection_chunks(after_id=0, chunk=EMBED_CHUNK):
+    """(id, class, confidence, file_name, created_at, class_id) rows in id order, `chunk` at a time."""
+    while True:
+        with db_cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id, class, confidence, file_name, created_at, class_id
+                FROM detections WHERE id > %s ORDER BY id LIMIT %s
+                """,
+                (after_id, chunk)
+            )
+            rows = cursor.fetchall()
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+
+def detection_ids_between(low, high):
+    """Sorted ids in (low, high]."""
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id FROM detections WHERE id > %s AND id <= %s ORDER BY id", (low, high))
+        return np.array([r[0] for r in cursor.fetchall()], dtype="int64")
+
+
+def fetch_index_rows(ids):
+    """(id, class, confidence, file_name, created_at, class_id) rows for `ids`, in id order."""
+    with db_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT id, class, confidence, file_name, created_at, class_id
+            FROM detections WHERE id = ANY(%s) ORDER BY id
+            """,
+            ([int(i) for i in ids],)
+        )
+        return cursor.fetchall()
+
+
+def sample_detections(size, total):
+    """About `size` random rows (Bernoulli sample, repeatable) for training."""
+    percent = min(100.0, 100.0 * 1.2 * size / max(total, 1))
+    with db_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT id, class, confidence, file_name, created_at, class_id
+            FROM detections TABLESAMPLE BERNOULLI (%s) REPEATABLE (42) LIMIT %s
+            """,
+            (percent, size)
+        )
+        return cursor.fetchall()
+
+
+def fetch_detections_by_id(ids):
+    """(id, class, confidence, file_name, created_at) rows in the order of `ids`."""
+    with db_cursor() as cursor:
+        cursor.execute(
+            "SELECT id, class, confidence, file_name, created_at FROM detections WHERE id = ANY(%s)",
+            (list(ids),)
+        )
+        rows = {r[0]: r for r in cursor.fetchall()}
+    return [rows[i] for i in ids if i in rows]
+
+
+def class_ids_for(patterns):
+    """detection_classes ids whose name matches any ILIKE pattern (as in query_router)."""
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id FROM detection_classes WHERE name ILIKE ANY(%s)", (list(patterns),))
+        return [r[0] for r in cursor.fetchall()]
+
+
+def _metadata(rows):
+    ids = np.array([r[0] for r in rows], dtype="int64")
+    class_ids = np.array([-1 if r[5] is None else r[5] for r in rows], dtype="int16")
+    created = np.array([r[4] for r in rows], dtype="datetime64[s]")
+    return ids, class_ids, created
+
+
+# -----------------------------
+# Index
+# -----------------------------
+class DetectionVectorIndex:
+    def __init__(self, embedding_model, kind=VECTOR_INDEX_TYPE, directory=VECTOR_INDEX_DIR,
+                 chunk=EMBED_CHUNK, nprobe=NPROBE, ef_search=EF_SEARCH, lookback=REFRESH_LOOKBACK):
+        self.embedding_model = embedding_model
+        self.kind = kind
+        self.directory = directory or None
+        self.chunk = chunk
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.lookback = lookback
+        self.index = None
+        self.meta = {}
+        self.ids = np.empty(0, dtype="int64")
+        self.class_ids = np.empty(0, dtype="int16")
+        self.created = np.empty(0, dtype="datetime64[s]")
+        self.max_id = 0
+        self.unsaved = 0
+        self.late_rows = 0
+        self.embedding_cache = EmbeddingCache(self.directory)
+        self.loaded_from_disk = False
+        self.mmapped = False
+        self.build_error = None
+        self._lock = threading.Lock()           # index + metadata arrays (held briefly)
+        self._build_lock = threading.Lock()     # one build or refresh at a time
+        self._build_thread = None
+        self._build_started = None
+        if self.directory:
+            self._load()
+
+    def __len__(self):
+        return 0 if self.index is None else self.index.ntotal
+
+    @property
+    def ready(self):
+        return self.index is not None
+
+    @property
+    def building(self):
+        return self._build_thread is not None and self._build_thread.is_alive()
+
+    def embed(self, rows):
+        texts = [detection_text(r) for r in rows]
+        return np.ascontiguousarray(
+            self.embedding_cache.encode(self.embedding_model, texts, batch_size=EMBED_BATCH), dtype="float32"
+        )
+
+    # -- building --
+    def build(self, kind=None, sample_size=TRAIN_SAMPLE, log=print):
+        """Trains a new index on a sample and adds the whole history. Returns the number of vectors."""
+        with self._build_lock:
+            return self._build(kind, sample_size, log)
+
+    def start_build(self):
+        """Builds the index in a background thread, unless one is running or was tried recently."""
+        if self.building or (self._build_started is not None
+                             and time.monotonic() - self._build_started < BUILD_RETRY_SECONDS):
+            return False
+        self._build_started = time.monotonic()
+
+        def run():
+            try:
+                self.build(log=lambda _: None)
+                self.build_error = None
+            except Exception as e:
+                self.build_error = repr(e)
+                print(f"⚠️ Vector index build failed: {e}")
+
+        self._build_thread = threading.Thread(target=run, name="vector-index-build", daemon=True)
+        self._build_thread.start()
+        return True
+
+    def _build(self, kind, sample_size, log):
+        total, _ = count_detections()
+        if not total:
+            return 0
+        kind = kind or self.kind
+        kind = choose_type(total) if kind == "auto" else kind
+        if kind == "ivfpq" and total < 10_000:
+            log(f"ℹ️ {total} detections are too few to train PQ codebooks; using ivf")
+            kind = "ivf"
+        start = time.perf_counter()
+        dim = self.embedding_model.get_sentence_embedding_dimension()
+        factory = factory_string(kind, dim, total)
+        index = faiss.index_factory(dim, factory)
+        trained_on = 0
+        if not index.is_trained:
+            sample = sample_detections(train_size(kind, total, sample_size), total)
+            log(f"🎯 Training {factory} on {len(sample):,} sampled detections")
+            index.train(self.embed(sample))
+            trained_on = len(sample)
+
+        parts, added = [], 0
+        for rows in iter_detection_chunks(0, self.chunk):
+            ids, class_ids, created = _metadata(rows)
+            index.add_with_ids(self.embed(rows), ids)
+            self.embedding_cache.save()         # keeps memory flat over the whole history
+            parts.append((ids, class_ids, created))
+            added += len(rows)
+            elapsed = time.perf_counter() - start
+            log(f"📥 {added:,} / ~{total:,} detections embedded ({added / elapsed:,.0f}/s)")
+
+        with self._lock:
+            self.index = index
+            self.mmapped = False
+            self.ids = np.concatenate([p[0] for p in parts])
+            self.class_ids = np.concatenate([p[1] for p in parts])
+            self.created = np.concatenate([p[2] for p in parts])
+            self.max_id = int(self.ids[-1])
+            self.meta = {"kind": kind, "factory": factory, "dim": dim, "trained_on": trained_on,
+                         "built_size": added, "built_at": datetime.now().isoformat(timespec="seconds"),
+                         "build_seconds": round(time.perf_counter() - start, 1)}
+        self.unsaved = added
+        self.save()
+        return added
+
+    def refresh(self):
+        """
+        Adds detections with id > max_id, and rows in the trailing lookback
+        range that were not committed yet when it was last scanned. Returns
+        the number added; 0 while the index is not built yet (a background
+        build is started instead) or while a build / another refresh is running.
+        """
+        if self.index is None:
+            self.start_build()
+            return 0
+        if not self._build_lock.acquire(blocking=False):
+            return 0
+        try:
+            added = self._add_late_rows()
+            for rows in iter_detection_chunks(self.max_id, self.chunk):
+                added += self._add(rows)
+            self.unsaved += added
+            if self.unsaved >= SAVE_EVERY:
+                self.save()
+            return added
+        finally:
+            self._build_lock.release()
+
+    def _add_late_rows(self):
+        """Adds rows with ids in (max_id - lookback, max_id] that are not in the index."""
+        if self.lookback <= 0 or not self.max_id:
+            return 0
+        low = max(0, self.max_id - self.lookback)
+        known = self.ids[np.searchsorted(self.ids, low, side="right"):]
+        missing = np.setdiff1d(detection_ids_between(low, self.max_id), known, assume_unique=True)
+        if not len(missing):
+            return 0
+        added = self._add(fetch_index_rows(missing))
+        self.late_rows += added
+        return added
+
+    def _add(self, rows):
+        """Embeds and adds id-ordered rows, keeping self.ids (and the arrays aligned with it) sorted."""
+        if not rows:
+            return 0
+        self._writable()
+        # Embedding is the slow part; searches keep running meanwhile
+        vectors = self.embed(rows)
+        ids, class_ids, created = _metadata(rows)
+        with self._lock:
+            self.index.add_with_ids(vectors, ids)
+            late = len(self.ids) and ids[0] < self.ids[-1]
+            self.ids = np.concatenate([self.ids, ids])
+            self.class_ids = np.concatenate([self.class_ids, class_ids])
+            self.created = np.concatenate([self.created, created])
+            if late:
+                order = np.argsort(self.ids, kind="stable")
+                self.ids, self.class_ids, self.created = self.ids[order], self.class_ids[order], self.created[order]
+            self.max_id = int(self.ids[-1])
+        return len(rows)
+
+    def _writable(self):
+        """IVF lists loaded with IO_FLAG_MMAP are read-only: reads the index into memory before adding to it."""
+        if not self.mmapped:
+            return
+        index = faiss.read_index(os.path.join(self.directory, "history.faiss"))
+        with self._lock:
+            self.index = index
+            self.mmapped = False
+
+    # -- search --
+    def filter_mask(self, class_ids=None, since=None, until=None):
+        """Boolean mask over self.ids for the class ids / created_at range, or None for no filter."""
+        mask = None
+        if class_ids is not None:
+            mask = np.isin(self.class_ids, class_ids)
+        if since is not None:
+            after = self.created >= np.datetime64(since, "s")
+            mask = after if mask is None else mask & after
+        if until is not None:
+            before = self.created < np.datetime64(until, "s")
+            mask = before if mask is None else mask & before
+        return mask
+
+    def search_ids(self, query_vector, k=5, classes=None, since=None, until=None):
+        """Ids of up to k nearest detections that pass the filters."""
+        query = np.asarray(query_vector, dtype="float32").reshape(1, -1)
+        class_ids = class_ids_for(classes) if classes else None
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+            mask = self.filter_mask(class_ids, since, until)
+            return filtered_search(self.index, self.ids, query, k, mask, self.nprobe, self.ef_search)
+
+    def search(self, query_vector, k=5, classes=None, since=None, until=None):
+        """Returns up to k (id, text) pairs nearest to the query vector that pass the filters."""
+        rerank = self.meta.get("kind") == "ivfpq"
+        ids = self.search_ids(query_vector, k * RERANK_FACTOR if rerank else k, classes, since, until)
+        rows = fetch_detections_by_id(ids) if ids else []
+        if rerank and len(rows) > k:
+            distances = ((self.embed(rows) - np.asarray(query_vector, dtype="float32").reshape(1, -1)) ** 2).sum(axis=1)
+            rows = [rows[i] for i in np.argsort(distances)[:k]]
+        return [(r[0], detection_text(r)) for r in rows]
+
+    def stats(self):
+        path = os.path.join(self.directory, "history.faiss") if self.directory else None
+        with self._lock:
+            kind = self.meta.get("kind")
+            return {
+                **self.meta,
+                "vectors": len(self),
+                "max_id": self.max_id,
+                "late_rows": self.late_rows,
+                "file_mb": round(os.path.getsize(path) / 1e6, 1) if path and os.path.exists(path) else None,
+                "loaded_from_disk": self.loaded_from_disk,
+                "mmapped": self.mmapped,
+                "embedding_cache": self.embedding_cache.stats(),
+                "building": self.building,
+                "build_error": self.build_error,
+                # the history outgrew the type auto picked at build time: run --build again
+                "rebuild_suggested": self.kind == "auto" and kind is not None and kind != choose_type(len(self)),
+            }
+
+    # -- persistence --
+    def save(self):
+        """
+        Writes the index, the id/class/time arrays, build info and new cached
+        embeddings (caller holds the build lock).
+        """
+        if not self.directory or self.index is None:
+            return
+        self.embedding_cache.save()
+        if self.mmapped:
+            return          # unchanged since it was loaded
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(os.path.join(self.directory, "history.faiss"), lambda tmp: faiss.write_index(self.index, tmp))
+
+        def write_arrays(tmp):
+            with open(tmp, "wb") as f:
+                np.savez(f, ids=self.ids, class_ids=self.class_ids, created=self.created.astype("int64"))
+        atomic_write(os.path.join(self.directory, "history_meta.npz"), write_arrays)
+        save_json(os.path.join(self.directory, "history_meta.json"), {**self.meta, "max_id": self.max_id})
+        self.unsaved = 0
+
+    def _load(self):
+        paths = [os.path.join(self.directory, name)
+                 for name in ("history.faiss", "history_meta.npz", "history_meta.json")]
+        if not all(os.path.exists(p) for p in paths):
+            return
+        try:
+            # IVF inverted lists stay on disk and are paged in as searches touch them
+            index = faiss.read_index(paths[0], faiss.IO_FLAG_MMAP)
+            arrays = np.load(paths[1])
+            with open(paths[2], encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"⚠️ Ignoring unreadable vector index: {e}")
+            return
+        if index.ntotal != len(arrays["ids"]):
+            return
+        self.index = index
+        self.ids = arrays["ids"]
+        self.class_ids = arrays["class_ids"]
+        self.created = arrays["created"].astype("datetime64[s]")
+        self.max_id = int(meta.pop("max_id"))
+        self.meta = meta
+        self.loaded_from_disk = True
+        self.mmapped = faiss.try_extract_index_ivf(index) is not None
+
+
+# -----------------------------
+# Startup profile
+# -----------------------------
+def profile_startup(embedding_model, directory=VECTOR_INDEX_DIR):
+    """Times a cold start (build without any cache) against a warm start from `directory`."""
+    results = {}
+    with tempfile.TemporaryDirectory() as empty_dir:
+        start = time.perf_counter()
+        DetectionVectorIndex(embedding_model, directory=empty_dir).build(log=lambda _: None)
+        results["cold (no cache)"] = time.perf_counter() - start
+
+    # Make sure the saved index is current, then time a restart from it
+    warm = DetectionVectorIndex(embedding_model, directory=directory)
+    if warm.ready:
+        warm.refresh()
+        warm.save()
+    else:
+        warm.build(log=lambda _: None)
+    start = time.perf_counter()
+    vector_index = DetectionVectorIndex(embedding_model, directory=directory)
+    results["warm (load)"] = time.perf_counter() - start
+    vector_index.refresh()
+    results["warm (load + refresh)"] = time.perf_counter() - start
+    return results
+
+
+def main():
+    from sentence_transformers import SentenceTransformer
+    from query_router import search_filters
+
+    parser = argparse.ArgumentParser(description="Vector index over the full detections history")
+    parser.add_argument("--build", action="store_true", help="Train and rebuild the index from scratch")
+    parser.add_argument("--type", choices=INDEX_TYPES, default=VECTOR_INDEX_TYPE)
+    parser.add_argument("--sample", type=int, default=TRAIN_SAMPLE, help="Training sample size (IVF/PQ)")
+    parser.add_argument("--refresh", action="store_true", help="Add detections newer than the index")
+    parser.add_argument("--search", metavar="QUESTION")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--stats", action="store_true")
+    parser.add_argument("--profile-startup", action="store_true", help="Compare startup with and without the disk cache")
+    parser.add_argument("--dir", default=VECTOR_INDEX_DIR)
+    args = parser.parse_args()
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    if args.profile_startup:
+        for label, seconds in profile_startup(model, args.dir).items():
+            print(f"{label:<24} {seconds * 1000:10.1f} ms")
+        return
+    vector_index = DetectionVectorIndex(model, kind=args.type, directory=args.dir)
+    if args.build:
+        print(f"✅ Indexed {vector_index.build(args.type, args.sample):,} detections")
+    if args.refresh:
+        if not vector_index.ready:
+            parser.error(f"no index in {args.dir}: run --build first")
+        print(f"✅ Added {vector_index.refresh():,} detections")
+    if args.search:
+        filters = search_filters(args.search)
+        print(f"🔎 {filters.label} (classes={filters.patterns}, since={filters.since}, until={filters.until})")
+        start = time.perf_counter()
+        matches = vector_index.search(model.encode([args.search], convert_to_numpy=True), args.k,
+                                      filters.patterns, filters.since, filters.until)
+        for _, text in matches:
+            print(f"- {text}")
+        print(f"⏱️ {(time.perf_counter() - start) * 1000:.1f} ms")
+    if args.stats or not (args.build or args.refresh or args.search):
+        for key, value in vector_index.stats().items():
+            print(f"{key:<18} {value}")
+
+
+if __name__ == "__main__":
+    main()